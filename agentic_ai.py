@@ -4,12 +4,16 @@ import sys
 import json
 import time
 import streamlit as st
-from langchain_openai import ChatOpenAI
 from langchain.agents import AgentExecutor, create_tool_calling_agent
 from langchain_core.prompts import ChatPromptTemplate
 from langchain.tools import tool
-from config import OPENAI_API_KEY
 import generative_ai  # Import this
+import generation_orchestrator
+import llm_clients
+import llm_metrics
+import model_routing
+import prompt_budget
+from rate_limiter import limiter
 
 # --- Robust Import Logic ---
 project_root = os.path.dirname(os.path.abspath(__file__))
@@ -36,16 +40,13 @@ def generate_focused_review_materials(original_context, weak_topics):
     with st.spinner(f"Generating new summary for {topics_str}..."):
         focused_summary = generative_ai.generate_summary(prompt)
 
-    with st.spinner(f"Generating new flashcards for {topics_str}..."):
-        focused_flashcards = generative_ai.generate_flashcards(focused_summary)
-
-    with st.spinner(f"Generating new mind map for {topics_str}..."):
-        focused_mindmap = generative_ai.generate_mindmap_markdown(focused_summary)
+    with st.spinner(f"Generating new flashcards and mind map for {topics_str}..."):
+        artifacts, _ = generation_orchestrator.generate_artifacts(focused_summary, ("flashcards", "mindmap"))
 
     return {
         "summary": focused_summary,
-        "flashcards": focused_flashcards,
-        "mindmap": focused_mindmap
+        "flashcards": artifacts.get("flashcards"),
+        "mindmap": artifacts.get("mindmap")
     }
 
 
@@ -81,7 +82,8 @@ def start_new_topic(username):
 
 def get_agent_executor():
     """Initializes the LangChain agent with tools and prompt."""
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0, api_key=OPENAI_API_KEY)
+    route = model_routing.route("agent")
+    llm = llm_clients.chat_model(route["models"][0], temperature=route["temperature"])
     tools = [review_weak_topics, start_new_topic]
 
     prompt = ChatPromptTemplate.from_messages([
@@ -132,12 +134,27 @@ def run_agent_analysis(username, score, weak_topics, original_context):
 # =============================== AGORA CONVERSATIONAL AI =============================== #
 
 # --- Helper: Call OpenAI directly ---
-def _call_openai(system_prompt, user_prompt, temperature=0.7, max_tokens=250):
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=temperature, api_key=OPENAI_API_KEY)
+def _call_openai(system_prompt, user_prompt, function="agentic_call_openai"):
+    # Model, temperature and max_tokens come from the route of `function`.
+    route = model_routing.route(function)
     messages = [{"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt}]
-    response = llm.invoke(messages)
-    return response.content.strip()
+    budget = prompt_budget.check_fits(function, messages, route["models"][0], route["max_tokens"])
+    tokens = budget["prompt_tokens"] + budget["max_output_tokens"]
+    model = route["models"][0]
+    while True:
+        # Retries are left to the shared rate limiter, which honors Retry-After.
+        llm = llm_clients.chat_model(model, temperature=route["temperature"], max_tokens=route["max_tokens"],
+                                     max_retries=0)
+        try:
+            with llm_metrics.track(function, model) as call:
+                response = limiter.run_sync(lambda: llm.invoke(messages), tokens)
+                call.usage(getattr(response, "usage_metadata", None))
+            return response.content.strip()
+        except Exception as e:
+            model = model_routing.next_model(function, route["models"], model, e)
+            if model is None:
+                raise
 
 
 # --- Step 1: Analyze student’s answer ---
@@ -166,7 +183,7 @@ def analyze_answer(user_text, expected_concept):
     }}
     """
     try:
-        raw = _call_openai(system_prompt, user_prompt, temperature=0.3)
+        raw = _call_openai(system_prompt, user_prompt, function="analyze_answer")
         start = raw.find("{")
         end = raw.rfind("}") + 1
         return json.loads(raw[start:end]) if start != -1 else {}
@@ -217,7 +234,7 @@ def socratic_response(user_text, context):
         """
 
     system_prompt = "You are a kind, Socratic AI tutor engaging a student in natural voice conversation."
-    ai_text = _call_openai(system_prompt, prompt, temperature=0.8, max_tokens=150)
+    ai_text = _call_openai(system_prompt, prompt, function="socratic_response")
 
     # --- Optionally add persona tone ---
     ai_text = get_persona_response(persona, ai_text)
@@ -17,6 +17,10 @@ if project_root not in sys.path:
 import database_utils as db # Or import db
 import auth
 import generative_ai
+import generation_orchestrator
+import artifact_graph
+import near_duplicates
+import catalogue
 import agentic_ai
 import quiz_module
 import dashboard
@@ -51,6 +55,7 @@ def init_session_state():
         "topic_chat_history": [],
         "topic_name": None, # <-- ADD THIS LINE
         "source_type": None,
+        "artifact_hashes": {},
         "default_tab": 0
     }
     for key, value in defaults.items():
@@ -709,7 +714,7 @@ def show_onboarding_flow():
 
         elif input_type == "Choose from a list":
             topic_name = st.selectbox("Select a popular topic:", 
-                                      ["", "Artificial Intelligence", "Data Science", "Computer Networking", "Blockchain"])
+                                      ["", *catalogue.catalogue_names()])
             if topic_name:
                 content = f"Provide a detailed overview of the topic: {topic_name}"
                 source_type = "predefined"
@@ -730,6 +735,83 @@ def show_onboarding_flow():
             else:
                 st.error("Could not extract content. Please try a different file or topic.")
 
+def use_catalogue_materials():
+    """Copies the precomputed materials of a catalogue topic into a new topic for the user."""
+    topic_id, materials = catalogue.copy_to_user(st.session_state.user_id, st.session_state.topic_name)
+    if topic_id is None:
+        return False
+
+    st.session_state.current_topic_id = topic_id
+    st.session_state.current_summary = materials["summary"]
+    st.session_state.current_mindmap = materials["mindmap"]
+    st.session_state.current_flashcards = materials["flashcards"]
+    st.session_state.current_formula_sheet = materials["formula_sheet"]
+    st.session_state.current_topic_text = materials["summary"]
+    st.session_state.question_bank = {
+        "topic_id": topic_id, "questions": materials["question_bank"],
+        # The bank only fits quizzes on this summary, not e.g. a focused review's.
+        "summary_hash": artifact_graph.input_hash(materials["summary"]),
+    }
+    st.session_state.artifact_hashes = artifact_graph.loaded_hashes(current_artifacts(), {})
+    return True
+
+def reuse_near_duplicate_topic():
+    """
+    Loads stored materials when the pending topic is a near-duplicate of one the
+    user may reuse. Another user's topic is cloned first. Returns True if reused.
+    """
+    user_id = st.session_state.user_id
+    match = near_duplicates.find_near_duplicate(
+        user_id, st.session_state.topic_name, st.session_state.source_type, st.session_state.current_topic_text
+    )
+    if not match:
+        return False
+
+    topic_id = match["topic_id"]
+    if match["user_id"] != user_id:
+        topic_id = db.clone_topic(topic_id, user_id, st.session_state.topic_name, st.session_state.source_type)
+        near_duplicates.index_topic(topic_id, user_id, st.session_state.topic_name,
+                                    st.session_state.source_type, st.session_state.current_topic_text)
+    content = db.get_topic_content(topic_id) if topic_id else None
+    if not content or not content.get("summary"):
+        return False
+
+    st.session_state.current_topic_id = topic_id
+    st.session_state.current_summary = content["summary"]
+    st.session_state.current_mindmap = content["mindmap"]
+    st.session_state.current_flashcards = content["flashcards"]
+    st.session_state.current_formula_sheet = content["formula_sheet"]
+    st.session_state.current_topic_text = content["summary"]
+    st.session_state.artifact_hashes = artifact_graph.loaded_hashes(current_artifacts(), db.get_artifact_hashes(topic_id))
+    st.toast(f"Reused materials from a matching topic ({match['similarity']:.0%} similar).")
+    return True
+
+def current_artifacts():
+    """The topic's summary and derived artifacts as currently held in session state."""
+    return {name: st.session_state.get(f"current_{name}") for name in ("summary", *artifact_graph.DEPENDENCIES)}
+
+def use_focused_review(review_data):
+    """Makes a focused review's summary (and the artifacts generated from it) the current materials."""
+    st.session_state.current_summary = review_data['summary']
+    st.session_state.current_topic_text = review_data['summary']
+    derived = {name: review_data.get(name) for name in ("mindmap", "flashcards")}
+    for name, value in derived.items():
+        if value:
+            st.session_state[f"current_{name}"] = value
+    st.session_state.artifact_hashes.update(artifact_graph.derived_hashes(review_data['summary'], derived))
+
+ANSWER_ERROR = "Error: Could not process your question."
+
+def write_answer_stream(context, prompt, style="normal"):
+    """Streams an answer into the current chat message. If the stream fails, its partial text is replaced by an error."""
+    placeholder = st.empty()
+    try:
+        return placeholder.write_stream(generative_ai.stream_answer(context, prompt, style=style))
+    except Exception as e:
+        print(f"Error streaming answer: {e}")
+        placeholder.error(ANSWER_ERROR)
+        return ANSWER_ERROR
+
 # --- REBUILT LEARNING PAGE (AESTHETIC) ---
 def process_new_topic():
     """Generates and displays all learning materials in a tabbed view."""
@@ -742,36 +824,90 @@ def process_new_topic():
         st.session_state.get('current_flashcards')
     )
     
-    # --- Generate all content ONLY if not retaking ---
-    if not is_retake:
+    # artifact_hashes maps each derived artifact to the hash of the summary it was
+    # generated from, and "summary" to the hash of the summary saved on the topic.
+    hashes = st.session_state.artifact_hashes
+    stale = artifact_graph.stale_artifacts(current_artifacts(), hashes, tuple(generation_orchestrator.ARTIFACT_GENERATORS))
+
+    # --- Generate only what is missing or was built from a different summary ---
+    if not st.session_state.current_summary or stale:
+        source_text = st.session_state.current_topic_text
         if not st.session_state.current_summary:
-            with st.spinner("Generating detailed summary..."):
-                st.session_state.current_summary = generative_ai.generate_summary(st.session_state.current_topic_text)
-                st.session_state.current_topic_id = db.create_topic(
-                    st.session_state.user_id,
-                    st.session_state.topic_name,
-                    st.session_state.source_type,
-                    st.session_state.current_summary
+            if not (st.session_state.source_type == "predefined" and use_catalogue_materials()):
+                reuse_near_duplicate_topic()
+            hashes = st.session_state.artifact_hashes
+
+        # Stage everything and write it in one transaction at the end,
+        # so a failure midway never leaves a half-populated topic behind.
+        bundle = db.TopicBundle(
+            st.session_state.user_id,
+            st.session_state.topic_name,
+            st.session_state.source_type,
+            topic_id=st.session_state.current_topic_id if st.session_state.current_summary else None
+        )
+
+        if not st.session_state.current_summary:
+            # Stream the summary so the student sees text immediately; the
+            # Summary tab renders the final version once everything is ready.
+            summary_preview = st.empty()
+            try:
+                with summary_preview.container(border=True):
+                    st.caption("Generating detailed summary...")
+                    st.session_state.current_summary = st.write_stream(
+                        generative_ai.stream_summary(st.session_state.current_topic_text)
+                    )
+            except Exception as e:
+                # A stream that fails midway leaves a truncated summary; never keep it.
+                print(f"Error streaming summary: {e}")
+                st.session_state.current_summary = None
+            summary_preview.empty()
+            if not st.session_state.current_summary:
+                # Don't save a broken module; the limiter already retried, so let the student retry later.
+                st.error("The AI service is busy right now, so your module wasn't created. Please try again in a minute.")
+                if st.button("Try again", type="primary"):
+                    st.rerun()
+                return
+            st.session_state.current_topic_text = st.session_state.current_summary
+        summary_hash = artifact_graph.input_hash(st.session_state.current_summary)
+        if bundle.topic_id is None:
+            bundle.stage(summary=st.session_state.current_summary)
+            hashes["summary"] = summary_hash
+        # A focused review's summary lives only in this session, so artifacts built
+        # from it are not written over the topic's saved materials.
+        persist = hashes.get("summary") == summary_hash
+
+        # Mind map, flashcards and formula sheet only depend on the summary,
+        # so regenerate whichever are stale concurrently.
+        missing = artifact_graph.stale_artifacts(current_artifacts(), hashes, tuple(generation_orchestrator.ARTIFACT_GENERATORS))
+        if missing:
+            def on_artifact(name, value):
+                st.session_state[f"current_{name}"] = value
+                hashes[name] = summary_hash
+                if persist:
+                    bundle.stage(input_hash=summary_hash, **{name: value})
+
+            # Show flashcards as they stream in; the Flashcards tab renders the final set.
+            card_preview = st.empty()
+            streamed_cards = []
+
+            def on_progress(name, card):
+                streamed_cards.append(card)
+                with card_preview.container(border=True):
+                    st.caption(f"Generating flashcards... ({len(streamed_cards)} so far)")
+                    utils.render_flashcards({"flashcards": streamed_cards})
+
+            with st.spinner("Generating mind map, flashcards and formula sheet..."):
+                generation_orchestrator.generate_artifacts(
+                    st.session_state.current_summary, missing, on_artifact=on_artifact, on_progress=on_progress
                 )
-                st.session_state.current_topic_text = st.session_state.current_summary
-        
-        if not st.session_state.current_mindmap:
-            with st.spinner("Generating mind map..."):
-                st.session_state.current_mindmap = generative_ai.generate_mindmap_markdown(st.session_state.current_topic_text)
-                if st.session_state.current_mindmap:
-                    db.save_mindmap(st.session_state.current_topic_id, st.session_state.current_mindmap)
-
-        if not st.session_state.current_flashcards:
-            with st.spinner("Generating flashcards..."):
-                st.session_state.current_flashcards = generative_ai.generate_flashcards(st.session_state.current_topic_text)
-                if st.session_state.current_flashcards:
-                    db.save_flashcards(st.session_state.current_topic_id, st.session_state.current_flashcards)
-        
-        if not st.session_state.current_formula_sheet:
-            with st.spinner("Generating formula sheet..."):
-                st.session_state.current_formula_sheet = generative_ai.generate_formula_sheet(st.session_state.current_topic_text)
-                if st.session_state.current_formula_sheet:
-                    db.save_formula_sheet(st.session_state.current_topic_id, st.session_state.current_formula_sheet)
+            # Only produced artifacts get a hash; failed ones stay stale and are retried on the next run.
+            card_preview.empty()
+
+        is_new_topic = bundle.topic_id is None
+        st.session_state.current_topic_id = bundle.commit()
+        if is_new_topic:
+            near_duplicates.index_topic(st.session_state.current_topic_id, st.session_state.user_id,
+                                        st.session_state.topic_name, st.session_state.source_type, source_text)
 
     with st.container(border=True):
         # Create tabs - using a workaround to set default tab
@@ -813,7 +949,7 @@ def process_new_topic():
             if st.session_state.current_formula_sheet:
                 st.markdown(st.session_state.current_formula_sheet)
             else:
-                st.info("No distinct formulas or key equations were found for this topic.")
+                st.error("Could not generate a formula sheet for this topic.")
 
         with tab5:
             st.subheader("Ask a Question")
@@ -830,18 +966,18 @@ def process_new_topic():
                 st.session_state.topic_chat_history.append({"role": "user", "content": prompt})
                 st.chat_message("user").write(prompt)
                 
-                with st.spinner("Finding an answer..."):
-                    response = generative_ai.answer_question(st.session_state.current_summary, prompt, style=qa_style.lower())
-                    
+                with st.chat_message("assistant"):
+                    response = write_answer_stream(st.session_state.current_summary, prompt, style=qa_style.lower())
+
                 st.session_state.topic_chat_history.append({"role": "assistant", "content": response})
-                st.chat_message("assistant").write(response)
                 st.rerun()
 
         with tab6:
             st.subheader("Test Your Knowledge")
             
-            # Generate quiz ONLY if it doesn't exist
-            if "current_quiz" not in st.session_state or not st.session_state.current_quiz:
+            # Generate the quiz only if it's missing or was built from a different summary
+            if (not st.session_state.get("current_quiz") or
+                    artifact_graph.is_stale("quiz", current_artifacts(), st.session_state.artifact_hashes)):
                 with st.spinner("Generating quiz..."):
                     quiz_module.setup_quiz(st.session_state.current_summary, st.session_state.current_topic_id)
             
@@ -913,11 +1049,9 @@ def show_quiz_results_page():
             st.info("Study this new material, then retake the quiz.")
             
             if st.button("Retake Focused Quiz", type="primary"):
-                # Update materials with focused review content
-                st.session_state.current_summary = review_data['summary']
-                st.session_state.current_topic_text = review_data['summary']
-                st.session_state.current_mindmap = review_data['mindmap']
-                st.session_state.current_flashcards = review_data['flashcards']
+                # Update materials with focused review content; the learning page
+                # then regenerates only what the new summary makes stale.
+                use_focused_review(review_data)
                 
                 # Clear ONLY quiz-related data
                 if "current_quiz" in st.session_state:
@@ -951,7 +1085,7 @@ def show_quiz_results_page():
             "user_answers", "latest_score", "latest_weak_areas", 
             "agent_recommendation", "focused_review", "topic_name", "source_type",
             "current_topic_name_to_review", "topic_chat_history",
-            "quiz_num_q"
+            "quiz_num_q", "artifact_hashes"
         ]
         for key in keys_to_clear:
             if key in st.session_state: del st.session_state[key]
@@ -978,10 +1112,9 @@ def show_general_qa_page():
     if prompt:
         st.session_state.chat_history.append({"role": "user", "content": prompt})
         st.chat_message("user").write(prompt)
-        with st.spinner("Thinking..."):
-            response = generative_ai.answer_question(None, prompt, style="normal") # No style needed
+        with st.chat_message("assistant"):
+            response = write_answer_stream(None, prompt) # No style needed
         st.session_state.chat_history.append({"role": "assistant", "content": response})
-        st.chat_message("assistant").write(response)
         st.rerun()
 
 
@@ -1013,8 +1146,7 @@ def show_review_page():
     st.divider()
     
     if st.button("Take Quiz Now", type="primary"):
-        st.session_state.current_summary = review_data['summary']
-        st.session_state.current_topic_text = review_data['summary']
+        use_focused_review(review_data)
         if "current_quiz" in st.session_state: del st.session_state['current_quiz']
         if "user_answers" in st.session_state: del st.session_state['user_answers']
         st.session_state.focused_review = None
@@ -0,0 +1,58 @@
+# artifact_graph.py
+"""
+Dependency graph of a topic's generated artifacts:
+
+    summary -> mindmap, flashcards, formula_sheet, quiz
+
+Each derived artifact remembers the hash of the input it was generated from,
+in session state (st.session_state.artifact_hashes) and, once saved, in the
+artifact_inputs table. When the summary changes (e.g. a focused review
+replaces it before a retake), only artifacts whose recorded input hash no
+longer matches are regenerated; the others are kept as they are.
+"""
+import hashlib
+import json
+
+DEPENDENCIES = {
+    "mindmap": "summary",
+    "flashcards": "summary",
+    "formula_sheet": "summary",
+    "quiz": "summary",
+}
+
+
+def input_hash(value):
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        value = json.dumps(value, sort_keys=True)
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+
+def derived_hashes(source, values):
+    """Input hashes for the artifacts in `values` that were all generated from `source`."""
+    source_hash = input_hash(source)
+    return {name: source_hash for name, value in values.items() if value and name in DEPENDENCIES}
+
+
+def loaded_hashes(values, stored):
+    """
+    Input hashes for artifacts loaded from the database. Rows saved before
+    hashes were recorded count as generated from the stored summary.
+    """
+    current = input_hash(values.get("summary"))
+    hashes = {name: stored.get(name, current) for name in DEPENDENCIES if values.get(name)}
+    hashes["summary"] = current
+    return hashes
+
+
+def is_stale(name, values, hashes):
+    """
+    True if `name` was last generated from a different input than the current one,
+    or never generated. `values` needs at least the artifact's input (the summary).
+    """
+    return hashes.get(name) != input_hash(values.get(DEPENDENCIES[name]))
+
+
+def stale_artifacts(values, hashes, names=tuple(DEPENDENCIES)):
+    return [name for name in names if is_stale(name, values, hashes)]
@@ -4,6 +4,8 @@ from passlib.context import CryptContext
 import os
 import sys # <-- IMPORTED SYS
 import json
+import time
+from concurrent.futures import ProcessPoolExecutor
 
 # --- Robust Import Logic ---
 # Add the project's root directory (where app.py is) to the Python path
@@ -47,3 +49,67 @@ def login_user(username, password):
         return False, None
         
     return True, user
+
+
+def bulk_register_users(roster, max_workers=None, chunk_size=500):
+    """
+    Registers many users at once.
+    `roster` is a list of dicts with 'username', 'email' and 'password'.
+    Passwords are hashed in parallel on a process pool and rows are inserted
+    in chunked transactions. Returns a report dict with the created count,
+    per-row conflicts ({'row', 'username', 'reason'}; rows are 1-based) and the
+    rows a database error left unprocessed (`failed`, {'row', 'username'}).
+    """
+    started = time.perf_counter()
+    conflicts = []
+    seen_usernames, seen_emails = set(), set()
+    valid = []
+    for row_num, entry in enumerate(roster, start=1):
+        username = (entry.get("username") or "").strip()
+        email = (entry.get("email") or "").strip()
+        password = entry.get("password") or ""
+        if not all([username, email, password]):
+            conflicts.append({"row": row_num, "username": username, "reason": "Missing username, email or password."})
+        elif username in seen_usernames:
+            conflicts.append({"row": row_num, "username": username, "reason": "Duplicate username in roster."})
+        elif email in seen_emails:
+            conflicts.append({"row": row_num, "username": username, "reason": "Duplicate email in roster."})
+        else:
+            seen_usernames.add(username)
+            seen_emails.add(email)
+            valid.append((row_num, username, email, password))
+
+    taken_usernames, taken_emails = db.get_existing_users(seen_usernames, seen_emails)
+    to_create = []
+    for row_num, username, email, password in valid:
+        if username in taken_usernames:
+            conflicts.append({"row": row_num, "username": username, "reason": "Username already exists."})
+        elif email in taken_emails:
+            conflicts.append({"row": row_num, "username": username, "reason": "Email already exists."})
+        else:
+            to_create.append((row_num, username, email, password))
+
+    passwords = [password for _, _, _, password in to_create]
+    if len(passwords) > 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            hashes = list(pool.map(hash_password, passwords, chunksize=max(1, len(passwords) // 64)))
+    else:
+        hashes = [hash_password(p) for p in passwords]
+
+    created, db_conflicts, db_failed = db.bulk_create_users(
+        [(username, email, password_hash) for (_, username, email, _), password_hash in zip(to_create, hashes)],
+        chunk_size=chunk_size
+    )
+    row_by_username = {username: row_num for row_num, username, _, _ in to_create}
+    for username, reason in db_conflicts:
+        conflicts.append({"row": row_by_username[username], "username": username, "reason": reason})
+    failed = sorted(({"row": row_by_username[username], "username": username} for username in db_failed),
+                    key=lambda f: f["row"])
+
+    conflicts.sort(key=lambda c: c["row"])
+    return {
+        "created": len(created),
+        "conflicts": conflicts,
+        "failed": failed,
+        "elapsed_seconds": round(time.perf_counter() - started, 2)
+    }
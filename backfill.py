@@ -0,0 +1,290 @@
+# backfill.py
+"""
+Batch backfill of missing topic artifacts (mind maps, flashcards, formula sheets).
+
+Scans every user's topics for missing artifacts, submits the generation
+requests in batches through a pluggable executor, and writes the results back
+with save_mindmap / save_flashcards / save_formula_sheet.
+
+    python backfill.py run [--executor openai|local] [--batch-size 200] [--submit-only]
+    python backfill.py status
+    python backfill.py reset
+
+Executors:
+- openai: the OpenAI Batch API (about half the cost; results within 24h).
+- local: sends the requests right away through generative_ai (rate-limited
+  and cached). Tests can pass a stub `complete` function instead.
+
+Progress is kept in a checkpoint file (the last topic_id scanned plus any
+submitted batches), so an interrupted run resumes where it stopped. With
+--submit-only, batches are submitted and the job exits. A later run collects
+the results. Requests that fail or return nothing usable are retried by
+rescanning their topics, up to MAX_ATTEMPTS times each.
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import datetime
+
+# --- Robust Import Logic ---
+project_root = os.path.dirname(os.path.abspath(__file__))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+import database_utils as db
+import generative_ai
+
+ARTIFACTS = ("mindmap", "flashcards", "formula_sheet")
+SAVERS = {
+    "mindmap": db.save_mindmap,
+    "flashcards": db.save_flashcards,
+    "formula_sheet": db.save_formula_sheet,
+}
+DEFAULT_CHECKPOINT = os.path.join(project_root, "backfill_checkpoint.json")
+DONE_STATES = ("completed", "failed", "expired", "cancelled", "lost")
+MAX_ATTEMPTS = 3
+
+
+def _log(message):
+    print(f"[backfill {datetime.now():%Y-%m-%d %H:%M:%S}] {message}")
+
+
+# ---------------------- Executors ---------------------- #
+
+class LocalExecutor:
+    """Runs each batch immediately. `complete(requests)` returns content (or an exception) per request."""
+
+    name = "local"
+
+    def __init__(self, complete=None):
+        self.complete = complete or generative_ai.run_requests
+        self._results = {}
+
+    def submit(self, requests):
+        batch_id = f"local-{uuid.uuid4().hex[:12]}"
+        outputs = self.complete([r["request"] for r in requests])
+        self._results[batch_id] = {
+            r["custom_id"]: (None if isinstance(out, BaseException) else out)
+            for r, out in zip(requests, outputs)
+        }
+        return batch_id
+
+    def status(self, batch_id):
+        # Local results only live in memory; after a restart the batch is gone.
+        return "completed" if batch_id in self._results else "lost"
+
+    def results(self, batch_id):
+        return self._results.pop(batch_id, {})
+
+
+class OpenAIBatchExecutor:
+    """Submits each batch as a JSONL file to the OpenAI Batch API."""
+
+    name = "openai"
+    ENDPOINT = "/v1/chat/completions"
+
+    def __init__(self, client=None):
+        if client is None:
+            import llm_clients
+            client = llm_clients.openai_client()
+        self.client = client
+
+    def submit(self, requests):
+        lines = []
+        for r in requests:
+            req = r["request"]
+            body = {"model": req["model"], "messages": req["messages"], **req["params"]}
+            lines.append(json.dumps({"custom_id": r["custom_id"], "method": "POST", "url": self.ENDPOINT, "body": body}))
+        payload = io.BytesIO("\n".join(lines).encode("utf-8"))
+        input_file = self.client.files.create(file=("artifact_backfill.jsonl", payload), purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=input_file.id, endpoint=self.ENDPOINT, completion_window="24h",
+            metadata={"job": "artifact_backfill"}
+        )
+        return batch.id
+
+    def status(self, batch_id):
+        return self.client.batches.retrieve(batch_id).status
+
+    def results(self, batch_id):
+        batch = self.client.batches.retrieve(batch_id)
+        outputs = {}
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for line in self.client.files.content(file_id).text.splitlines():
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                response = item.get("response") or {}
+                content = None
+                if response.get("status_code") == 200:
+                    content = response["body"]["choices"][0]["message"]["content"]
+                outputs[item["custom_id"]] = content
+        return outputs
+
+
+EXECUTORS = {"local": LocalExecutor, "openai": OpenAIBatchExecutor}
+
+
+# ---------------------- Checkpoint ---------------------- #
+
+def load_checkpoint(path=DEFAULT_CHECKPOINT):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"last_topic_id": 0, "pending": {}, "written": 0, "failed": 0, "attempts": {}}
+
+
+def save_checkpoint(checkpoint, path=DEFAULT_CHECKPOINT):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(tmp, path)
+
+
+# ---------------------- Job ---------------------- #
+
+def build_requests(rows, artifacts=ARTIFACTS, skip=()):
+    """Requests for the rows' missing artifacts, except custom_ids in `skip`."""
+    requests = []
+    for row in rows:
+        for name in artifacts:
+            custom_id = f"{row['topic_id']}:{name}"
+            if row[f"missing_{name}"] and custom_id not in skip:
+                requests.append({
+                    "custom_id": custom_id,
+                    "request": generative_ai.build_artifact_request(name, row["content_summary"]),
+                })
+    return requests
+
+
+def apply_results(outputs, checkpoint, custom_ids=()):
+    """
+    Validates and saves each result. Returns the custom_ids that produced nothing
+    usable, including any of the submitted `custom_ids` missing from `outputs`.
+    """
+    failed = [custom_id for custom_id in custom_ids if custom_id not in outputs]
+    attempts = checkpoint.setdefault("attempts", {})
+    for custom_id, content in outputs.items():
+        topic_id, name = custom_id.split(":", 1)
+        value = generative_ai.parse_artifact_response(name, content)
+        if value is None:
+            failed.append(custom_id)
+            continue
+        SAVERS[name](int(topic_id), value)
+        attempts.pop(custom_id, None)
+        checkpoint["written"] += 1
+    return failed
+
+
+def _rewind(checkpoint, custom_ids):
+    """Moves the scan back so the next pass picks these topics up again (they are still missing)."""
+    first = min(int(cid.split(":", 1)[0]) for cid in custom_ids)
+    checkpoint["last_topic_id"] = min(checkpoint["last_topic_id"], first - 1)
+    return first
+
+
+def _retry_failed(checkpoint, failed):
+    """Counts an attempt for each failed request and rewinds for those under MAX_ATTEMPTS."""
+    attempts = checkpoint.setdefault("attempts", {})
+    retry = []
+    for custom_id in failed:
+        attempts[custom_id] = attempts.get(custom_id, 0) + 1
+        if attempts[custom_id] < MAX_ATTEMPTS:
+            retry.append(custom_id)
+        else:
+            checkpoint["failed"] += 1
+            _log(f"Giving up on {custom_id} after {MAX_ATTEMPTS} attempts")
+    if retry:
+        first = _rewind(checkpoint, retry)
+        _log(f"{len(retry)} request(s) failed; rescanning from topic {first} to retry them")
+
+
+def _skipped(checkpoint):
+    """custom_ids not to submit again: still pending, or out of attempts."""
+    skip = {cid for custom_ids in checkpoint["pending"].values() for cid in custom_ids}
+    skip.update(cid for cid, n in checkpoint.get("attempts", {}).items() if n >= MAX_ATTEMPTS)
+    return skip
+
+
+def collect(executor, checkpoint, path, wait=True, poll_seconds=30):
+    """Applies every finished pending batch. With wait, blocks until all are finished."""
+    while checkpoint["pending"]:
+        for batch_id, custom_ids in list(checkpoint["pending"].items()):
+            state = executor.status(batch_id)
+            if state not in DONE_STATES:
+                continue
+            del checkpoint["pending"][batch_id]
+            if state == "lost":
+                first = _rewind(checkpoint, custom_ids)
+                _log(f"Batch {batch_id} was lost; rescanning from topic {first}")
+            else:
+                _retry_failed(checkpoint, apply_results(executor.results(batch_id), checkpoint, custom_ids))
+                _log(f"Batch {batch_id} {state}: {checkpoint['written']} written, {checkpoint['failed']} given up so far")
+            save_checkpoint(checkpoint, path)
+        if not wait or not checkpoint["pending"]:
+            break
+        time.sleep(poll_seconds)
+
+
+def run(executor, batch_size=200, artifacts=ARTIFACTS, checkpoint_path=DEFAULT_CHECKPOINT,
+        submit_only=False, poll_seconds=30):
+    """Runs (or resumes) the backfill. Returns the final checkpoint."""
+    checkpoint = load_checkpoint(checkpoint_path)
+    collect(executor, checkpoint, checkpoint_path, wait=not submit_only, poll_seconds=poll_seconds)
+
+    while True:
+        rows = db.get_topics_missing_artifacts(checkpoint["last_topic_id"], limit=batch_size)
+        if not rows:
+            break
+        requests = build_requests(rows, artifacts, skip=_skipped(checkpoint))
+        if requests:
+            batch_id = executor.submit(requests)
+            checkpoint["pending"][batch_id] = [r["custom_id"] for r in requests]
+            _log(f"Submitted batch {batch_id}: {len(requests)} requests for topics "
+                 f"{rows[0]['topic_id']}-{rows[-1]['topic_id']}")
+        checkpoint["last_topic_id"] = rows[-1]["topic_id"]
+        save_checkpoint(checkpoint, checkpoint_path)
+        if not submit_only:
+            collect(executor, checkpoint, checkpoint_path, wait=True, poll_seconds=poll_seconds)
+
+    if checkpoint["pending"]:
+        _log(f"{len(checkpoint['pending'])} batch(es) still running; run again later to collect them.")
+    else:
+        _log(f"Done: {checkpoint['written']} artifacts written, {checkpoint['failed']} failed.")
+    return checkpoint
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backfill missing topic artifacts in batches.")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT, help="Checkpoint file path")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_p = sub.add_parser("run", help="Run or resume the backfill")
+    run_p.add_argument("--executor", choices=sorted(EXECUTORS), default="openai")
+    run_p.add_argument("--batch-size", type=int, default=200, help="Topics per batch")
+    run_p.add_argument("--artifact", action="append", choices=ARTIFACTS, help="Only this artifact (repeatable)")
+    run_p.add_argument("--submit-only", action="store_true", help="Submit batches and exit without waiting")
+    run_p.add_argument("--poll-seconds", type=float, default=30)
+
+    sub.add_parser("status", help="Show the checkpoint")
+    sub.add_parser("reset", help="Delete the checkpoint and start over on the next run")
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        run(EXECUTORS[args.executor](), batch_size=args.batch_size, artifacts=tuple(args.artifact or ARTIFACTS),
+            checkpoint_path=args.checkpoint, submit_only=args.submit_only, poll_seconds=args.poll_seconds)
+    elif args.command == "status":
+        print(json.dumps(load_checkpoint(args.checkpoint), indent=2))
+    elif os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
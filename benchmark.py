@@ -0,0 +1,259 @@
+# benchmark.py
+"""
+End-to-end latency benchmark of the app's LLM-backed flows, run against
+fake_openai_server so it needs no network access or API key.
+
+    python benchmark.py [--iterations 20] [--latency lognormal:0.8,0.5] [--errors 429:0.02]
+    python benchmark.py --base-url http://127.0.0.1:8787/v1   # use an already running server
+    python benchmark.py --json results.json
+
+Each iteration creates a fresh typed topic for a benchmark user and times these
+stages (wall time, including retries):
+
+- onboarding: first render of the learning page (app.process_new_topic):
+  streamed summary, mind map / flashcards / formula sheet and the quiz.
+- quiz: a fresh quiz for the topic (quiz_module.setup_quiz + display_quiz).
+- quiz_submit: answering and submitting it (quiz_module.grade_and_store_quiz).
+- agent: the LangChain agent's recommendation (agentic_ai.run_agent_analysis).
+- voice_turn: one voice turn (agentic_ai.process_stt).
+- voice_socratic: one Agora conversational turn (agentic_ai.socratic_response).
+
+The Streamlit pages are driven headlessly with streamlit.testing's AppTest.
+The run uses a throwaway SQLite database and LLM cache (the cache is off
+unless --cache is given) and disables near-duplicate reuse, so every
+iteration really calls the model. It reports p50/p95/p99 per stage, plus the
+per-function LLM numbers from llm_metrics.
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+# --- Robust Import Logic ---
+project_root = os.path.dirname(os.path.abspath(__file__))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+import fake_openai_server
+
+STAGES = ("onboarding", "quiz", "quiz_submit", "agent", "voice_turn", "voice_socratic")
+TRANSCRIPT = "I think {topic} is mostly about storing data, but I'm not sure how it scales."
+
+
+# ---------------------- Environment ---------------------- #
+
+def configure_environment(base_url, workdir, use_cache):
+    """Points the app at `base_url` with throwaway storage. Must run before any project import."""
+    os.environ["OPENAI_BASE_URL"] = base_url
+    for name in ("OPENAI_API_KEY", "AGORA_APP_ID", "AGORA_APP_CERTIFICATE",
+                 "DB_HOST", "DB_USER", "DB_PASSWORD", "DB_NAME"):
+        os.environ.setdefault(name, "benchmark")
+    os.environ.update({
+        "DB_BACKEND": "sqlite",
+        "SQLITE_PATH": os.path.join(workdir, "benchmark.db"),
+        "LLM_CACHE_PATH": os.path.join(workdir, "llm_cache.db"),
+        "LLM_CACHE_ENABLED": "true" if use_cache else "false",
+        "DEDUP_SCOPE": "off",
+        "LLM_METRICS_LOG": "false",
+    })
+
+
+# ---------------------- AppTest Scripts ---------------------- #
+# AppTest runs each function's source as a standalone page script, so they import what they use.
+
+def _onboarding_page():
+    import app
+    app.init_session_state()
+    app.process_new_topic()
+
+
+def _quiz_page():
+    import streamlit as st
+    import quiz_module
+    if not st.session_state.get("current_quiz"):
+        quiz_module.setup_quiz(st.session_state.current_summary, st.session_state.current_topic_id)
+    if quiz_module.display_quiz():
+        quiz_module.grade_and_store_quiz()
+        st.session_state.graded = True
+
+
+def _agent_page():
+    import streamlit as st
+    import agentic_ai
+    st.session_state.agent_recommendation = agentic_ai.run_agent_analysis(
+        st.session_state.username, st.session_state.latest_score,
+        st.session_state.latest_weak_areas, st.session_state.current_summary
+    )
+
+
+# ---------------------- Runner ---------------------- #
+
+def percentile(values, q):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def _seed(at, values):
+    for key, value in values.items():
+        at.session_state[key] = value
+
+
+def _state(at, key):
+    return at.session_state[key] if key in at.session_state else None
+
+
+class Bench:
+    def __init__(self, stage_timeout):
+        self.stage_timeout = stage_timeout
+        self.timings = {stage: [] for stage in STAGES}
+        self.errors = {stage: [] for stage in STAGES}
+
+    def time(self, stage, fn):
+        """Runs fn(), recording its wall time or its error. Returns its result, or None if it failed."""
+        started = time.perf_counter()
+        try:
+            result = fn()
+        except Exception as e:
+            self.errors[stage].append(f"{type(e).__name__}: {e}")
+            return None
+        self.timings[stage].append(time.perf_counter() - started)
+        return result
+
+    def _run_page(self, at):
+        at.run(timeout=self.stage_timeout)
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+        return at
+
+    def iteration(self, user, index):
+        from streamlit.testing.v1 import AppTest
+        import agentic_ai
+        import database_utils as db
+
+        topic = f"Benchmark Topic {index} {uuid.uuid4().hex[:6]}"
+        page = AppTest.from_function(_onboarding_page, default_timeout=self.stage_timeout)
+        _seed(page, {
+            "logged_in": True, "user_id": user["user_id"], "username": user["username"],
+            "page": "onboarding_processing", "topic_name": topic, "source_type": "text",
+            "current_topic_text": f"Provide a detailed overview of the topic: {topic}",
+        })
+        page = self.time("onboarding", lambda: self._run_page(page))
+        if page is None or not _state(page, "current_topic_id"):
+            return
+        summary, topic_id = _state(page, "current_summary"), _state(page, "current_topic_id")
+
+        quiz = AppTest.from_function(_quiz_page, default_timeout=self.stage_timeout)
+        _seed(quiz, {
+            "user_id": user["user_id"], "current_summary": summary, "current_topic_id": topic_id,
+        })
+        quiz = self.time("quiz", lambda: self._run_page(quiz))
+        if quiz is not None and _state(quiz, "current_quiz"):
+            for i, question in enumerate(_state(quiz, "current_quiz")):
+                if question.get("type") == "Short":
+                    quiz.text_input(key=f"q_{i}").input((question.get("answer_keywords") or ["answer"])[0])
+                else:
+                    widget = quiz.radio(key=f"q_{i}")
+                    widget.set_value(widget.options[0])
+            quiz.button[0].click()
+            self.time("quiz_submit", lambda: self._run_page(quiz))
+
+        agent = AppTest.from_function(_agent_page, default_timeout=self.stage_timeout)
+        _seed(agent, {
+            "username": user["username"], "current_summary": summary,
+            "latest_score": 40.0, "latest_weak_areas": ["Fundamentals"],
+        })
+        self.time("agent", lambda: self._run_page(agent))
+
+        session_id = db.create_voice_session(user["user_id"], topic)
+        transcript = TRANSCRIPT.format(topic=topic)
+        self.time("voice_turn", lambda: agentic_ai.process_stt(user["user_id"], session_id, topic, transcript))
+        self.time("voice_socratic", lambda: agentic_ai.socratic_response(transcript, {"topic": topic}))
+
+    def report(self):
+        rows = []
+        for stage in STAGES:
+            values = self.timings[stage]
+            row = {"stage": stage, "n": len(values), "errors": len(self.errors[stage])}
+            if values:
+                row.update({f"p{q}_s": round(percentile(values, q), 3) for q in (50, 95, 99)})
+                row["mean_s"] = round(sum(values) / len(values), 3)
+            rows.append(row)
+        return rows
+
+
+def _print_table(title, rows, columns):
+    print(f"\n{title}")
+    widths = [max(len(c), *(len(str(r.get(c, "-"))) for r in rows)) for c in columns]
+    print("  ".join(c.ljust(w) for c, w in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(str(row.get(c, "-") if row.get(c) is not None else "-").ljust(w)
+                        for c, w in zip(columns, widths)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark onboarding, quiz and voice flows end to end.")
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed iterations before measuring")
+    parser.add_argument("--base-url", help="Use this OpenAI-compatible server instead of starting the fake one")
+    parser.add_argument("--latency", default="lognormal:0.6,0.4", help="Fake server latency spec")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="Fake server delay between streamed chunks")
+    parser.add_argument("--errors", default="", help="Fake server error injection, e.g. 429:0.02,500:0.01")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cache", action="store_true", help="Leave the LLM response cache on")
+    parser.add_argument("--stage-timeout", type=float, default=300, help="Seconds before a page run fails")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args(argv)
+
+    server = None
+    base_url = args.base_url
+    if base_url is None:
+        server, base_url = fake_openai_server.start_in_thread(
+            latency=args.latency, token_delay=args.token_delay, errors=args.errors, seed=args.seed
+        )
+    workdir = tempfile.mkdtemp(prefix="cognitivetwin-bench-")
+    configure_environment(base_url, workdir, args.cache)
+
+    import database_utils as db
+    import llm_metrics
+    db.create_tables()
+    username = f"bench_{uuid.uuid4().hex[:8]}"
+    user = {"username": username, "user_id": db.create_user(username, f"{username}@example.com", "benchmark")}
+    print(f"Benchmarking against {base_url} ({args.iterations} iterations, data in {workdir})")
+
+    bench = Bench(args.stage_timeout)
+    for i in range(args.warmup):
+        bench.iteration(user, -1 - i)
+    bench = Bench(args.stage_timeout)
+    llm_metrics.reset()
+    for i in range(args.iterations):
+        started = time.perf_counter()
+        bench.iteration(user, i)
+        print(f"  iteration {i + 1}/{args.iterations}: {time.perf_counter() - started:.1f}s")
+
+    stages = bench.report()
+    llm_calls = llm_metrics.summary()
+    _print_table("Stage wall time (seconds)", stages, ["stage", "n", "errors", "p50_s", "p95_s", "p99_s", "mean_s"])
+    _print_table("LLM calls by function", llm_calls,
+                 ["function", "calls", "cache_hits", "coalesced", "latency_p50_s", "latency_p95_s",
+                  "ttft_p50_s", "prompt_tokens", "completion_tokens"])
+    for stage, errors in bench.errors.items():
+        if errors:
+            print(f"\n{stage}: {len(errors)} error(s), first: {errors[0]}")
+
+    result = {"base_url": base_url, "iterations": args.iterations, "stages": stages, "llm_calls": llm_calls,
+              "errors": {stage: errors for stage, errors in bench.errors.items() if errors}}
+    if server is not None:
+        result["server"] = dict(server.RequestHandlerClass.fake.stats)
+        server.shutdown()
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+# catalogue.py
+"""
+Precomputed materials for the predefined topic catalogue.
+
+The topics offered under "Choose from a list" come from the catalogue file
+(CATALOGUE_PATH). For each one, this job generates and stores the summary,
+mind map, flashcards, formula sheet and a question bank. Selecting a topic
+then just copies the stored materials into the user's own topic.
+
+    python catalogue.py run [--topic NAME ...] [--force]
+    python catalogue.py daemon [--every-hours 24]
+    python catalogue.py status
+
+An entry is regenerated when it has never been generated, when its
+definition in the catalogue file changed, when it is older than
+CATALOGUE_REFRESH_DAYS, or when --force is given.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+# --- Robust Import Logic ---
+project_root = os.path.dirname(os.path.abspath(__file__))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+import database_utils as db
+import generative_ai
+import generation_orchestrator
+from config import CATALOGUE_PATH, CATALOGUE_REFRESH_DAYS, CATALOGUE_QUESTION_BANK_SIZE
+
+QUESTIONS_PER_ROUND = 10
+DEFAULT_PROMPT = "Provide a detailed overview of the topic: {name}"
+
+
+def _log(message):
+    print(f"[catalogue {datetime.now():%Y-%m-%d %H:%M:%S}] {message}")
+
+
+def load_catalogue(path=CATALOGUE_PATH):
+    """Returns the list of catalogue entries ({"name", optional "prompt"})."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return [entry for entry in json.load(f).get("topics", []) if entry.get("name")]
+    except (OSError, ValueError) as e:
+        print(f"Error loading topic catalogue {path}: {e}")
+        return []
+
+
+def catalogue_names():
+    return [entry["name"] for entry in load_catalogue()]
+
+
+def entry_prompt(entry):
+    return entry.get("prompt") or DEFAULT_PROMPT.format(name=entry["name"])
+
+
+def entry_hash(entry):
+    return hashlib.sha256(json.dumps(entry, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def is_stale(entry, status):
+    if status is None or status["entry_hash"] != entry_hash(entry):
+        return True
+    return time.time() - status["generated_at"] > CATALOGUE_REFRESH_DAYS * 86400
+
+
+def build_question_bank(summary, size=CATALOGUE_QUESTION_BANK_SIZE):
+    """Collects up to `size` distinct quiz questions over a few quiz generations."""
+    bank, seen = [], set()
+    for _ in range(max(1, 2 * -(-size // QUESTIONS_PER_ROUND))):
+        if len(bank) >= size:
+            break
+        quiz = generative_ai.generate_quiz(summary, num_questions=QUESTIONS_PER_ROUND)
+        for question in (quiz or {}).get("quiz", []):
+            text = " ".join(str(question.get("question", "")).lower().split())
+            if text and text not in seen and question.get("type") and question.get("topic"):
+                seen.add(text)
+                bank.append(question)
+    return bank[:size]
+
+
+def precompute_entry(entry):
+    """Generates and stores all materials for one entry. Returns True on success."""
+    name = entry["name"]
+    started = time.perf_counter()
+    summary = generative_ai.generate_summary(entry_prompt(entry))
+    if not summary or summary.startswith("Error:"):
+        _log(f"{name}: summary failed, keeping the previous materials")
+        return False
+
+    artifacts, errors = generation_orchestrator.generate_artifacts(summary)
+    question_bank = build_question_bank(summary)
+    saved = db.save_catalogue_materials(
+        name, entry_hash(entry), summary,
+        mindmap=artifacts.get("mindmap"),
+        flashcards=artifacts.get("flashcards"),
+        formula_sheet=artifacts.get("formula_sheet"),
+        question_bank=question_bank
+    )
+    missing = f", missing {sorted(errors)}" if errors else ""
+    _log(f"{name}: {len(question_bank)} questions{missing} in {time.perf_counter() - started:.1f}s")
+    return saved
+
+
+def precompute(names=None, force=False):
+    """Regenerates stale (or, with force, all) catalogue entries. Returns the names regenerated."""
+    status = db.get_catalogue_status()
+    done = []
+    for entry in load_catalogue():
+        if names and entry["name"] not in names:
+            continue
+        if force or is_stale(entry, status.get(entry["name"])):
+            if precompute_entry(entry):
+                done.append(entry["name"])
+        else:
+            _log(f"{entry['name']}: up to date")
+    return done
+
+
+def copy_to_user(user_id, topic_name, source_type="predefined"):
+    """
+    Copies a catalogue topic's stored materials into a new topic for `user_id`.
+    Returns (topic_id, materials), or (None, None) if the topic isn't precomputed.
+    """
+    materials = db.get_catalogue_materials(topic_name)
+    if not materials:
+        return None, None
+    topic_id = db.save_topic_bundle(
+        user_id, topic_name, source_type, materials["summary"],
+        mindmap=materials["mindmap"],
+        flashcards=materials["flashcards"],
+        formula_sheet=materials["formula_sheet"]
+    )
+    if topic_id is None:
+        return None, None
+    return topic_id, materials
+
+
+def sample_questions(question_bank, num_questions):
+    return random.sample(question_bank, min(num_questions, len(question_bank)))
+
+
+def run_daemon(every_hours=24):
+    """Checks the catalogue for stale entries every `every_hours`, forever."""
+    _log(f"Daemon started; checking every {every_hours}h")
+    while True:
+        try:
+            precompute()
+        except Exception as e:
+            _log(f"Precompute pass failed: {e}")
+        time.sleep(every_hours * 3600)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute materials for the predefined topic catalogue.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_p = sub.add_parser("run", help="Generate stale entries now")
+    run_p.add_argument("--topic", action="append", help="Only this topic (repeatable)")
+    run_p.add_argument("--force", action="store_true", help="Regenerate even if up to date")
+
+    daemon_p = sub.add_parser("daemon", help="Regenerate stale entries on a schedule")
+    daemon_p.add_argument("--every-hours", type=float, default=24, help="Hours between checks")
+
+    sub.add_parser("status", help="Show when each entry was generated")
+
+    args = parser.parse_args(argv)
+    db.create_tables()
+    if args.command == "run":
+        precompute(names=args.topic, force=args.force)
+    elif args.command == "daemon":
+        run_daemon(args.every_hours)
+    else:
+        status = db.get_catalogue_status()
+        for entry in load_catalogue():
+            info = status.get(entry["name"])
+            when = datetime.fromtimestamp(info["generated_at"]).strftime("%Y-%m-%d %H:%M") if info else "never"
+            state = "stale" if is_stale(entry, info) else "fresh"
+            print(f"{entry['name']}: generated {when} ({state})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -18,12 +18,77 @@ DB_HOST = os.getenv("DB_HOST")
 DB_USER = os.getenv("DB_USER")
 DB_PASSWORD = os.getenv("DB_PASSWORD")
 DB_NAME = os.getenv("DB_NAME")
+DB_PORT = int(os.getenv("DB_PORT", 5432))
+DB_BACKEND = os.getenv("DB_BACKEND", "sqlite")  # 'sqlite' or 'postgres'
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", 1))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", 10))
+SQLITE_PATH = os.getenv("SQLITE_PATH", "cognitivetwin.db")
 
 # === OpenAI API Configuration ===
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 if not OPENAI_API_KEY:
     raise ValueError("OPENAI_API_KEY not found. Please set it in your .env file.")
 
+# === LLM Concurrency & Rate Limits ===
+# In-flight OpenAI requests per process adapt (AIMD) between these bounds.
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))
+LLM_MIN_CONCURRENCY = int(os.getenv("LLM_MIN_CONCURRENCY", 1))
+LLM_LATENCY_TARGET_SECONDS = float(os.getenv("LLM_LATENCY_TARGET_SECONDS", 30))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 5))
+# Account quota for the model in use; keep a little below the real limits.
+OPENAI_RPM_LIMIT = int(os.getenv("OPENAI_RPM_LIMIT", 500))
+OPENAI_TPM_LIMIT = int(os.getenv("OPENAI_TPM_LIMIT", 200000))
+# One JSON line per LLM call (function, model, latency, tokens, cost) on stdout.
+LLM_METRICS_LOG = os.getenv("LLM_METRICS_LOG", "true").lower() == "true"
+
+# === LLM HTTP Connection Pool ===
+# Shared by every LLM client (see llm_clients). HTTP/2 needs the optional h2 package.
+LLM_HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", 100))
+LLM_HTTP_MAX_KEEPALIVE = int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", 20))
+LLM_HTTP_KEEPALIVE_SECONDS = float(os.getenv("LLM_HTTP_KEEPALIVE_SECONDS", 90))
+LLM_HTTP_CONNECT_TIMEOUT = float(os.getenv("LLM_HTTP_CONNECT_TIMEOUT", 5))
+LLM_HTTP_READ_TIMEOUT = float(os.getenv("LLM_HTTP_READ_TIMEOUT", 120))
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "true").lower() == "true"
+
+# === Model Routing ===
+# Per-task overrides of model_routing.ROUTES, as JSON or a path to a JSON file.
+LLM_ROUTES = os.getenv("LLM_ROUTES", "")
+
+# === LLM Response Cache ===
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.db")
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 5000))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", 200 * 1024 * 1024))
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", 30 * 24 * 3600))  # 0 disables expiry
+# Functions that must always hit the API (comma-separated). Quizzes are excluded by
+# default so a retake on the same material gets fresh questions.
+LLM_CACHE_BYPASS = {
+    name.strip() for name in os.getenv("LLM_CACHE_BYPASS", "generate_quiz").split(",") if name.strip()
+}
+
+# === Artifact Generation ===
+# When true, mind map, flashcards and formula sheet come from one fused JSON request,
+# falling back to per-artifact calls for any section that fails validation.
+GENERATION_BUNDLE_MODE = os.getenv("GENERATION_BUNDLE_MODE", "false").lower() == "true"
+
+# === Predefined Topic Catalogue ===
+# Topics offered under "Choose from a list"; their materials are pre-generated by catalogue.py.
+CATALOGUE_PATH = os.getenv("CATALOGUE_PATH", os.path.join(project_root, "topic_catalogue.json"))
+CATALOGUE_REFRESH_DAYS = int(os.getenv("CATALOGUE_REFRESH_DAYS", 30))
+CATALOGUE_QUESTION_BANK_SIZE = int(os.getenv("CATALOGUE_QUESTION_BANK_SIZE", 30))
+
+# === Topic Q&A Retrieval ===
+# Q&A prompts include only the QA_TOP_K most relevant chunks (BM25) of the topic material.
+QA_TOP_K = int(os.getenv("QA_TOP_K", 4))
+QA_CHUNK_TOKENS = int(os.getenv("QA_CHUNK_TOKENS", 300))
+
+# === Near-Duplicate Topic Reuse ===
+# 'user': reuse only your own earlier topics; 'shared': also reuse other users' topics
+# created from a typed or predefined topic name (never their uploads); 'off' disables reuse.
+DEDUP_SCOPE = os.getenv("DEDUP_SCOPE", "shared").lower()
+DEDUP_TEXT_THRESHOLD = float(os.getenv("DEDUP_TEXT_THRESHOLD", 0.85))  # uploaded documents
+DEDUP_NAME_THRESHOLD = float(os.getenv("DEDUP_NAME_THRESHOLD", 0.8))   # typed topic names
+
 # === Agora Conversational AI Configuration ===
 AGORA_APP_ID = os.getenv("AGORA_APP_ID")
 AGORA_APP_CERTIFICATE = os.getenv("AGORA_APP_CERTIFICATE")
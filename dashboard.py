@@ -1,12 +1,12 @@
 import streamlit as st
 import database_utils as db
-import generative_ai
+import generation_orchestrator
 import plotly.graph_objects as go
 from utils import render_markmap_html, render_flashcards
 import json
 import pandas as pd
 import time
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import calendar
 # --- Global CSS Fixes ---
 st.markdown("""
@@ -208,14 +208,82 @@ st.markdown(month_labels, unsafe_allow_html=True)
 st.markdown(heatmap, unsafe_allow_html=True)
 st.markdown("<br>", unsafe_allow_html=True)
 """
+TOPICS_PAGE_SIZE = 10
+# Above this many quizzes the progress chart plots daily averages instead of every quiz.
+CHART_MAX_POINTS = 500
+
+def load_visible_topics(user_id):
+    """
+    Returns (topics, has_more) for the topics currently shown on the dashboard.
+    Pages are fetched with keyset pagination and kept in session state, so a
+    rerun only re-reads the pages the student has already expanded.
+    """
+    state = st.session_state.get("dashboard_topics")
+    if not state or state["user_id"] != user_id:
+        state = {"user_id": user_id, "pages": 1}
+        st.session_state.dashboard_topics = state
+
+    topics = []
+    cursor = None
+    for _ in range(state["pages"]):
+        page, cursor = db.get_topics_page(user_id, limit=TOPICS_PAGE_SIZE, cursor=cursor)
+        topics.extend(page)
+        if not cursor:
+            break
+    return topics, cursor is not None
+
+
+def show_more_topics_button(key):
+    """Renders a 'Load more' button that expands the visible topic pages by one."""
+    if st.button("Load more topics", key=key, use_container_width=True):
+        st.session_state.dashboard_topics["pages"] += 1
+        st.rerun()
+
+
+def _quiz_day(value):
+    """A date() from SQL as a date (SQLite returns 'YYYY-MM-DD' strings), or None."""
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+
+
+def summarize_quiz_history(user_id):
+    """
+    All-time quiz history for the dashboard. Count, last score and per-day
+    activity are SQL aggregates; individual quizzes are only read for the
+    chart, one page of at most CHART_MAX_POINTS rows. Above that the chart
+    plots daily averages ("daily" is True). Returns a dict with count,
+    last_score, activity ({date: quizzes taken}), points [(date, score)] and daily.
+    """
+    aggregate = db.get_quiz_activity(user_id)
+    days = [(_quiz_day(row["day"]), row) for row in aggregate["days"]]
+    days = [(day, row) for day, row in days if day is not None]
+    summary = {
+        "count": aggregate["count"],
+        "last_score": aggregate["last_score"],
+        "activity": {day: row["quizzes"] for day, row in days},
+        "points": [],
+        "daily": aggregate["count"] > CHART_MAX_POINTS,
+    }
+    if summary["daily"]:
+        summary["points"] = [(day, float(row["avg_score"])) for day, row in days]
+    elif summary["count"]:
+        rows, _ = db.get_quiz_results_page(user_id, limit=CHART_MAX_POINTS)
+        summary["points"] = [(quiz["date_taken"], float(quiz["score"])) for quiz in rows]
+    return summary
+
+
 def show_dashboard():
     """Renders the main student dashboard with enhanced UI."""
     user_id = st.session_state.user_id
 
     # Fetch all data once
     progress = db.get_user_progress(user_id)
-    topics = db.get_topics_by_user(user_id)
-    quiz_history = db.get_quiz_results_by_user(user_id)
+    topics, has_more_topics = load_visible_topics(user_id)
+    quiz_history = summarize_quiz_history(user_id)
 
     if not progress:
         st.error("Could not load user progress.")
@@ -225,31 +293,12 @@ def show_dashboard():
     from datetime import datetime, timedelta
     today = datetime.now().date()
     streak_days = 0
-    if quiz_history:
-        # Count consecutive days with activity
-        activity_dates = []
-        for q in quiz_history:
-            date_value = q.get('date_taken')
-            if isinstance(date_value, str):
-                try:
-                    # Try parsing ISO format first
-                    date_obj = datetime.fromisoformat(date_value)
-                except ValueError:
-                    # Fallback to a common format if ISO fails
-                    try:
-                        date_obj = datetime.strptime(date_value, "%Y-%m-%d %H:%M:%S")
-                    except ValueError:
-                        # If parsing fails entirely, skip this entry
-                        continue
-            else:
-                date_obj = date_value
-        
-            # Only append valid dates
-            if date_obj:
-                activity_dates.append(date_obj.date())
-        
-        # Sort descending
-        activity_dates = sorted(activity_dates, reverse=True)
+    if quiz_history["activity"]:
+        # Count consecutive days with activity (one entry per quiz, latest first)
+        activity_dates = [
+            day for day in sorted(quiz_history["activity"], reverse=True)
+            for _ in range(quiz_history["activity"][day])
+        ]
 
         current_date = today
         for date in activity_dates:
@@ -295,30 +344,7 @@ def show_dashboard():
         import calendar
 
         # Get activity data
-        activity_dates = {}
-        if quiz_history:
-            for quiz in quiz_history:
-                date_taken = quiz.get('date_taken')
-
-                if isinstance(date_taken, str):
-                    try:
-                        # Try parsing ISO format (e.g., 2025-11-09T14:22:00)
-                        date_obj = datetime.fromisoformat(date_taken)
-                    except ValueError:
-                        try:
-                            # Fallback for common formats (e.g., 2025-11-09 14:22:00)
-                            date_obj = datetime.strptime(date_taken, "%Y-%m-%d %H:%M:%S")
-                        except ValueError:
-                            # If parsing fails, skip this quiz
-                            continue
-                elif isinstance(date_taken, datetime):
-                    date_obj = date_taken
-                else:
-                    # If date_taken is None or unknown type, skip it
-                    continue
-                
-                date_key = date_obj.strftime('%Y-%m-%d')
-                activity_dates[date_key] = activity_dates.get(date_key, 0) + 1
+        activity_dates = {day.strftime('%Y-%m-%d'): n for day, n in quiz_history["activity"].items()}
 
         # Calculate date range - from January 1st to December 31st of current year
         current_year = datetime.now().year
@@ -498,6 +524,9 @@ def show_dashboard():
                         if idx < len(topics) - 1:
                             st.markdown("<br>", unsafe_allow_html=True)
 
+                    if has_more_topics:
+                        show_more_topics_button("more_topics_overview")
+
             # Weak Topics Card
             st.markdown("""
             <div style="margin: 30px 0 20px 0;">
@@ -589,11 +618,11 @@ def show_dashboard():
             """, unsafe_allow_html=True)
             
             with st.container(border=True):
-                if quiz_history:
+                if quiz_history["count"]:
                     fig = go.Figure()
                     fig.add_trace(go.Scatter(
-                        x=[q['date_taken'] for q in quiz_history],
-                        y=[float(q['score']) for q in quiz_history],
+                        x=[taken for taken, _ in quiz_history["points"]],
+                        y=[score for _, score in quiz_history["points"]],
                         mode='lines+markers',
                         line=dict(color='#5b6fd8', width=3),
                         marker=dict(size=8, color='#5b6fd8'),
@@ -602,7 +631,7 @@ def show_dashboard():
                     ))
                     fig.update_layout(
                         xaxis_title="Date",
-                        yaxis_title="Score (%)",
+                        yaxis_title="Daily average score (%)" if quiz_history["daily"] else "Score (%)",
                         yaxis_range=[0, 100],
                         plot_bgcolor='#f7fafc',
                         paper_bgcolor='white',
@@ -633,8 +662,8 @@ def show_dashboard():
                         """, unsafe_allow_html=True)
                     
                     with mcol2:
-                        if len(quiz_history) > 1:
-                            last_score = float(quiz_history[-1]['score'])
+                        if quiz_history["count"] > 1:
+                            last_score = quiz_history["last_score"]
                             improvement = last_score - avg_score
                             color = "#10b981" if improvement >= 0 else "#ef4444"
                             arrow = "↑" if improvement >= 0 else "↓"
@@ -790,16 +819,19 @@ def show_dashboard():
                 st.warning("This topic is missing some generated materials.")
                 if st.button("✨ Generate Missing Content", key=f"gen_{topic['topic_id']}"):
                     with st.spinner("Generating new materials..."):
-                        summary_text = content['summary']
-                        if missing_mindmap:
-                            new_mindmap = generative_ai.generate_mindmap_markdown(summary_text)
-                            if new_mindmap: db.save_mindmap(topic['topic_id'], new_mindmap)
-                        if missing_flashcards:
-                            new_flashcards = generative_ai.generate_flashcards(summary_text)
-                            if new_flashcards: db.save_flashcards(topic['topic_id'], new_flashcards)
-                        if missing_formula_sheet:
-                            new_formula_sheet = generative_ai.generate_formula_sheet(summary_text)
-                            if new_formula_sheet: db.save_formula_sheet(topic['topic_id'], new_formula_sheet)
+                        savers = {
+                            "mindmap": db.save_mindmap,
+                            "flashcards": db.save_flashcards,
+                            "formula_sheet": db.save_formula_sheet,
+                        }
+                        missing = [name for name, is_missing in (("mindmap", missing_mindmap),
+                                                                 ("flashcards", missing_flashcards),
+                                                                 ("formula_sheet", missing_formula_sheet)) if is_missing]
+                        # Each artifact is saved as soon as it arrives.
+                        generation_orchestrator.generate_artifacts(
+                            content['summary'], missing,
+                            on_artifact=lambda name, value: savers[name](topic['topic_id'], value)
+                        )
                     st.success("Materials generated!")
                     st.rerun()
             
@@ -846,6 +878,9 @@ def show_dashboard():
 
             st.markdown("<br><br>", unsafe_allow_html=True)
 
+        if has_more_topics:
+            show_more_topics_button("more_topics_history")
+
     # --- Tab 3: Next Steps ---
     # Replace the "Tab 3: Next Steps" section in dashboard.py with this:
 
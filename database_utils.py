@@ -1,16 +1,32 @@
 # database_utils.py
-import sqlite3
 import json
 import os
+import sys
+import time
+import base64
 from datetime import datetime
 
-DB_PATH = "cognitivetwin.db"
+project_root = os.path.dirname(os.path.abspath(__file__))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+from config import (
+    DB_BACKEND, DB_HOST, DB_USER, DB_PASSWORD, DB_NAME, DB_PORT,
+    DB_POOL_MIN, DB_POOL_MAX, SQLITE_PATH
+)
+from db_backends import create_backend
+
+DB_PATH = SQLITE_PATH
+
+backend = create_backend(
+    DB_BACKEND, DB_PATH,
+    host=DB_HOST, user=DB_USER, password=DB_PASSWORD, dbname=DB_NAME, port=DB_PORT,
+    pool_min=DB_POOL_MIN, pool_max=DB_POOL_MAX
+)
+DB_ERRORS = backend.errors
 
 def get_db_connection():
-    """Creates or connects to the SQLite database."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row  # allows dict-like access
-    return conn
+    """Returns a connection from the configured backend (SQLite file or pooled PostgreSQL)."""
+    return backend.connect()
 
 
 def create_tables():
@@ -116,11 +132,61 @@ def create_tables():
             FOREIGN KEY (session_id) REFERENCES voice_sessions(session_id),
             FOREIGN KEY (user_id) REFERENCES users(user_id)
         );
+        """,
+
+        # ------------------ Artifact input hashes (dependency tracking) ------------------
+        """
+        CREATE TABLE IF NOT EXISTS artifact_inputs (
+            topic_id INTEGER NOT NULL,
+            artifact TEXT NOT NULL,
+            input_hash TEXT NOT NULL,
+            PRIMARY KEY (topic_id, artifact),
+            FOREIGN KEY (topic_id) REFERENCES topics(topic_id)
+        );
+        """,
+
+        # ------------------ Near-duplicate detection (MinHash/LSH) ------------------
         """
+        CREATE TABLE IF NOT EXISTS topic_signatures (
+            topic_id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            shareable INTEGER NOT NULL DEFAULT 0,
+            minhash BLOB NOT NULL,
+            FOREIGN KEY (topic_id) REFERENCES topics(topic_id),
+            FOREIGN KEY (user_id) REFERENCES users(user_id)
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS topic_lsh_buckets (
+            bucket TEXT NOT NULL,
+            topic_id INTEGER NOT NULL,
+            PRIMARY KEY (bucket, topic_id),
+            FOREIGN KEY (topic_id) REFERENCES topics(topic_id)
+        );
+        """,
+
+        # ------------------ Precomputed topic catalogue ------------------
+        """
+        CREATE TABLE IF NOT EXISTS catalogue_materials (
+            topic_name TEXT PRIMARY KEY,
+            entry_hash TEXT NOT NULL,
+            summary TEXT NOT NULL,
+            mindmap_markdown TEXT,
+            flashcard_json TEXT,
+            formula_sheet_markdown TEXT,
+            question_bank_json TEXT,
+            generated_at REAL NOT NULL
+        );
+        """,
+
+        # ------------------ Keyset pagination indexes ------------------
+        "CREATE INDEX IF NOT EXISTS idx_topics_user_created ON topics (user_id, date_created, topic_id);",
+        "CREATE INDEX IF NOT EXISTS idx_quiz_results_user_taken ON quiz_results (user_id, date_taken, quiz_id);"
     ]
 
     for query in queries:
-        cursor.execute(query)
+        cursor.execute(backend.translate_ddl(query))
     conn.commit()
     conn.close()
 
@@ -138,7 +204,7 @@ def create_user(username, email, password_hash):
         cursor.execute("INSERT INTO progress (user_id) VALUES (?)", (user_id,))
         conn.commit()
         return user_id
-    except sqlite3.Error as e:
+    except DB_ERRORS as e:
         print(f"Error creating user: {e}")
         conn.rollback()
         return None
@@ -146,6 +212,77 @@ def create_user(username, email, password_hash):
         conn.close()
 
 
+def get_existing_users(usernames, emails, chunk_size=500):
+    """Returns (taken_usernames, taken_emails) among the given values, querying in chunks."""
+    taken_usernames, taken_emails = set(), set()
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        for column, values, taken in (("username", list(usernames), taken_usernames),
+                                      ("email", list(emails), taken_emails)):
+            for i in range(0, len(values), chunk_size):
+                chunk = values[i:i + chunk_size]
+                placeholders = ", ".join("?" for _ in chunk)
+                cursor.execute(f"SELECT {column} FROM users WHERE {column} IN ({placeholders})", chunk)
+                taken.update(row[column] for row in cursor.fetchall())
+        return taken_usernames, taken_emails
+    finally:
+        conn.close()
+
+
+def bulk_create_users(users, chunk_size=500):
+    """
+    Inserts many (username, email, password_hash) tuples plus their progress rows,
+    one transaction per chunk using executemany.
+    If a chunk hits a uniqueness conflict it is retried row by row, so only the
+    conflicting rows are rejected. Any other database error stops the import.
+    Returns (created, conflicts, failed): {username: user_id}, [(username, reason)]
+    and the usernames left unprocessed by such an error.
+    """
+    created = {}
+    conflicts = []
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        for i in range(0, len(users), chunk_size):
+            chunk = users[i:i + chunk_size]
+            try:
+                cursor.executemany(
+                    "INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)", chunk
+                )
+                names = [u[0] for u in chunk]
+                placeholders = ", ".join("?" for _ in names)
+                cursor.execute(f"SELECT user_id, username FROM users WHERE username IN ({placeholders})", names)
+                ids = {row['username']: row['user_id'] for row in cursor.fetchall()}
+                cursor.executemany("INSERT INTO progress (user_id) VALUES (?)", [(ids[n],) for n in names])
+                conn.commit()
+                created.update(ids)
+            except backend.integrity_errors:
+                conn.rollback()
+                for username, email, password_hash in chunk:
+                    try:
+                        cursor.execute(
+                            "INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)",
+                            (username, email, password_hash)
+                        )
+                        user_id = cursor.lastrowid
+                        cursor.execute("INSERT INTO progress (user_id) VALUES (?)", (user_id,))
+                        conn.commit()
+                        created[username] = user_id
+                    except backend.integrity_errors:
+                        conn.rollback()
+                        conflicts.append((username, "Username or email already exists."))
+        return created, conflicts, []
+    except DB_ERRORS as e:
+        print(f"Error bulk creating users: {e}")
+        conn.rollback()
+        rejected = {username for username, _ in conflicts}
+        failed = [u[0] for u in users if u[0] not in created and u[0] not in rejected]
+        return created, conflicts, failed
+    finally:
+        conn.close()
+
+
 def get_user_by_username(username):
     conn = get_db_connection()
     cursor = conn.cursor()
@@ -153,7 +290,7 @@ def get_user_by_username(username):
         cursor.execute("SELECT * FROM users WHERE username = ?", (username,))
         row = cursor.fetchone()
         return dict(row) if row else None
-    except sqlite3.Error as e:
+    except DB_ERRORS as e:
         print(f"Error fetching user: {e}")
         return None
     finally:
@@ -172,7 +309,7 @@ def create_topic(user_id, topic_name, source_type, content_summary):
         )
         conn.commit()
         return cursor.lastrowid
-    except sqlite3.Error as e:
+    except DB_ERRORS as e:
         print(f"Error creating topic: {e}")
         conn.rollback()
         return None
@@ -184,13 +321,12 @@ def save_mindmap(topic_id, mindmap_markdown):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute("""
-            INSERT INTO mindmaps (topic_id, mindmap_markdown)
-            VALUES (?, ?)
-            ON CONFLICT(topic_id) DO UPDATE SET mindmap_markdown = excluded.mindmap_markdown
-        """, (topic_id, mindmap_markdown))
+        cursor.execute(
+            backend.upsert_sql("mindmaps", ("topic_id", "mindmap_markdown"), ("topic_id",), ("mindmap_markdown",)),
+            (topic_id, mindmap_markdown)
+        )
         conn.commit()
-    except sqlite3.Error as e:
+    except DB_ERRORS as e:
         print(f"Error saving mindmap: {e}")
         conn.rollback()
     finally:
@@ -202,13 +338,12 @@ def save_flashcards(topic_id, flashcard_data):
     cursor = conn.cursor()
     try:
         flashcard_json = json.dumps(flashcard_data)
-        cursor.execute("""
-            INSERT INTO flashcards (topic_id, flashcard_json)
-            VALUES (?, ?)
-            ON CONFLICT(topic_id) DO UPDATE SET flashcard_json = excluded.flashcard_json
-        """, (topic_id, flashcard_json))
+        cursor.execute(
+            backend.upsert_sql("flashcards", ("topic_id", "flashcard_json"), ("topic_id",), ("flashcard_json",)),
+            (topic_id, flashcard_json)
+        )
         conn.commit()
-    except sqlite3.Error as e:
+    except DB_ERRORS as e:
         print(f"Error saving flashcards: {e}")
         conn.rollback()
     finally:
@@ -219,19 +354,177 @@ def save_formula_sheet(topic_id, markdown):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute("""
-            INSERT INTO formula_sheets (topic_id, formula_sheet_markdown)
-            VALUES (?, ?)
-            ON CONFLICT(topic_id) DO UPDATE SET formula_sheet_markdown = excluded.formula_sheet_markdown
-        """, (topic_id, markdown))
+        cursor.execute(
+            backend.upsert_sql("formula_sheets", ("topic_id", "formula_sheet_markdown"), ("topic_id",), ("formula_sheet_markdown",)),
+            (topic_id, markdown)
+        )
         conn.commit()
-    except sqlite3.Error as e:
+    except DB_ERRORS as e:
         print(f"Error saving formula sheet: {e}")
         conn.rollback()
     finally:
         conn.close()
 
 
+def _write_topic_artifacts(cursor, topic_id, mindmap=None, flashcards=None, formula_sheet=None, input_hashes=None):
+    """
+    Upserts whichever artifacts are provided, using the caller's cursor/transaction.
+    `input_hashes` maps artifact name to the hash of the summary it was generated from.
+    """
+    if mindmap:
+        cursor.execute(
+            backend.upsert_sql("mindmaps", ("topic_id", "mindmap_markdown"), ("topic_id",), ("mindmap_markdown",)),
+            (topic_id, mindmap)
+        )
+    if flashcards:
+        cursor.execute(
+            backend.upsert_sql("flashcards", ("topic_id", "flashcard_json"), ("topic_id",), ("flashcard_json",)),
+            (topic_id, json.dumps(flashcards))
+        )
+    if formula_sheet:
+        cursor.execute(
+            backend.upsert_sql("formula_sheets", ("topic_id", "formula_sheet_markdown"), ("topic_id",), ("formula_sheet_markdown",)),
+            (topic_id, formula_sheet)
+        )
+    written = {"mindmap": mindmap, "flashcards": flashcards, "formula_sheet": formula_sheet}
+    for artifact, input_hash in (input_hashes or {}).items():
+        if written.get(artifact) and input_hash:
+            cursor.execute(
+                backend.upsert_sql("artifact_inputs", ("topic_id", "artifact", "input_hash"),
+                                   ("topic_id", "artifact"), ("input_hash",)),
+                (topic_id, artifact, input_hash)
+            )
+
+
+def save_topic_bundle(user_id, topic_name, source_type, summary, mindmap=None, flashcards=None,
+                      formula_sheet=None, topic_id=None, input_hashes=None):
+    """
+    Writes a topic and all of its artifacts in a single transaction.
+    Creates the topic row unless `topic_id` is given, in which case the summary is
+    updated and the artifacts are upserted onto the existing topic.
+    Returns the topic_id, or None if nothing was written.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        if topic_id is None:
+            cursor.execute(
+                "INSERT INTO topics (user_id, topic_name, source_type, content_summary) VALUES (?, ?, ?, ?)",
+                (user_id, topic_name, source_type, summary)
+            )
+            topic_id = cursor.lastrowid
+        elif summary:
+            cursor.execute("UPDATE topics SET content_summary = ? WHERE topic_id = ?", (summary, topic_id))
+        _write_topic_artifacts(cursor, topic_id, mindmap, flashcards, formula_sheet, input_hashes)
+        conn.commit()
+        return topic_id
+    except DB_ERRORS as e:
+        print(f"Error saving topic bundle: {e}")
+        conn.rollback()
+        return None
+    finally:
+        conn.close()
+
+
+class TopicBundle:
+    """
+    Stages a topic's artifacts in memory as they finish generating and writes them
+    together with save_topic_bundle(). Nothing touches the DB until commit().
+
+        bundle = TopicBundle(user_id, "Blockchain", "predefined")
+        bundle.stage(summary=summary)
+        bundle.stage(mindmap=mindmap, input_hash=artifact_graph.input_hash(summary))
+        topic_id = bundle.commit()
+    """
+
+    ARTIFACTS = ("summary", "mindmap", "flashcards", "formula_sheet")
+
+    def __init__(self, user_id, topic_name, source_type, topic_id=None):
+        self.user_id = user_id
+        self.topic_name = topic_name
+        self.source_type = source_type
+        self.topic_id = topic_id
+        self.staged = {}
+        self.input_hashes = {}
+
+    def stage(self, input_hash=None, **artifacts):
+        """Stages artifacts; `input_hash` is the hash of the summary they were generated from."""
+        for name, value in artifacts.items():
+            if name not in self.ARTIFACTS:
+                raise ValueError(f"Unknown topic artifact: {name}")
+            if value:
+                self.staged[name] = value
+                if input_hash and name != "summary":
+                    self.input_hashes[name] = input_hash
+        return self
+
+    def commit(self):
+        """Writes all staged artifacts in one transaction and clears the stage."""
+        if not self.staged:
+            return self.topic_id
+        if self.topic_id is None and not self.staged.get("summary"):
+            raise ValueError("A new topic bundle needs a summary before it can be committed.")
+        topic_id = save_topic_bundle(
+            self.user_id, self.topic_name, self.source_type,
+            self.staged.get("summary"),
+            mindmap=self.staged.get("mindmap"),
+            flashcards=self.staged.get("flashcards"),
+            formula_sheet=self.staged.get("formula_sheet"),
+            topic_id=self.topic_id,
+            input_hashes=self.input_hashes
+        )
+        if topic_id is not None:
+            self.topic_id = topic_id
+            self.staged = {}
+            self.input_hashes = {}
+        return topic_id
+
+
+def clone_topic(source_topic_id, user_id, topic_name, source_type):
+    """Copies a topic's summary and artifacts into a new topic owned by `user_id`. Returns the new topic_id."""
+    content = get_topic_content(source_topic_id)
+    if not content or not content.get("summary"):
+        return None
+    return save_topic_bundle(
+        user_id, topic_name, source_type, content["summary"],
+        mindmap=content.get("mindmap"),
+        flashcards=content.get("flashcards"),
+        formula_sheet=content.get("formula_sheet"),
+        input_hashes=get_artifact_hashes(source_topic_id)
+    )
+
+
+def get_topics_missing_artifacts(after_topic_id=0, limit=200):
+    """
+    Keyset-paginated scan over all users' topics that have a summary but lack a
+    mind map, flashcards or formula sheet, in topic_id order.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT t.topic_id, t.content_summary,
+                   CASE WHEN m.topic_id IS NULL THEN 1 ELSE 0 END AS missing_mindmap,
+                   CASE WHEN f.topic_id IS NULL THEN 1 ELSE 0 END AS missing_flashcards,
+                   CASE WHEN s.topic_id IS NULL THEN 1 ELSE 0 END AS missing_formula_sheet
+            FROM topics t
+            LEFT JOIN mindmaps m ON m.topic_id = t.topic_id
+            LEFT JOIN flashcards f ON f.topic_id = t.topic_id
+            LEFT JOIN formula_sheets s ON s.topic_id = t.topic_id
+            WHERE t.topic_id > ?
+              AND t.content_summary IS NOT NULL AND t.content_summary <> ''
+              AND (m.topic_id IS NULL OR f.topic_id IS NULL OR s.topic_id IS NULL)
+            ORDER BY t.topic_id
+            LIMIT ?
+        """, (after_topic_id, limit))
+        return [dict(row) for row in cursor.fetchall()]
+    except DB_ERRORS as e:
+        print(f"Error scanning for missing artifacts: {e}")
+        return []
+    finally:
+        conn.close()
+
+
 def get_topics_by_user(user_id):
     conn = get_db_connection()
     cursor = conn.cursor()
@@ -239,13 +532,61 @@ def get_topics_by_user(user_id):
         cursor.execute("SELECT * FROM topics WHERE user_id = ? ORDER BY date_created DESC", (user_id,))
         rows = cursor.fetchall()
         return [dict(row) for row in rows]
-    except sqlite3.Error as e:
+    except DB_ERRORS as e:
         print(f"Error fetching topics: {e}")
         return []
     finally:
         conn.close()
 
 
+def _encode_cursor(*values):
+    """Packs the last row's sort key into an opaque continuation token."""
+    return base64.urlsafe_b64encode(json.dumps(values).encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(token):
+    try:
+        return json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid pagination cursor: {token!r}") from e
+
+
+def get_topics_page(user_id, limit=20, cursor=None):
+    """
+    Keyset-paginated variant of get_topics_by_user (newest first).
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    conn = get_db_connection()
+    db_cursor = conn.cursor()
+    try:
+        if cursor:
+            date_created, topic_id = _decode_cursor(cursor)
+            db_cursor.execute("""
+                SELECT * FROM topics
+                WHERE user_id = ? AND (date_created, topic_id) < (?, ?)
+                ORDER BY date_created DESC, topic_id DESC
+                LIMIT ?
+            """, (user_id, date_created, topic_id, limit + 1))
+        else:
+            db_cursor.execute("""
+                SELECT * FROM topics
+                WHERE user_id = ?
+                ORDER BY date_created DESC, topic_id DESC
+                LIMIT ?
+            """, (user_id, limit + 1))
+        rows = [dict(row) for row in db_cursor.fetchall()]
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = _encode_cursor(str(rows[-1]['date_created']), rows[-1]['topic_id'])
+        return rows, next_cursor
+    except DB_ERRORS as e:
+        print(f"Error fetching topics page: {e}")
+        return [], None
+    finally:
+        conn.close()
+
+
 def get_topic_content(topic_id):
     conn = get_db_connection()
     cursor = conn.cursor()
@@ -272,13 +613,27 @@ def get_topic_content(topic_id):
             data['formula_sheet'] = row['formula_sheet_markdown']
 
         return data
-    except sqlite3.Error as e:
+    except DB_ERRORS as e:
         print(f"Error fetching topic content: {e}")
         return None
     finally:
         conn.close()
 
 
+def get_artifact_hashes(topic_id):
+    """Returns {artifact: input_hash} recorded for a topic's saved artifacts."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT artifact, input_hash FROM artifact_inputs WHERE topic_id = ?", (topic_id,))
+        return {row["artifact"]: row["input_hash"] for row in cursor.fetchall()}
+    except DB_ERRORS as e:
+        print(f"Error fetching artifact hashes: {e}")
+        return {}
+    finally:
+        conn.close()
+
+
 def get_topic_by_name(user_id, topic_name):
     conn = get_db_connection()
     cursor = conn.cursor()
@@ -301,6 +656,127 @@ def get_topic_name_by_id(topic_id):
         conn.close()
 
 
+# ---------------------- Topic Signature Functions ---------------------- #
+
+def save_topic_signature(topic_id, user_id, kind, shareable, minhash, buckets):
+    """Stores a topic's MinHash signature and its LSH buckets, replacing any previous ones."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            backend.upsert_sql(
+                "topic_signatures", ("topic_id", "user_id", "kind", "shareable", "minhash"),
+                ("topic_id",), ("user_id", "kind", "shareable", "minhash")
+            ),
+            (topic_id, user_id, kind, int(shareable), minhash)
+        )
+        cursor.execute("DELETE FROM topic_lsh_buckets WHERE topic_id = ?", (topic_id,))
+        cursor.executemany(
+            backend.insert_ignore_sql("topic_lsh_buckets", ("bucket", "topic_id")),
+            [(bucket, topic_id) for bucket in buckets]
+        )
+        conn.commit()
+        return True
+    except DB_ERRORS as e:
+        print(f"Error saving topic signature: {e}")
+        conn.rollback()
+        return False
+    finally:
+        conn.close()
+
+
+def find_signature_candidates(buckets, user_id, include_shared=False):
+    """
+    Returns signatures of topics sharing at least one LSH bucket, limited to the
+    user's own topics plus, if `include_shared`, other users' shareable ones.
+    """
+    if not buckets:
+        return []
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        placeholders = ", ".join("?" for _ in buckets)
+        scope = "(s.user_id = ? OR s.shareable = 1)" if include_shared else "s.user_id = ?"
+        cursor.execute(f"""
+            SELECT s.topic_id, s.user_id, s.kind, s.minhash
+            FROM topic_signatures s
+            WHERE s.topic_id IN (SELECT topic_id FROM topic_lsh_buckets WHERE bucket IN ({placeholders}))
+              AND {scope}
+        """, (*buckets, user_id))
+        return [dict(row) for row in cursor.fetchall()]
+    except DB_ERRORS as e:
+        print(f"Error fetching topic signatures: {e}")
+        return []
+    finally:
+        conn.close()
+
+
+# ---------------------- Catalogue Functions ---------------------- #
+
+def save_catalogue_materials(topic_name, entry_hash, summary, mindmap=None, flashcards=None,
+                             formula_sheet=None, question_bank=None):
+    """Stores (or replaces) the precomputed materials for one catalogue topic."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    columns = ("topic_name", "entry_hash", "summary", "mindmap_markdown", "flashcard_json",
+               "formula_sheet_markdown", "question_bank_json", "generated_at")
+    try:
+        cursor.execute(
+            backend.upsert_sql("catalogue_materials", columns, ("topic_name",), columns[1:]),
+            (topic_name, entry_hash, summary, mindmap,
+             json.dumps(flashcards) if flashcards else None, formula_sheet,
+             json.dumps(question_bank) if question_bank else None, time.time())
+        )
+        conn.commit()
+        return True
+    except DB_ERRORS as e:
+        print(f"Error saving catalogue materials: {e}")
+        conn.rollback()
+        return False
+    finally:
+        conn.close()
+
+
+def get_catalogue_materials(topic_name):
+    """Returns the precomputed materials for a catalogue topic, or None if not generated yet."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT * FROM catalogue_materials WHERE topic_name = ?", (topic_name,))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        return {
+            "summary": row["summary"],
+            "mindmap": row["mindmap_markdown"],
+            "flashcards": json.loads(row["flashcard_json"]) if row["flashcard_json"] else None,
+            "formula_sheet": row["formula_sheet_markdown"],
+            "question_bank": json.loads(row["question_bank_json"]) if row["question_bank_json"] else [],
+            "entry_hash": row["entry_hash"],
+            "generated_at": row["generated_at"],
+        }
+    except DB_ERRORS as e:
+        print(f"Error fetching catalogue materials: {e}")
+        return None
+    finally:
+        conn.close()
+
+
+def get_catalogue_status():
+    """Returns {topic_name: {"entry_hash", "generated_at"}} for every precomputed topic."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT topic_name, entry_hash, generated_at FROM catalogue_materials")
+        return {row["topic_name"]: {"entry_hash": row["entry_hash"], "generated_at": row["generated_at"]}
+                for row in cursor.fetchall()}
+    except DB_ERRORS as e:
+        print(f"Error fetching catalogue status: {e}")
+        return {}
+    finally:
+        conn.close()
+
+
 # ---------------------- Quiz & Progress ---------------------- #
 
 def save_quiz_result(user_id, topic_id, score, total_questions, weak_areas):
@@ -313,7 +789,7 @@ def save_quiz_result(user_id, topic_id, score, total_questions, weak_areas):
         """, (user_id, topic_id, score, total_questions, json.dumps(weak_areas)))
         conn.commit()
         update_user_progress(user_id, topic_id, score, weak_areas)
-    except sqlite3.Error as e:
+    except DB_ERRORS as e:
         print(f"Error saving quiz result: {e}")
         conn.rollback()
     finally:
@@ -336,6 +812,86 @@ def get_quiz_results_by_user(user_id):
         conn.close()
 
 
+def get_quiz_results_page(user_id, limit=50, cursor=None, since=None):
+    """
+    Keyset-paginated variant of get_quiz_results_by_user (oldest first).
+    `since` optionally restricts results to quizzes taken on or after that timestamp.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    conn = get_db_connection()
+    db_cursor = conn.cursor()
+    try:
+        clauses = ["qr.user_id = ?"]
+        params = [user_id]
+        if since is not None:
+            clauses.append("qr.date_taken >= ?")
+            params.append(str(since))
+        if cursor:
+            date_taken, quiz_id = _decode_cursor(cursor)
+            clauses.append("(qr.date_taken, qr.quiz_id) > (?, ?)")
+            params.extend([date_taken, quiz_id])
+        params.append(limit + 1)
+        db_cursor.execute(f"""
+            SELECT qr.*, t.topic_name
+            FROM quiz_results qr
+            JOIN topics t ON qr.topic_id = t.topic_id
+            WHERE {" AND ".join(clauses)}
+            ORDER BY qr.date_taken ASC, qr.quiz_id ASC
+            LIMIT ?
+        """, params)
+        rows = [dict(row) for row in db_cursor.fetchall()]
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = _encode_cursor(str(rows[-1]['date_taken']), rows[-1]['quiz_id'])
+        return rows, next_cursor
+    except DB_ERRORS as e:
+        print(f"Error fetching quiz results page: {e}")
+        return [], None
+    finally:
+        conn.close()
+
+
+def get_quiz_activity(user_id):
+    """
+    Aggregates a user's whole quiz history in SQL, so the cost doesn't grow with
+    rows read into Python. Returns {"count", "last_score", "newest_quiz_id", "days"},
+    where days is [{"day", "quizzes", "avg_score"}] oldest first.
+    """
+    summary = {"count": 0, "last_score": None, "newest_quiz_id": None, "days": []}
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT date(qr.date_taken) AS day, COUNT(*) AS quizzes, AVG(qr.score) AS avg_score
+            FROM quiz_results qr
+            JOIN topics t ON qr.topic_id = t.topic_id
+            WHERE qr.user_id = ?
+            GROUP BY date(qr.date_taken)
+            ORDER BY day
+        """, (user_id,))
+        summary["days"] = [dict(row) for row in cursor.fetchall()]
+        summary["count"] = sum(day["quizzes"] for day in summary["days"])
+        cursor.execute("""
+            SELECT qr.quiz_id, qr.score
+            FROM quiz_results qr
+            JOIN topics t ON qr.topic_id = t.topic_id
+            WHERE qr.user_id = ?
+            ORDER BY qr.date_taken DESC, qr.quiz_id DESC
+            LIMIT 1
+        """, (user_id,))
+        row = cursor.fetchone()
+        if row:
+            summary["newest_quiz_id"] = row["quiz_id"]
+            summary["last_score"] = float(row["score"])
+        return summary
+    except DB_ERRORS as e:
+        print(f"Error aggregating quiz activity: {e}")
+        return summary
+    finally:
+        conn.close()
+
+
 def get_quiz_results_by_topic(user_id, topic_id):
     conn = get_db_connection()
     cursor = conn.cursor()
@@ -371,7 +927,7 @@ def update_user_progress(user_id, topic_id, latest_score, new_weak_areas):
                 FROM quiz_results
                 WHERE user_id = ?
                 GROUP BY topic_id
-            )
+            ) AS per_topic
             WHERE max_score >= 70
         """, (user_id,))
         completed_topics = cursor.fetchone()['completed']
@@ -393,7 +949,7 @@ def update_user_progress(user_id, topic_id, latest_score, new_weak_areas):
             WHERE user_id = ?
         """, (total_topics, completed_topics, new_avg_score, json.dumps(weak_list), user_id))
         conn.commit()
-    except sqlite3.Error as e:
+    except DB_ERRORS as e:
         print(f"Error updating progress: {e}")
         conn.rollback()
     finally:
@@ -417,7 +973,7 @@ def ensure_voice_tables():
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute("""
+        cursor.execute(backend.translate_ddl("""
             CREATE TABLE IF NOT EXISTS voice_sessions (
                 session_id INTEGER PRIMARY KEY AUTOINCREMENT,
                 user_id INTEGER,
@@ -426,8 +982,8 @@ def ensure_voice_tables():
                 ended_at TIMESTAMP,
                 metadata TEXT
             );
-        """)
-        cursor.execute("""
+        """))
+        cursor.execute(backend.translate_ddl("""
             CREATE TABLE IF NOT EXISTS voice_conversations (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 session_id INTEGER,
@@ -436,8 +992,8 @@ def ensure_voice_tables():
                 metadata TEXT,
                 timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             );
-        """)
-        cursor.execute("""
+        """))
+        cursor.execute(backend.translate_ddl("""
             CREATE TABLE IF NOT EXISTS partial_transcripts (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 session_id INTEGER,
@@ -446,7 +1002,7 @@ def ensure_voice_tables():
                 partial_text TEXT,
                 ts REAL DEFAULT (strftime('%s','now'))
             );
-        """)
+        """))
         conn.commit()
     except Exception as e:
         print("Error ensuring voice tables:", e)
@@ -547,7 +1103,7 @@ def end_voice_session(session_id, summary):
 
 
 # Auto-create tables on first run
-if not os.path.exists(DB_PATH):
+if backend.name == "sqlite" and not os.path.exists(DB_PATH):
     print("Creating new SQLite database and tables...")
 create_tables()
 
@@ -0,0 +1,207 @@
+# db_backends.py
+"""
+Storage backends behind the database_utils API.
+
+database_utils writes its SQL once, in SQLite dialect ('?' placeholders,
+ON CONFLICT upserts, AUTOINCREMENT keys). A backend hands out connections
+that accept that SQL and translates whatever its engine needs:
+
+- SQLiteBackend: a thin wrapper around sqlite3 (the default).
+- PostgresBackend: a psycopg connection pool, with placeholder, DDL and
+  lastrowid translation so callers never see the difference.
+"""
+import re
+import sqlite3
+
+
+class SQLiteBackend:
+    """One SQLite file; a fresh connection per call (sqlite3 connections are cheap)."""
+
+    name = "sqlite"
+    errors = (sqlite3.Error,)
+    integrity_errors = (sqlite3.IntegrityError,)
+
+    def __init__(self, path):
+        self.path = path
+
+    def connect(self):
+        conn = sqlite3.connect(self.path)
+        conn.row_factory = sqlite3.Row  # allows dict-like access
+        return conn
+
+    def translate_ddl(self, sql):
+        return sql
+
+    def upsert_sql(self, table, columns, conflict_columns, update_columns):
+        placeholders = ", ".join("?" for _ in columns)
+        updates = ", ".join(f"{col} = excluded.{col}" for col in update_columns)
+        return (
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders}) "
+            f"ON CONFLICT({', '.join(conflict_columns)}) DO UPDATE SET {updates}"
+        )
+
+    def insert_ignore_sql(self, table, columns):
+        placeholders = ", ".join("?" for _ in columns)
+        return f"INSERT OR IGNORE INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+
+    def close(self):
+        pass
+
+
+# ---------------------- PostgreSQL ---------------------- #
+
+# Primary key of every table that relies on cursor.lastrowid after an INSERT.
+PRIMARY_KEYS = {
+    "users": "user_id",
+    "topics": "topic_id",
+    "mindmaps": "mindmap_id",
+    "flashcards": "flashcard_id",
+    "formula_sheets": "formula_sheet_id",
+    "quiz_results": "quiz_id",
+    "progress": "progress_id",
+    "voice_sessions": "session_id",
+    "voice_conversations": "id",
+    "partial_transcripts": "id",
+}
+
+_INSERT_TABLE = re.compile(r"^\s*INSERT\s+INTO\s+(\w+)", re.IGNORECASE)
+
+_DDL_REWRITES = [
+    (re.compile(r"INTEGER PRIMARY KEY AUTOINCREMENT", re.IGNORECASE), "BIGSERIAL PRIMARY KEY"),
+    (re.compile(r"\bREAL\b", re.IGNORECASE), "DOUBLE PRECISION"),
+    (re.compile(r"\bBLOB\b", re.IGNORECASE), "BYTEA"),
+    (re.compile(r"\(strftime\('%s',\s*'now'\)\)", re.IGNORECASE), "(EXTRACT(EPOCH FROM NOW()))"),
+]
+
+
+def translate_placeholders(sql):
+    """Converts SQLite '?' placeholders to psycopg '%s', escaping literal '%'."""
+    return sql.replace("%", "%%").replace("?", "%s")
+
+
+class _PostgresCursor:
+    """Accepts SQLite-dialect statements and emulates sqlite3's lastrowid."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.lastrowid = None
+
+    def execute(self, sql, params=None):
+        if params is None:
+            self._cursor.execute(sql)
+            return self
+        sql = translate_placeholders(sql)
+        match = _INSERT_TABLE.match(sql)
+        pk = PRIMARY_KEYS.get(match.group(1).lower()) if match else None
+        if pk and "RETURNING" not in sql.upper():
+            self._cursor.execute(f"{sql.rstrip().rstrip(';')} RETURNING {pk}", params)
+            row = self._cursor.fetchone()
+            self.lastrowid = row[pk] if row else None
+        else:
+            self._cursor.execute(sql, params)
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        self._cursor.executemany(translate_placeholders(sql), seq_of_params)
+        return self
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def close(self):
+        self._cursor.close()
+
+
+class _PooledConnection:
+    """A pooled psycopg connection whose close() hands it back to the pool."""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def cursor(self):
+        return _PostgresCursor(self._conn.cursor())
+
+    def execute(self, sql, params=None):
+        return self.cursor().execute(sql, params)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        if self._conn is not None:
+            self._pool.putconn(self._conn)
+            self._conn = None
+
+
+class PostgresBackend:
+    """PostgreSQL through a psycopg_pool.ConnectionPool shared by the whole process."""
+
+    name = "postgres"
+
+    def __init__(self, host, user, password, dbname, port=5432, min_size=1, max_size=10):
+        try:
+            import psycopg
+            from psycopg.conninfo import make_conninfo
+            from psycopg.rows import dict_row
+            from psycopg_pool import ConnectionPool
+        except ImportError as e:
+            raise RuntimeError(
+                "DB_BACKEND=postgres requires psycopg. Install it with: pip install 'psycopg[binary,pool]'"
+            ) from e
+
+        self.errors = (psycopg.Error,)
+        self.integrity_errors = (psycopg.IntegrityError,)
+        self.pool = ConnectionPool(
+            conninfo=make_conninfo(
+                host=host, user=user, password=password, dbname=dbname, port=port
+            ),
+            min_size=min_size,
+            max_size=max_size,
+            kwargs={"row_factory": dict_row},
+            open=True,
+        )
+
+    def connect(self):
+        return _PooledConnection(self.pool, self.pool.getconn())
+
+    def translate_ddl(self, sql):
+        for pattern, replacement in _DDL_REWRITES:
+            sql = pattern.sub(replacement, sql)
+        return sql
+
+    def upsert_sql(self, table, columns, conflict_columns, update_columns):
+        placeholders = ", ".join("?" for _ in columns)
+        updates = ", ".join(f"{col} = EXCLUDED.{col}" for col in update_columns)
+        return (
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders}) "
+            f"ON CONFLICT ({', '.join(conflict_columns)}) DO UPDATE SET {updates}"
+        )
+
+    def insert_ignore_sql(self, table, columns):
+        placeholders = ", ".join("?" for _ in columns)
+        return f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders}) ON CONFLICT DO NOTHING"
+
+    def close(self):
+        self.pool.close()
+
+
+def create_backend(kind, sqlite_path, host=None, user=None, password=None, dbname=None,
+                   port=5432, pool_min=1, pool_max=10):
+    """Builds the backend named by DB_BACKEND ('sqlite' or 'postgres')."""
+    kind = (kind or "sqlite").lower()
+    if kind == "sqlite":
+        return SQLiteBackend(sqlite_path)
+    if kind in ("postgres", "postgresql"):
+        return PostgresBackend(host, user, password, dbname, port=port, min_size=pool_min, max_size=pool_max)
+    raise ValueError(f"Unknown DB_BACKEND: {kind!r} (expected 'sqlite' or 'postgres')")
@@ -0,0 +1,202 @@
+# db_maintenance.py
+"""
+Routine maintenance for the SQLite database: refresh planner statistics,
+return free pages to the OS and check integrity, all inside a time budget.
+
+    python db_maintenance.py run [--budget 30] [--skip-integrity]
+    python db_maintenance.py daemon [--window 02:00-05:00] [--budget 30]
+    python db_maintenance.py enable-incremental-vacuum
+
+Every step runs under a SQLite progress handler that aborts it once the
+budget is spent, so maintenance never holds the write lock for long.
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+# --- Robust Import Logic ---
+project_root = os.path.dirname(os.path.abspath(__file__))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+import database_utils as db
+
+AUTO_VACUUM_INCREMENTAL = 2
+VACUUM_STEP_PAGES = 256      # pages freed per incremental_vacuum call
+ANALYSIS_LIMIT = 1000        # rows sampled per index by ANALYZE
+PROGRESS_OPCODES = 10000     # how often (in VM opcodes) the budget is checked
+
+
+def _log(message):
+    print(f"[maintenance {datetime.now():%Y-%m-%d %H:%M:%S}] {message}")
+
+
+def _page_stats(conn):
+    return {
+        "page_count": conn.execute("PRAGMA page_count").fetchone()[0],
+        "freelist_count": conn.execute("PRAGMA freelist_count").fetchone()[0],
+        "page_size": conn.execute("PRAGMA page_size").fetchone()[0],
+    }
+
+
+class _Budget:
+    """Deadline shared by all steps; installed as the connection's progress handler."""
+
+    def __init__(self, seconds):
+        self.deadline = time.monotonic() + seconds
+
+    def remaining(self):
+        return self.deadline - time.monotonic()
+
+    def exceeded(self):
+        # A non-zero return makes SQLite interrupt the running statement.
+        return 1 if time.monotonic() >= self.deadline else 0
+
+
+def _timed_step(name, budget, results, func):
+    if budget.remaining() <= 0:
+        results[name] = "skipped (budget spent)"
+        _log(f"{name}: skipped, budget spent")
+        return
+    started = time.perf_counter()
+    try:
+        outcome = func()
+        results[name] = outcome if outcome is not None else "ok"
+    except sqlite3.OperationalError as e:
+        results[name] = f"interrupted ({e})"
+    elapsed = time.perf_counter() - started
+    _log(f"{name}: {results[name]} in {elapsed:.2f}s")
+
+
+def run_maintenance(budget_seconds=30, integrity=True):
+    """Runs one maintenance pass and returns a dict describing what was done."""
+    if db.backend.name != "sqlite":
+        _log(f"Backend '{db.backend.name}' manages its own statistics and vacuuming; nothing to do.")
+        return {"skipped": db.backend.name}
+
+    budget = _Budget(budget_seconds)
+    conn = sqlite3.connect(db.DB_PATH, timeout=min(5, budget_seconds))
+    conn.set_progress_handler(budget.exceeded, PROGRESS_OPCODES)
+    results = {}
+    try:
+        before = _page_stats(conn)
+        _log(f"Starting on {db.DB_PATH}: {before['page_count']} pages, "
+             f"{before['freelist_count']} free, budget {budget_seconds}s")
+
+        def analyze():
+            conn.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+            conn.execute("ANALYZE")
+            conn.execute("PRAGMA optimize")
+
+        def incremental_vacuum():
+            mode = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+            if mode != AUTO_VACUUM_INCREMENTAL:
+                return "not enabled (run 'enable-incremental-vacuum' once during downtime)"
+            start_pages = conn.execute("PRAGMA page_count").fetchone()[0]
+            while budget.remaining() > 0:
+                if not conn.execute("PRAGMA freelist_count").fetchone()[0]:
+                    break
+                conn.execute(f"PRAGMA incremental_vacuum({VACUUM_STEP_PAGES})").fetchall()
+            freed = start_pages - conn.execute("PRAGMA page_count").fetchone()[0]
+            return f"freed {freed} pages"
+
+        def integrity_check():
+            problems = [row[0] for row in conn.execute("PRAGMA quick_check").fetchall()]
+            return "ok" if problems == ["ok"] else f"FAILED: {problems[:5]}"
+
+        _timed_step("analyze", budget, results, analyze)
+        _timed_step("incremental_vacuum", budget, results, incremental_vacuum)
+        if integrity:
+            _timed_step("integrity_check", budget, results, integrity_check)
+
+        conn.set_progress_handler(None, 0)
+        after = _page_stats(conn)
+        _log(f"Finished: {before['page_count']} -> {after['page_count']} pages, "
+             f"{before['freelist_count']} -> {after['freelist_count']} free")
+        results.update({"before": before, "after": after})
+        return results
+    finally:
+        conn.close()
+
+
+def enable_incremental_vacuum():
+    """Switches the database to auto_vacuum=INCREMENTAL. Runs a full VACUUM, so use it during downtime."""
+    conn = sqlite3.connect(db.DB_PATH)
+    try:
+        started = time.perf_counter()
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+        _log(f"auto_vacuum set to INCREMENTAL in {time.perf_counter() - started:.2f}s")
+    finally:
+        conn.close()
+
+
+def _parse_window(window):
+    start, end = window.split("-")
+    return (datetime.strptime(start.strip(), "%H:%M").time(),
+            datetime.strptime(end.strip(), "%H:%M").time())
+
+
+def _next_window_start(now, start):
+    candidate = datetime.combine(now.date(), start)
+    return candidate if candidate > now else candidate + timedelta(days=1)
+
+
+def _window_start(now, start):
+    """When the window containing `now` opened; a window past midnight opened the day before."""
+    candidate = datetime.combine(now.date(), start)
+    return candidate if candidate <= now else candidate - timedelta(days=1)
+
+
+def _in_window(now, start, end):
+    t = now.time()
+    return start <= t < end if start < end else (t >= start or t < end)
+
+
+def run_daemon(window="02:00-05:00", budget_seconds=30, integrity=True):
+    """Runs one maintenance pass per day inside the low-traffic window, forever."""
+    start, end = _parse_window(window)
+    _log(f"Daemon started; window {window}, budget {budget_seconds}s")
+    last_window = None
+    while True:
+        now = datetime.now()
+        # Keyed on when the window opened, so a window across midnight still runs once.
+        if _in_window(now, start, end) and last_window != _window_start(now, start):
+            try:
+                run_maintenance(budget_seconds, integrity=integrity)
+            except Exception as e:
+                _log(f"Maintenance pass failed: {e}")
+            last_window = _window_start(now, start)
+        sleep_for = (_next_window_start(datetime.now(), start) - datetime.now()).total_seconds()
+        time.sleep(max(60, min(sleep_for, 3600)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cognitive Twin database maintenance.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_p = sub.add_parser("run", help="Run one maintenance pass now")
+    run_p.add_argument("--budget", type=float, default=30, help="Time budget in seconds")
+    run_p.add_argument("--skip-integrity", action="store_true", help="Skip PRAGMA quick_check")
+
+    daemon_p = sub.add_parser("daemon", help="Run a pass every day in the maintenance window")
+    daemon_p.add_argument("--window", default="02:00-05:00", help="Local time window, HH:MM-HH:MM")
+    daemon_p.add_argument("--budget", type=float, default=30, help="Time budget in seconds")
+    daemon_p.add_argument("--skip-integrity", action="store_true", help="Skip PRAGMA quick_check")
+
+    sub.add_parser("enable-incremental-vacuum", help="One-off switch to auto_vacuum=INCREMENTAL (full VACUUM)")
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        run_maintenance(args.budget, integrity=not args.skip_integrity)
+    elif args.command == "daemon":
+        run_daemon(args.window, args.budget, integrity=not args.skip_integrity)
+    else:
+        enable_incremental_vacuum()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
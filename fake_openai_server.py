@@ -0,0 +1,403 @@
+# fake_openai_server.py
+"""
+A local, deterministic stand-in for the OpenAI Chat Completions API.
+
+It answers POST /v1/chat/completions with canned, schema-valid replies for
+every prompt this app sends: markdown summaries, notes, mind maps and formula
+sheets; JSON mode (flashcards, quiz, artifact bundle, answer analysis, voice
+turns); streaming (SSE, including stream_options.include_usage); and tool
+calls for the LangChain agent. The reply content depends only on the request.
+Latency and injected errors come from a seeded RNG, so a run is repeatable.
+
+Point any client at it by setting OPENAI_BASE_URL (the openai SDK and
+ChatOpenAI both read it):
+
+    python fake_openai_server.py --port 8787 --latency lognormal:0.8,0.5 --errors 429:0.02,500:0.01
+    OPENAI_BASE_URL=http://127.0.0.1:8787/v1 streamlit run app.py
+
+Latency specs: "fixed:S", "uniform:LO,HI" or "lognormal:MEDIAN,SIGMA" (seconds).
+The latency is the time to the first byte (time to first token for streams);
+streamed chunks are then spaced --token-delay seconds apart.
+Error specs: comma-separated KIND:RATE with KIND 429, 500, 503 or hang (the
+connection stalls for --hang-seconds, to exercise client timeouts).
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STOP_WORDS = {
+    "about", "above", "after", "again", "their", "there", "these", "those", "which", "while", "would",
+    "should", "could", "following", "provide", "detailed", "overview", "topic", "summary", "student",
+    "answer", "question", "questions", "return", "object", "format", "example", "markdown", "definition",
+    "keyword", "using", "other", "where", "being", "every", "between", "into", "from", "with", "that",
+    "this", "your", "must", "have", "text", "list", "each", "only", "json", "string", "strings",
+}
+
+
+def parse_latency(spec):
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v]
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: values[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "lognormal" and len(values) == 2:
+        return lambda rng: rng.lognormvariate(math.log(values[0]), values[1])
+    raise ValueError(f"Bad latency spec: {spec!r}")
+
+
+def parse_errors(spec):
+    errors = []
+    for item in filter(None, (spec or "").split(",")):
+        kind, _, rate = item.partition(":")
+        if kind not in ("429", "500", "503", "hang"):
+            raise ValueError(f"Bad error kind: {kind!r}")
+        errors.append((kind, float(rate)))
+    return errors
+
+
+def estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+
+# ---------------------- Canned Content ---------------------- #
+
+def _prompt_text(messages):
+    parts = []
+    for m in messages:
+        content = m.get("content") or ""
+        if isinstance(content, list):
+            content = " ".join(p.get("text", "") for p in content if isinstance(p, dict))
+        parts.append(content)
+    return "\n".join(parts)
+
+
+def _subject(text):
+    """The part of a prompt after its last source marker (the material itself), if any."""
+    for marker in ("Text:", "Notes:", "Context:", "topic:"):
+        index = text.rfind(marker)
+        if index != -1:
+            return text[index + len(marker):]
+    return text
+
+
+def _keywords(text, n=6):
+    """The most frequent content words of the text, for filling templates."""
+    counts = Counter(w for w in re.findall(r"[a-z]{5,}", text.lower()) if w not in STOP_WORDS)
+    words = [w.capitalize() for w, _ in counts.most_common(n)]
+    fillers = ["Concept", "Principle", "Method", "Model", "Process", "System"]
+    return words + fillers[:max(0, n - len(words))]
+
+
+def _summary(words):
+    sections = []
+    for word in words[:4]:
+        sections.append(
+            f"## {word}\n\n{word} is a core idea of this topic. It connects to {words[-1].lower()} "
+            f"and to {words[0].lower()} through shared principles.\n\n"
+            f"- **Definition**: what {word.lower()} means and where it applies.\n"
+            f"- **Example**: a worked case showing {word.lower()} in practice.\n"
+            f"- **Pitfall**: a common misconception about {word.lower()}.\n"
+        )
+    return f"# {words[0]} Overview\n\n" + "\n".join(sections)
+
+
+def _mindmap(words):
+    lines = [f"# {words[0]}"]
+    for word in words[1:4]:
+        lines += [f"## {word}", f"### {word} basics", f"- Key point about {word.lower()}",
+                  f"### {word} in practice", f"- Example of {word.lower()}"]
+    return "\n".join(lines)
+
+
+def _formula_sheet(words):
+    return (f"## Key Definitions\n* **{words[0]}**: The central idea of the topic.\n"
+            f"* **{words[1]}**: A supporting concept.\n\n"
+            f"## Important Formulas\n**{words[2]} relation**\n$${words[2][0]} = {words[3][0]} \\times {words[4][0]}$$\n")
+
+
+def _flashcards(words):
+    return [{"keyword": w, "definition": f"{w} is a key concept related to {words[0].lower()}."} for w in words]
+
+
+def _quiz(text, words):
+    match = re.search(r"quiz with (\d+) questions", text)
+    total = int(match.group(1)) if match else 5
+    counts = {kind: int(m.group(1)) for kind, m in (
+        ("MCQ", re.search(r"(\d+) Multiple Choice", text)),
+        ("T/F", re.search(r"(\d+) True/False", text)),
+        ("Short", re.search(r"(\d+) Short Answer", text)),
+    ) if m}
+    kinds = ["MCQ"] * counts.get("MCQ", total) + ["T/F"] * counts.get("T/F", 0) + ["Short"] * counts.get("Short", 0)
+    quiz = []
+    for i, kind in enumerate(kinds[:total]):
+        word = words[i % len(words)]
+        question = {"type": kind, "topic": word}
+        if kind == "MCQ":
+            question.update(question=f"Which statement best describes {word.lower()}? ({i + 1})",
+                            options=[f"A. {word} is the correct idea", "B. An unrelated idea",
+                                     "C. The opposite idea", "D. None of these"],
+                            answer="A")
+        elif kind == "T/F":
+            question.update(question=f"{word} is part of this topic. ({i + 1})", options=["True", "False"],
+                            answer="True")
+        else:
+            question.update(question=f"Name the concept described as {word.lower()}. ({i + 1})",
+                            answer_keywords=[word])
+        quiz.append(question)
+    return {"quiz": quiz}
+
+
+def json_reply(text, words):
+    """A JSON object in the shape the prompt asks for."""
+    if '"quiz"' in text:
+        return _quiz(text, words)
+    if '"mindmap"' in text and '"flashcards"' in text:
+        return {"mindmap": _mindmap(words), "flashcards": _flashcards(words), "formula_sheet": _formula_sheet(words)}
+    if '"flashcards"' in text:
+        return {"flashcards": _flashcards(words)}
+    if '"ai_reply"' in text:
+        return {"type": "question", "ai_reply": f"Good start on {words[0].lower()}. What would change if "
+                                                f"{words[1].lower()} were removed?",
+                "analysis": f"Partially correct; {words[1].lower()} was not mentioned.",
+                "next_objective": f"Relate {words[0].lower()} to {words[1].lower()}"}
+    if '"grade"' in text:
+        return {"grade": "partial", "confidence": 0.6, "misconceptions": [f"{words[0].lower()}_scope"],
+                "feedback": f"Close! Think again about how {words[0].lower()} works."}
+    return {"result": words[0]}
+
+
+def text_reply(text, words):
+    if "markdown mindmap" in text:
+        return _mindmap(words)
+    if "key formulas" in text:
+        return _formula_sheet(words)
+    if "study notes" in text:
+        return "\n".join(f"- **{w}**: condensed note on {w.lower()}." for w in words)
+    if "Question:" in text:
+        return f"{words[0]} is explained in the topic material: it relates to {words[1].lower()}."
+    if "summary of the following text" in text:
+        return _summary(words)
+    return f"{words[0]} builds on {words[1].lower()}. Can you explain how they relate?"
+
+
+def tool_call(body, text):
+    """Picks a tool the way the agent's rules do (score below 70 -> first tool) and fills its arguments."""
+    tools = [t["function"] for t in body["tools"] if t.get("type") == "function"]
+    score = re.search(r"Quiz Score:\s*(\d+)", text)
+    tool = tools[0] if score is None or int(score.group(1)) < 70 or len(tools) < 2 else tools[1]
+    args = {}
+    for name, schema in (tool.get("parameters") or {}).get("properties", {}).items():
+        kind = schema.get("type")
+        args[name] = (["Sample"] if kind == "array" else 0 if kind in ("integer", "number")
+                      else False if kind == "boolean" else {} if kind == "object" else "sample")
+    return {"id": f"call_{hashlib.sha256(text.encode()).hexdigest()[:24]}", "type": "function",
+            "function": {"name": tool["name"], "arguments": json.dumps(args)}}
+
+
+def build_reply(body):
+    """Returns (content, tool_calls) for a chat completion request."""
+    messages = body.get("messages", [])
+    text = _prompt_text(messages)
+    words = _keywords(_subject(_prompt_text(messages[-1:])) or text)
+    if body.get("tools") and not any(m.get("role") == "tool" for m in messages):
+        return None, [tool_call(body, text)]
+    if body.get("tools"):
+        return f"Done. {messages[-1].get('content') or 'The recommended step was taken.'}", None
+    wants_json = (body.get("response_format") or {}).get("type") in ("json_object", "json_schema")
+    if wants_json or "Return ONLY JSON" in text or "JSON object only" in text:
+        return json.dumps(json_reply(text, words)), None
+    return text_reply(text, words), None
+
+
+# ---------------------- Server ---------------------- #
+
+class FakeOpenAI:
+    """Shared state: latency sampler, error injection and request counters."""
+
+    def __init__(self, latency="fixed:0.2", token_delay=0.01, errors="", seed=0, hang_seconds=120.0,
+                 retry_after_ms=500):
+        self.latency = parse_latency(latency)
+        self.token_delay = token_delay
+        self.errors = parse_errors(errors)
+        self.seed = seed
+        self.hang_seconds = hang_seconds
+        self.retry_after_ms = retry_after_ms
+        self.stats = Counter()
+        self._seen = Counter()
+        self._lock = threading.Lock()
+
+    def rng_for(self, raw_body):
+        """An RNG seeded by the request and how often it was seen, so retries draw fresh numbers."""
+        digest = hashlib.sha256(raw_body).hexdigest()
+        with self._lock:
+            self._seen[digest] += 1
+            occurrence = self._seen[digest]
+        return random.Random(f"{self.seed}:{digest}:{occurrence}")
+
+    def pick_error(self, rng):
+        roll = rng.random()
+        for kind, rate in self.errors:
+            if roll < rate:
+                return kind
+            roll -= rate
+        return None
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    fake = None  # set by make_server
+
+    def log_message(self, format, *args):
+        pass  # the benchmark reports its own numbers
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, kind):
+        if kind == "hang":
+            time.sleep(self.fake.hang_seconds)
+            self.close_connection = True
+            return
+        status = int(kind)
+        error_type = "rate_limit_exceeded" if status == 429 else "server_error"
+        headers = {"retry-after-ms": str(self.fake.retry_after_ms)} if status == 429 else {}
+        self._send_json(status, {"error": {"message": f"Injected {status}", "type": error_type,
+                                           "code": error_type, "param": None}}, headers)
+
+    def do_GET(self):
+        if self.path.rstrip("/") in ("/v1/models", "/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": "gpt-4o-mini", "object": "model"}]})
+        elif self.path.rstrip("/") == "/stats":
+            self._send_json(200, dict(self.fake.stats))
+        else:
+            self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+
+    def do_POST(self):
+        raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path.rstrip("/") not in ("/v1/chat/completions", "/chat/completions"):
+            self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+            return
+        try:
+            body = json.loads(raw)
+        except ValueError:
+            self._send_json(400, {"error": {"message": "Invalid JSON body", "type": "invalid_request_error"}})
+            return
+
+        rng = self.fake.rng_for(raw)
+        self.fake.stats["requests"] += 1
+        error = self.fake.pick_error(rng)
+        time.sleep(max(0.0, self.fake.latency(rng)))
+        if error:
+            self.fake.stats[f"error_{error}"] += 1
+            self._send_error(error)
+            return
+
+        content, tool_calls = build_reply(body)
+        prompt_tokens = estimate_tokens(_prompt_text(body.get("messages", [])))
+        completion_tokens = estimate_tokens(content or json.dumps(tool_calls))
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                 "total_tokens": prompt_tokens + completion_tokens,
+                 "prompt_tokens_details": {"cached_tokens": 0},
+                 "completion_tokens_details": {"reasoning_tokens": 0}}
+        base = {"id": f"chatcmpl-{uuid.uuid4().hex[:24]}", "created": int(time.time()),
+                "model": body.get("model", "gpt-4o-mini"), "system_fingerprint": "fp_fake"}
+        finish_reason = "tool_calls" if tool_calls else "stop"
+
+        if body.get("stream"):
+            self._stream(base, content, tool_calls, finish_reason, usage,
+                         (body.get("stream_options") or {}).get("include_usage"))
+            return
+        message = {"role": "assistant", "content": content, "refusal": None}
+        if tool_calls:
+            message["tool_calls"] = tool_calls
+        self._send_json(200, {**base, "object": "chat.completion", "usage": usage, "choices": [
+            {"index": 0, "message": message, "finish_reason": finish_reason, "logprobs": None}
+        ]})
+
+    def _stream(self, base, content, tool_calls, finish_reason, usage, include_usage):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def send(choices, **extra):
+            chunk = {**base, "object": "chat.completion.chunk", "choices": choices, **extra}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        try:
+            send([{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}])
+            if tool_calls:
+                calls = [{"index": i, **call} for i, call in enumerate(tool_calls)]
+                send([{"index": 0, "delta": {"tool_calls": calls}, "finish_reason": None}])
+            for i, piece in enumerate(re.findall(r"\S+\s*", content or "")):
+                if i:
+                    time.sleep(self.fake.token_delay)
+                send([{"index": 0, "delta": {"content": piece}, "finish_reason": None}])
+            send([{"index": 0, "delta": {}, "finish_reason": finish_reason}])
+            if include_usage:
+                send([], usage=usage)
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client stopped reading
+
+
+def make_server(host="127.0.0.1", port=8787, **options):
+    """Builds the HTTP server (port 0 picks a free port). Call serve_forever() on it."""
+    handler = type("FakeOpenAIHandler", (Handler,), {"fake": FakeOpenAI(**options)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_in_thread(host="127.0.0.1", port=0, **options):
+    """Starts a server on a daemon thread. Returns (server, base_url); call server.shutdown() to stop."""
+    server = make_server(host, port, **options)
+    threading.Thread(target=server.serve_forever, name="fake-openai", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Deterministic fake OpenAI Chat Completions server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--latency", default="fixed:0.2", help="fixed:S | uniform:LO,HI | lognormal:MEDIAN,SIGMA")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="Seconds between streamed chunks")
+    parser.add_argument("--errors", default="", help="e.g. 429:0.05,500:0.01,hang:0.005")
+    parser.add_argument("--hang-seconds", type=float, default=120.0)
+    parser.add_argument("--retry-after-ms", type=int, default=500, help="Retry-After sent with injected 429s")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    server = make_server(args.host, args.port, latency=args.latency, token_delay=args.token_delay,
+                         errors=args.errors, seed=args.seed, hang_seconds=args.hang_seconds,
+                         retry_after_ms=args.retry_after_ms)
+    print(f"Fake OpenAI server on http://{args.host}:{server.server_address[1]}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,135 @@
+# generation_orchestrator.py
+"""
+Generates a topic's derived artifacts (mind map, flashcards, formula sheet)
+concurrently once its summary is ready.
+
+The three generators only depend on the summary, so they run side by side on
+a thread pool. Onboarding then takes roughly the summary time plus the
+slowest artifact, instead of the sum of all four. Each artifact has its own
+timeout, and a failure or timeout in one never affects the others.
+Flashcards can also be streamed card by card (see `on_progress`).
+"""
+import os
+import queue
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# --- Robust Import Logic ---
+project_root = os.path.dirname(os.path.abspath(__file__))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+import generative_ai
+from config import GENERATION_BUNDLE_MODE
+
+ARTIFACT_GENERATORS = {
+    "mindmap": generative_ai.generate_mindmap_markdown,
+    "flashcards": generative_ai.generate_flashcards,
+    "formula_sheet": generative_ai.generate_formula_sheet,
+}
+
+DEFAULT_TIMEOUT_SECONDS = 90
+PROGRESS_POLL_SECONDS = 0.1
+
+
+def _stream_flashcards(summary, emit):
+    """Emits cards as they stream in; a failed or truncated stream falls back to one plain request."""
+    cards = []
+    try:
+        for card in generative_ai.stream_flashcards(summary):
+            cards.append(card)
+            emit(card)
+    except Exception as e:
+        # The cards emitted so far were only a preview; never return them as the result.
+        print(f"Flashcard stream failed after {len(cards)} cards ({e}); retrying without streaming")
+        return generative_ai.generate_flashcards(summary)
+    return {"flashcards": cards} if cards else None
+
+
+# Artifacts that can report partial results: fn(summary, emit) -> final value.
+ARTIFACT_STREAMERS = {
+    "flashcards": _stream_flashcards,
+}
+
+
+def generate_artifacts(summary, artifacts=tuple(ARTIFACT_GENERATORS), on_artifact=None, timeouts=None,
+                       bundle_mode=None, on_progress=None):
+    """
+    Runs the requested artifact generators concurrently on `summary`.
+
+    `on_artifact(name, value)` is called as each artifact arrives. It runs on
+    the calling thread, so it can safely touch Streamlit state or the DB.
+    `on_progress(name, item)` is called, also on the calling thread, with each
+    piece of an artifact in ARTIFACT_STREAMERS as it streams in (e.g. each card).
+    `timeouts` maps artifact name to seconds (default DEFAULT_TIMEOUT_SECONDS).
+    In bundle mode (GENERATION_BUNDLE_MODE, or `bundle_mode=True`) one fused request
+    is tried first, and only the sections it failed to produce are fanned out.
+
+    Returns (results, errors): {name: value} for artifacts that succeeded and
+    {name: reason} for the ones that failed, returned nothing or timed out.
+    """
+    timeouts = timeouts or {}
+    results, errors = {}, {}
+    if bundle_mode is None:
+        bundle_mode = GENERATION_BUNDLE_MODE
+    if bundle_mode and len(artifacts) > 1:
+        bundle = generative_ai.generate_artifact_bundle(summary)
+        for name in artifacts:
+            if name in bundle:
+                results[name] = bundle[name]
+                if on_artifact:
+                    on_artifact(name, bundle[name])
+        artifacts = [name for name in artifacts if name not in results]
+    if not artifacts:
+        return results, errors
+
+    pool = ThreadPoolExecutor(max_workers=len(artifacts), thread_name_prefix="artifact")
+    started = time.monotonic()
+    progress = queue.Queue()
+    pending = {}
+    for name in artifacts:
+        if on_progress and name in ARTIFACT_STREAMERS:
+            emit = lambda item, name=name: progress.put((name, item))
+            pending[pool.submit(ARTIFACT_STREAMERS[name], summary, emit)] = name
+        else:
+            pending[pool.submit(ARTIFACT_GENERATORS[name], summary)] = name
+    deadlines = {name: started + timeouts.get(name, DEFAULT_TIMEOUT_SECONDS) for name in artifacts}
+    try:
+        while pending:
+            next_deadline = min(deadlines[name] for name in pending.values())
+            timeout = max(0, next_deadline - time.monotonic())
+            if on_progress:
+                timeout = min(timeout, PROGRESS_POLL_SECONDS)
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            while on_progress and not progress.empty():
+                name, item = progress.get()
+                if name in pending.values():
+                    on_progress(name, item)
+
+            for future in done:
+                name = pending.pop(future)
+                try:
+                    value = future.result()
+                except Exception as e:
+                    errors[name] = f"failed: {e}"
+                    continue
+                if not value:
+                    errors[name] = "generator returned no content"
+                    continue
+                results[name] = value
+                if on_artifact:
+                    on_artifact(name, value)
+
+            now = time.monotonic()
+            for future, name in list(pending.items()):
+                if now >= deadlines[name]:
+                    future.cancel()
+                    pending.pop(future)
+                    errors[name] = f"timed out after {timeouts.get(name, DEFAULT_TIMEOUT_SECONDS)}s"
+    finally:
+        # Don't block on stragglers that already timed out; their results are discarded.
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    for name, reason in errors.items():
+        print(f"Artifact generation for {name} {reason}")
+    return results, errors
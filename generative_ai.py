@@ -3,6 +3,7 @@
 import openai
 import json
 import os
+import re
 import sys # <-- IMPORTED SYS
 
 
@@ -12,153 +13,659 @@ import sys # <-- IMPORTED SYS
 project_root = os.path.dirname(os.path.abspath(__file__))
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
-from config import OPENAI_API_KEY
-from openai import OpenAI
+from config import QA_TOP_K, QA_CHUNK_TOKENS
+import asyncio
+import concurrent.futures
+import threading
+import weakref
+import llm_cache
+import llm_clients
+import llm_metrics
+import model_routing
+from rate_limiter import limiter
+import prompt_budget
+import prompt_templates
+import retrieval
+from json_stream import ArrayItems
 
-# Initialize OpenAI client
-client = OpenAI(api_key=OPENAI_API_KEY)
+# --- Async core ---
+# Every generator is implemented once, as a coroutine. The synchronous functions
+# used by the Streamlit app are thin wrappers that run those coroutines on one
+# long-lived background event loop, so the app and async servers share a single
+# code path. Each event loop gets its own AsyncOpenAI client, because the client
+# is bound to the loop it was created on; all of them share llm_clients' pooled
+# connections. Concurrency, quotas and retries are handled process-wide by
+# rate_limiter, so the client's own retries are off.
 
-def get_json_response(prompt):
-    """Helper function to get a JSON response from the AI."""
+_loop_resources = weakref.WeakKeyDictionary()
+_background_loop = None
+_background_lock = threading.Lock()
+
+def _client():
+    """Returns the AsyncOpenAI client for the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _loop_resources.get(loop)
+    if client is None:
+        client = llm_clients.async_openai_client(max_retries=0)
+        _loop_resources[loop] = client
+    return client
+
+def _get_background_loop():
+    global _background_loop
+    with _background_lock:
+        if _background_loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="generative-ai-loop", daemon=True).start()
+            _background_loop = loop
+        return _background_loop
+
+def _run(coro):
+    """Runs a coroutine on the background loop and blocks until it finishes."""
+    loop = _get_background_loop()
+    try:
+        if asyncio.get_running_loop() is loop:
+            coro.close()
+            raise RuntimeError("Synchronous generative_ai calls cannot be made from inside the async API; await the a* variant instead.")
+    except RuntimeError as e:
+        if "no running event loop" not in str(e):
+            raise
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+def _iterate(agen):
+    """Drives an async generator on the background loop, yielding its items synchronously."""
+    loop = _get_background_loop()
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini", # Use a model that's good at JSON
-            messages=[
-                {"role": "system", "content": "You are a helpful learning assistant. You must output valid JSON."},
-                {"role": "user", "content": prompt}
-            ],
-            response_format={"type": "json_object"}
+        while True:
+            try:
+                yield asyncio.run_coroutine_threadsafe(agen.__anext__(), loop).result()
+            except StopAsyncIteration:
+                return
+    finally:
+        asyncio.run_coroutine_threadsafe(agen.aclose(), loop).result()
+
+# --- Token budgets ---
+# Max source-text tokens per generator. Source text over the input budget is
+# trimmed before the prompt is built, and every request is checked against the
+# model's context window before it is sent. Models, output budgets (max_tokens)
+# and temperatures come from model_routing.
+INPUT_BUDGETS = {
+    "generate_summary": 12000,
+    "summarize_chunk": 3000,
+    "merge_notes": 8000,
+    "generate_mindmap_markdown": 8000,
+    "generate_flashcards": 8000,
+    "generate_formula_sheet": 8000,
+    "generate_artifact_bundle": 8000,
+    "generate_quiz": 8000,
+    "answer_question": 6000,
+    "voice_turn": 4000,
+}
+
+def _fit_source(function, text, model=None):
+    """Trims source text to the input budget of `function`."""
+    max_input = INPUT_BUDGETS.get(function)
+    if max_input is None or not text:
+        return text
+    model = model or model_routing.route(function)["models"][0]
+    return prompt_budget.fit_text(function, text, max_input, model)
+
+def _routed(function, messages, model, params):
+    """
+    Applies the route of `function` (model chain, max_tokens, temperature) and
+    checks the prompt fits the first model. Returns (models, budget report).
+    """
+    route = model_routing.route(function, model)
+    model_routing.apply_defaults(route, params)
+    return route["models"], prompt_budget.check_fits(function, messages, route["models"][0], params.get("max_tokens"))
+
+# --- Single-flight ---
+# Identical cacheable requests that are in flight at the same time share one
+# upstream call. Within a process, duplicates await the leader's future (a
+# concurrent.futures.Future, so callers on any event loop can wait on it).
+# Across processes, the leader holds a lease in llm_cache's lock table and the
+# others poll the cache for its result.
+SINGLE_FLIGHT_POLL_SECONDS = 0.25
+SINGLE_FLIGHT_LEASE_SECONDS = 180
+
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+def _join_flight(key):
+    """Returns (future, is_leader) for `key`."""
+    with _inflight_lock:
+        future = _inflight.get(key)
+        if future is not None:
+            return future, False
+        future = concurrent.futures.Future()
+        _inflight[key] = future
+        return future, True
+
+def _finish_flight(key, future, result=None, error=None):
+    with _inflight_lock:
+        _inflight.pop(key, None)
+    if error is None:
+        future.set_result(result)
+    elif isinstance(error, Exception):
+        future.set_exception(error)
+    else:
+        # The leader was cancelled or closed; followers get an ordinary error instead.
+        future.set_exception(RuntimeError(f"Coalesced request was abandoned: {type(error).__name__}"))
+
+async def _acquire_cross_process_flight(function, key):
+    """
+    Waits for the cross-process lease on `key`. Returns a response another process
+    cached in the meantime (lease not held), or None once this process holds the lease.
+    """
+    while not await asyncio.to_thread(llm_cache.acquire_flight, key, SINGLE_FLIGHT_LEASE_SECONDS):
+        await asyncio.sleep(SINGLE_FLIGHT_POLL_SECONDS)
+        cached = await asyncio.to_thread(llm_cache.get, function, key, False)
+        if cached is not None:
+            return cached
+    # The previous holder may have finished just before we took over.
+    cached = await asyncio.to_thread(llm_cache.get, function, key, False)
+    if cached is not None:
+        await asyncio.to_thread(llm_cache.release_flight, key)
+    return cached
+
+async def _acreate(function, messages, models, tokens, **params):
+    """
+    One rate-limited API call, falling back along `models` if it keeps failing;
+    `tokens` is the estimated prompt + output size for the TPM budget.
+    """
+    client = _client()
+    model = models[0]
+    while True:
+        try:
+            with llm_metrics.track(function, model) as call:
+                response = await limiter.run(
+                    lambda: client.chat.completions.create(model=model, messages=messages, **params), tokens
+                )
+                usage = getattr(response, "usage", None)
+                call.usage(usage)
+            break
+        except Exception as e:
+            model = model_routing.next_model(function, models, model, e)
+            if model is None:
+                raise
+    limiter.settle(tokens, usage.total_tokens if usage else None)
+    return response.choices[0].message.content
+
+async def _astream_create(function, messages, models, tokens, **params):
+    """
+    Streaming _acreate. Falls back to the next model only if the stream fails
+    before its first delta; a partly delivered answer cannot be restarted.
+    """
+    client = _client()
+    model = models[0]
+    while True:
+        started = False
+        deltas = _astream_model(client, function, messages, model, tokens, **params)
+        try:
+            async for delta in deltas:
+                started = True
+                yield delta
+            return
+        except Exception as e:
+            model = None if started else model_routing.next_model(function, models, model, e)
+            if model is None:
+                raise
+        finally:
+            # Release the concurrency slot now, even if our consumer stopped early.
+            await deltas.aclose()
+
+async def _astream_model(client, function, messages, model, tokens, **params):
+    """Rate-limited streaming call. The concurrency slot is held until the stream ends."""
+    with llm_metrics.track(function, model) as call:
+        call.stream = True
+        stream = await limiter.run(
+            lambda: client.chat.completions.create(
+                model=model, messages=messages, stream=True,
+                stream_options={"include_usage": True}, **params
+            ),
+            tokens, hold_slot=True
+        )
+        usage = None
+        try:
+            async for chunk in stream:
+                # With include_usage the last chunk has no choices, only the usage.
+                if getattr(chunk, "usage", None):
+                    usage = chunk.usage
+                    call.usage(usage)
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    call.first_token()
+                    yield delta
+        finally:
+            # Time to first token is the latency signal; a long answer is not congestion.
+            limiter.finish(call.ttft)
+            limiter.settle(tokens, usage.total_tokens if usage else None)
+
+async def _achat_completion(function, messages, model=None, validate=None, **params):
+    """
+    Runs one chat completion and returns the message text.
+    The model comes from the route of `function` unless `model` pins it.
+    Identical requests are served from llm_cache unless `function` is in
+    LLM_CACHE_BYPASS; `validate` can veto caching a response (e.g. invalid JSON).
+    Concurrent identical cacheable requests are coalesced into one API call.
+    Raises prompt_budget.PromptTooLarge if the request cannot fit the model.
+    """
+    models, budget = _routed(function, messages, model, params)
+    model = models[0]  # a fallback model's answer is cached under the routed model
+    tokens = budget["prompt_tokens"] + budget["max_output_tokens"]
+    if not llm_cache.is_enabled(function):
+        return await _acreate(function, messages, models, tokens, **params)
+
+    key = llm_cache.make_key(function, model, messages, params)
+    cached = await asyncio.to_thread(llm_cache.get, function, key)
+    if cached is not None:
+        llm_metrics.served(function, model, "cache")
+        return cached
+
+    future, leader = _join_flight(key)
+    if not leader:
+        llm_metrics.served(function, model, "coalesced")
+        return await asyncio.wrap_future(future)
+    try:
+        content = await _acquire_cross_process_flight(function, key)
+        if content is not None:
+            llm_metrics.served(function, model, "coalesced")
+        else:
+            try:
+                content = await _acreate(function, messages, models, tokens, **params)
+                if content and (validate is None or validate(content)):
+                    await asyncio.to_thread(llm_cache.put, function, model, key, content)
+            finally:
+                await asyncio.to_thread(llm_cache.release_flight, key)
+    except BaseException as e:
+        _finish_flight(key, future, error=e)
+        raise
+    _finish_flight(key, future, content)
+    return content
+
+def _chat_completion(function, messages, model=None, validate=None, **params):
+    return _run(_achat_completion(function, messages, model=model, validate=validate, **params))
+
+async def _astream_chat_completion(function, messages, model=None, validate=None, **params):
+    """
+    Streaming counterpart of _achat_completion: yields text deltas as they arrive.
+    A cache hit is yielded in one piece; a completed stream is written to the cache
+    (if `validate` accepts it).
+    Duplicates of an in-flight stream get the leader's full text in one piece.
+    """
+    models, budget = _routed(function, messages, model, params)
+    model = models[0]
+    tokens = budget["prompt_tokens"] + budget["max_output_tokens"]
+    if not llm_cache.is_enabled(function):
+        async for delta in _astream_create(function, messages, models, tokens, **params):
+            yield delta
+        return
+
+    key = llm_cache.make_key(function, model, messages, params)
+    cached = await asyncio.to_thread(llm_cache.get, function, key)
+    if cached is not None:
+        llm_metrics.served(function, model, "cache")
+        yield cached
+        return
+
+    future, leader = _join_flight(key)
+    if not leader:
+        llm_metrics.served(function, model, "coalesced")
+        yield await asyncio.wrap_future(future)
+        return
+    try:
+        content = await _acquire_cross_process_flight(function, key)
+        if content is not None:
+            llm_metrics.served(function, model, "coalesced")
+            yield content
+        else:
+            parts = []
+            try:
+                async for delta in _astream_create(function, messages, models, tokens, **params):
+                    parts.append(delta)
+                    yield delta
+                content = "".join(parts)
+                if content and (validate is None or validate(content)):
+                    await asyncio.to_thread(llm_cache.put, function, model, key, content)
+            finally:
+                await asyncio.to_thread(llm_cache.release_flight, key)
+    except BaseException as e:
+        _finish_flight(key, future, error=e)
+        raise
+    _finish_flight(key, future, content)
+
+def _is_json(content):
+    try:
+        json.loads(content)
+        return True
+    except ValueError:
+        return False
+
+def _json_messages(prompt):
+    return [
+        {"role": "system", "content": "You are a helpful learning assistant. You must output valid JSON."},
+        {"role": "user", "content": prompt}
+    ]
+
+async def _ajson_completion(function, messages, **params):
+    """JSON-mode completion of `messages`, parsed; None if the call or the JSON fails."""
+    try:
+        content = await _achat_completion(
+            function,
+            messages,
+            validate=_is_json,
+            response_format={"type": "json_object"},
+            **params
         )
-        content = response.choices[0].message.content
         return json.loads(content)
     except Exception as e:
         print(f"Error getting JSON response from AI: {e}")
         return None
 
-def generate_summary(text):
-    """Generates a detailed summary of the given text."""
-    prompt = f"""
-    Please provide a detailed, well-structured summary of the following text.
-    The summary should be suitable for a student trying to learn this topic from scratch.
-    Use markdown for formatting, including headings, subheadings, and bullet points.
-    
-    Text:
-    {text}
+async def aget_json_response(prompt, function="get_json_response", **params):
+    """Helper function to get a JSON response from the AI."""
+    return await _ajson_completion(function, _json_messages(prompt), **params)
+
+def get_json_response(prompt, function="get_json_response", **params):
+    return _run(aget_json_response(prompt, function=function, **params))
+
+async def _astream_json_items(function, messages, key, is_valid, **params):
+    """
+    Streams a JSON-mode completion and yields each object of its `key` list as soon
+    as it is complete and passes `is_valid`. Raises if the call fails midway or the
+    stream ends without a complete JSON body (e.g. cut off at max_tokens); the items
+    already yielded are then only a preview and must be discarded by the caller.
+    """
+    items = ArrayItems(key)
+    async for delta in _astream_chat_completion(
+        function, messages, validate=_is_json, response_format={"type": "json_object"}, **params
+    ):
+        for item in items.feed(delta):
+            if is_valid(item):
+                yield item
+    if not _is_json(items.text):
+        raise ValueError(f"{function}: streamed JSON response ended before it was complete")
+
+def _summary_messages(text):
+    return prompt_templates.render("summary", text=text)
+
+# --- Long documents: map-reduce summarization ---
+# Texts above LONG_DOCUMENT_TOKENS are split into section-aligned chunks, each
+# chunk is condensed into notes in parallel (map), and the notes are merged in
+# rounds until they fit one prompt (reduce). The final summary is written from
+# those notes. Chunk and merge calls go through the LLM cache, so re-uploading
+# a document only pays for the chunks that changed.
+LONG_DOCUMENT_TOKENS = INPUT_BUDGETS["generate_summary"]
+CHUNK_TOKENS = INPUT_BUDGETS["summarize_chunk"]
+REDUCE_INPUT_TOKENS = INPUT_BUDGETS["merge_notes"]
+
+_HEADING = re.compile(r"^(#{1,6}\s|chapter\b|section\b|\d+(\.\d+)*\s+[A-Z])", re.IGNORECASE)
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+def _split_oversized(block, max_tokens):
+    """Splits a block that alone exceeds the budget, by sentence and then by length."""
+    pieces, current = [], ""
+    for sentence in _SENTENCE_END.split(block):
+        while prompt_budget.count_tokens(sentence) > max_tokens:
+            head = prompt_budget.truncate_to_tokens(sentence, max_tokens)
+            pieces.append(head)
+            sentence = sentence[len(head):]
+        if current and prompt_budget.count_tokens(current + " " + sentence) > max_tokens:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}".strip()
+    if current:
+        pieces.append(current)
+    return pieces
+
+def split_into_chunks(text, max_tokens=CHUNK_TOKENS):
+    """
+    Splits text into chunks of at most ~max_tokens, breaking on paragraph
+    boundaries and preferring to start a new chunk at a section heading.
+    """
+    blocks = [b.strip() for b in re.split(r"\n\s*\n|\f", text) if b.strip()]
+    chunks, current, current_tokens = [], [], 0
+    for block in blocks:
+        block_tokens = prompt_budget.count_tokens(block)
+        if block_tokens > max_tokens:
+            if current:
+                chunks.append("\n\n".join(current))
+                current, current_tokens = [], 0
+            chunks.extend(_split_oversized(block, max_tokens))
+            continue
+        starts_section = bool(_HEADING.match(block)) and current_tokens > max_tokens // 2
+        if current and (current_tokens + block_tokens > max_tokens or starts_section):
+            chunks.append("\n\n".join(current))
+            current, current_tokens = [], 0
+        current.append(block)
+        current_tokens += block_tokens
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+async def _asummarize_chunk(chunk):
+    # Keyed by the chunk's text alone, so unchanged sections hit the cache on re-upload.
+    return await _achat_completion("summarize_chunk", prompt_templates.render("summarize_chunk", text=chunk))
+
+async def _amerge_notes(notes):
+    joined = "\n\n---\n\n".join(notes)
+    return await _achat_completion("merge_notes", prompt_templates.render("merge_notes", notes=joined))
+
+def _group_by_budget(notes, max_tokens):
+    groups, current, current_tokens = [], [], 0
+    for note in notes:
+        tokens = prompt_budget.count_tokens(note)
+        if current and current_tokens + tokens > max_tokens:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(note)
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+async def acondense_long_document(text):
+    """
+    Map-reduce a long document down to notes that fit a single summary prompt.
+    Short texts are returned unchanged.
     """
+    if prompt_budget.count_tokens(text) <= LONG_DOCUMENT_TOKENS:
+        return text
+
+    chunks = split_into_chunks(text)
+    results = await asyncio.gather(
+        *[_asummarize_chunk(chunk) for chunk in chunks],
+        return_exceptions=True
+    )
+    notes = [r for r in results if isinstance(r, str) and r]
+    failed = len(chunks) - len(notes)
+    if not notes:
+        raise RuntimeError(f"All {len(chunks)} chunk summaries failed.")
+    if failed:
+        print(f"Warning: {failed} of {len(chunks)} chunk summaries failed and were skipped.")
+
+    while len(notes) > 1 and prompt_budget.count_tokens("\n\n".join(notes)) > REDUCE_INPUT_TOKENS:
+        groups = _group_by_budget(notes, REDUCE_INPUT_TOKENS)
+        if len(groups) == len(notes):
+            # Every note already fills a prompt on its own; pair them up so the round still shrinks.
+            groups = [notes[i:i + 2] for i in range(0, len(notes), 2)]
+        notes = await asyncio.gather(*[_amerge_notes(group) for group in groups])
+    return "\n\n".join(notes)
+
+async def agenerate_summary(text):
+    """Generates a detailed summary of the given text (map-reduce for long documents)."""
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a helpful learning assistant."},
-                {"role": "user", "content": prompt}
-            ]
-        )
-        return response.choices[0].message.content
+        text = _fit_source("generate_summary", await acondense_long_document(text))
+        return await _achat_completion("generate_summary", _summary_messages(text))
     except Exception as e:
         print(f"Error generating summary: {e}")
         return "Error: Could not generate summary."
 
-def generate_mindmap_markdown(text):
+def generate_summary(text):
+    return _run(agenerate_summary(text))
+
+async def astream_summary(text):
+    """
+    Streaming variant of generate_summary; yields markdown chunks.
+    Raises if the call fails, even after some chunks were yielded: those are
+    then an incomplete summary and must be discarded.
+    """
+    text = _fit_source("generate_summary", await acondense_long_document(text))
+    async for delta in _astream_chat_completion("generate_summary", _summary_messages(text)):
+        yield delta
+
+def stream_summary(text):
+    """Synchronous stream_summary for st.write_stream."""
+    return _iterate(astream_summary(text))
+
+def _mindmap_messages(text):
+    text = _fit_source("generate_mindmap_markdown", text)
+    return prompt_templates.render("mindmap", text=text)
+
+async def agenerate_mindmap_markdown(text):
     """Generate mindmap markdown using OpenAI."""
     try:
-        max_chars = 30000
-        if len(text) > max_chars:
-            text = text[:max_chars] + "..."
-            print(f"Warning: Text was truncated to {max_chars} characters.")
-
-        prompt = f"""
-Create a hierarchical markdown mindmap from the following text. 
-Use proper markdown heading syntax (# for main topics, ## for subtopics, ### for details).
-Focus on the main concepts and their relationships.
-
-Format the output exactly like this example:
-# Main Topic
-## Subtopic 1
-### Detail 1
-- Key point 1
-### Detail 2
-## Subtopic 2
-### Detail 3
-
-Text to analyze: {text}
-
-Respond only with the markdown mindmap, no additional explanation.
-"""
-
-        response = client.chat.completions.create(
-            model="gpt-4o-mini", 
-            messages=[
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=2048
+        markdown = await _achat_completion(
+            "generate_mindmap_markdown", _mindmap_messages(text)
         )
-        markdown = response.choices[0].message.content
         return markdown.strip()
     except Exception as e:
         print(f"Error generating mindmap: {str(e)}")
         return None
 
-def generate_flashcards(text):
+def generate_mindmap_markdown(text):
+    return _run(agenerate_mindmap_markdown(text))
+
+def _flashcards_messages(text):
+    text = _fit_source("generate_flashcards", text)
+    return prompt_templates.render("flashcards", text=text)
+
+async def agenerate_flashcards(text):
     """Generates a list of flashcards (keyword -> definition)."""
-    prompt = f"""
-    Generate a list of 10-15 key flashcards from the following text.
-    Return a JSON object with a single key "flashcards", which is a list of objects.
-    Each object should have two keys: "keyword" and "definition".
-
-    Example format:
-    {{
-        "flashcards": [
-            {{"keyword": "Python", "definition": "A high-level programming language."}},
-            {{"keyword": "Variable", "definition": "A storage location with a symbolic name."}}
-        ]
-    }}
-    
-    Text:
-    {text}
+    return await _ajson_completion("generate_flashcards", _flashcards_messages(text))
+
+def generate_flashcards(text):
+    return _run(agenerate_flashcards(text))
+
+async def astream_flashcards(text):
+    """
+    Streaming variant of generate_flashcards; yields one {"keyword", "definition"} card at a time.
+    Raises if the stream fails or is truncated (see _astream_json_items).
     """
-    return get_json_response(prompt)
+    async for card in _astream_json_items(
+        "generate_flashcards", _flashcards_messages(text), "flashcards", _valid_flashcard
+    ):
+        yield card
+
+def stream_flashcards(text):
+    return _iterate(astream_flashcards(text))
 
 # --- NEW FUNCTION ---
-def generate_formula_sheet(text):
-    """Generates a markdown-formatted sheet of key formulas and definitions."""
-    prompt = f"""
-    Analyze the following text and extract all key formulas, equations, and important definitions.
-    Format them clearly using Markdown. Use headings for categories, lists for definitions, 
-    and code blocks or LaTeX-style $$...$$ for formulas.
-    
-    Example:
-    
-    ## Key Definitions
-    * **Topic A**: The definition of topic A.
-    * **Topic B**: The definition of topic B.
-    
-    ## Important Formulas
-    **Ohm's Law**
-    $$V = IR$$
-    
-    If no specific formulas are found, list the key concepts and principles.
-    
-    Text:
-    {text}
-    """
+def _formula_sheet_messages(text):
+    text = _fit_source("generate_formula_sheet", text)
+    return prompt_templates.render("formula_sheet", text=text)
+
+async def agenerate_formula_sheet(text):
+    """Generates a markdown-formatted sheet of key formulas and definitions, or None on failure."""
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are an assistant that extracts key formulas and definitions."},
-                {"role": "user", "content": prompt}
-            ]
-        )
-        return response.choices[0].message.content
+        return await _achat_completion("generate_formula_sheet", _formula_sheet_messages(text))
     except Exception as e:
         print(f"Error generating formula sheet: {e}")
-        return "Error: Could not generate formula sheet."
+        return None
+
+def generate_formula_sheet(text):
+    return _run(agenerate_formula_sheet(text))
+
+# --- Artifact requests for offline batch jobs ---
+def build_artifact_request(name, text, model=None):
+    """
+    The chat completion request the live generator for artifact `name` would send
+    (on its routed model unless `model` is given),
+    as {"function", "model", "messages", "params"}, for jobs that submit it elsewhere
+    (e.g. the OpenAI Batch API). Parse the reply with parse_artifact_response().
+    """
+    if name == "mindmap":
+        function, messages, params = "generate_mindmap_markdown", _mindmap_messages(text), {}
+    elif name == "flashcards":
+        function, messages = "generate_flashcards", _flashcards_messages(text)
+        params = {"response_format": {"type": "json_object"}}
+    elif name == "formula_sheet":
+        function, messages, params = "generate_formula_sheet", _formula_sheet_messages(text), {}
+    else:
+        raise ValueError(f"Unknown artifact: {name}")
+    models, _ = _routed(function, messages, model, params)
+    return {"function": function, "model": models[0], "messages": messages, "params": params}
+
+async def arun_requests(requests):
+    """Sends prepared requests concurrently (limited, cached). Returns content or the exception, per request."""
+    return await asyncio.gather(
+        *[_achat_completion(r["function"], r["messages"], model=r["model"], **r["params"]) for r in requests],
+        return_exceptions=True
+    )
+
+def run_requests(requests):
+    return _run(arun_requests(requests))
+
+def parse_artifact_response(name, content):
+    """Turns a raw reply into the value the live generator returns, or None if unusable."""
+    if not content:
+        return None
+    if name == "mindmap":
+        return content.strip() if _valid_mindmap(content) else None
+    if name == "flashcards":
+        try:
+            data = json.loads(content)
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) and _valid_flashcards(data.get("flashcards")) else None
+    if name == "formula_sheet":
+        return content if _valid_formula_sheet(content) else None
+    raise ValueError(f"Unknown artifact: {name}")
+
+# --- Fused "bundle" mode: one call for all derived artifacts ---
+def _valid_mindmap(value):
+    return isinstance(value, str) and value.strip().startswith("#")
+
+def _valid_flashcard(card):
+    return isinstance(card, dict) and bool(card.get("keyword") and card.get("definition"))
+
+def _valid_flashcards(value):
+    return isinstance(value, list) and len(value) > 0 and all(_valid_flashcard(card) for card in value)
+
+def _valid_formula_sheet(value):
+    return isinstance(value, str) and len(value.strip()) > 0
+
+async def agenerate_artifact_bundle(text):
+    """
+    Generates the mind map, flashcards and formula sheet in a single JSON-mode request,
+    so the source text is sent once instead of three times.
+    Returns {name: value} containing only the sections that passed validation
+    (shaped like the per-artifact generators' output); callers fall back to
+    those generators for anything missing.
+    """
+    text = _fit_source("generate_artifact_bundle", text)
+    data = await _ajson_completion(
+        "generate_artifact_bundle", prompt_templates.render("artifact_bundle", text=text)
+    )
+    if not isinstance(data, dict):
+        return {}
+
+    bundle = {}
+    if _valid_mindmap(data.get("mindmap")):
+        bundle["mindmap"] = data["mindmap"].strip()
+    if _valid_flashcards(data.get("flashcards")):
+        bundle["flashcards"] = {"flashcards": data["flashcards"]}
+    if _valid_formula_sheet(data.get("formula_sheet")):
+        bundle["formula_sheet"] = data["formula_sheet"]
+    return bundle
+
+def generate_artifact_bundle(text):
+    return _run(agenerate_artifact_bundle(text))
 
 # --- MODIFIED FUNCTION ---
-def generate_quiz(text, num_questions=5):
-    """Generates a dynamic quiz with mixed question types."""
-    
+def _quiz_messages(text, num_questions):
     # Simple logic to determine length based on parameter or text
     text_length = len(text)
     
@@ -167,73 +674,54 @@ def generate_quiz(text, num_questions=5):
         num_questions = 5  # Cap at 5 for short text
     elif text_length > 10000 and num_questions < 10:
         num_questions = min(num_questions, 15)  # Allow up to 15 for long text
+    text = _fit_source("generate_quiz", text)
     
     # Determine mix (simple ratio)
     num_mcq = int(num_questions * 0.6)
     num_tf = int(num_questions * 0.2)
     num_short = num_questions - num_mcq - num_tf
     
-    prompt = f"""
-    Analyze the following text and generate a quiz with {num_questions} questions.
-    The quiz should be a mix of:
-    - {num_mcq} Multiple Choice Questions (MCQ)
-    - {num_tf} True/False Questions (T/F)
-    - {num_short} Short Answer Questions (Short)
-    
-    Return a JSON object with a single key "quiz", which is a list of question objects.
-    
-    Each question object MUST have the following keys:
-    1. "type": A string, either "MCQ", "T/F", or "Short".
-    2. "question": The question text.
-    3. "topic": A 1-3 word topic for this specific question (e.g., "Data Types").
-    
-    For "MCQ" type:
-    - "options": A list of 4 strings (e.g., ["A. Option 1", "B. Option 2", ...]).
-    - "answer": The string of the correct option letter (e.g., "A").
-    
-    For "T/F" type:
-    - "options": Must be ["True", "False"].
-    - "answer": The correct string, either "True" or "False".
-    
-    For "Short" type:
-    - "answer_keywords": A list of 1-3 keywords that must be in the user's answer
-      for it to be considered correct (e.g., ["Ohm's Law", "Voltage"]).
-      
-    Example format:
-    {{
-        "quiz": [
-            {{
-                "type": "MCQ",
-                "question": "What is Python?",
-                "topic": "Python Basics",
-                "options": ["A. A snake", "B. A programming language", "C. A car", "D. A fruit"],
-                "answer": "B"
-            }},
-            {{
-                "type": "T/F",
-                "question": "Python is a compiled language.",
-                "topic": "Python Basics",
-                "options": ["True", "False"],
-                "answer": "False"
-            }},
-            {{
-                "type": "Short",
-                "question": "What law describes the relationship V=IR?",
-                "topic": "Physics",
-                "answer_keywords": ["Ohm", "Ohm's Law"]
-            }}
-        ]
-    }}
-    
-    Text:
-    {text}
+    return prompt_templates.render(
+        "quiz", num_questions=num_questions, num_mcq=num_mcq, num_tf=num_tf, num_short=num_short, text=text
+    )
+
+async def agenerate_quiz(text, num_questions=5):
+    """Generates a dynamic quiz with mixed question types."""
+    return await _ajson_completion("generate_quiz", _quiz_messages(text, num_questions))
+
+def generate_quiz(text, num_questions=5):
+    return _run(agenerate_quiz(text, num_questions=num_questions))
+
+def _valid_question(question):
+    if not isinstance(question, dict) or not question.get("question"):
+        return False
+    if question.get("type", "MCQ") == "Short":
+        return bool(question.get("answer_keywords"))
+    return bool(question.get("options")) and bool(question.get("answer"))
+
+async def astream_quiz(text, num_questions=5):
+    """
+    Streaming variant of generate_quiz; yields each question as soon as it is complete.
+    Raises if the stream fails or is truncated (see _astream_json_items).
     """
-    return get_json_response(prompt)
+    async for question in _astream_json_items(
+        "generate_quiz", _quiz_messages(text, num_questions), "quiz", _valid_question
+    ):
+        yield question
+
+def stream_quiz(text, num_questions=5):
+    return _iterate(astream_quiz(text, num_questions=num_questions))
+
+def _qa_chunker(text):
+    return split_into_chunks(text, QA_CHUNK_TOKENS)
 
 # --- MODIFIED FUNCTION ---
-def answer_question(context, question, style="normal"):
-    """Answers a user's question based on context and style."""
-    
+def _answer_messages(context, question, style="normal"):
+    if context:
+        # Only the chunks most relevant to the question (BM25), still capped by the token budget.
+        chunks = retrieval.top_chunks(context, question, QA_TOP_K, _qa_chunker)
+        max_input = INPUT_BUDGETS["answer_question"]
+        context = "\n\n".join(prompt_budget.select_within_budget(chunks, max_input))
     style_prompt = ""
     if style == "simple":
         style_prompt = "Explain your answer in very simple terms, like I'm 10 years old."
@@ -242,32 +730,34 @@ def answer_question(context, question, style="normal"):
 
     if context:
         # RAG-based answer
-        prompt = f"""
-        You are a helpful tutor. Using only the context provided, answer the user's question.
-        {style_prompt}
-        If the answer is not in the context, say "I'm sorry, that information is not in the provided topic."
-
-        Context:
-        {context}
-        
-        Question:
-        {question}
-        """
-        system_message = "You are a helpful tutor answering questions based on context."
-    else:
-        # General chatbot answer
-        prompt = f"{question}\n\n{style_prompt}"
-        system_message = "You are a helpful and friendly AI assistant. Answer the user's question directly."
+        return prompt_templates.render("answer_with_context", context=context, question=question, style=style_prompt)
+    # General chatbot answer
+    return prompt_templates.render("answer_general", question=question, style=style_prompt)
 
+async def aanswer_question(context, question, style="normal"):
+    """Answers a user's question based on context and style."""
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": prompt}
-            ]
-        )
-        return response.choices[0].message.content
+        return await _achat_completion("answer_question", _answer_messages(context, question, style))
     except Exception as e:
         print(f"Error answering question: {e}")
         return "Error: Could not process your question."
+
+def answer_question(context, question, style="normal"):
+    return _run(aanswer_question(context, question, style=style))
+
+async def astream_answer(context, question, style="normal"):
+    """Streaming variant of answer_question; yields answer chunks. Raises if the call fails, like astream_summary."""
+    async for delta in _astream_chat_completion("answer_question", _answer_messages(context, question, style)):
+        yield delta
+
+def stream_answer(context, question, style="normal"):
+    """Synchronous stream_answer for st.write_stream."""
+    return _iterate(astream_answer(context, question, style=style))
+
+# --- Voice tutor turns ---
+async def agenerate_chat_response_structured(prompt):
+    """Structured JSON reply for one voice-tutor turn (see agentic_ai.process_stt)."""
+    return await aget_json_response(prompt, function="voice_turn")
+
+def generate_chat_response_structured(prompt):
+    return _run(agenerate_chat_response_structured(prompt))
@@ -0,0 +1,87 @@
+# json_stream.py
+"""
+Incremental parsing of a streamed JSON-mode reply.
+
+JSON-mode generators return one object holding a list, e.g.
+{"flashcards": [{...}, {...}]} or {"quiz": [{...}, ...]}. ArrayItems is fed
+the reply's text deltas as they arrive and returns each element of that list
+as soon as its closing brace has been received, so the UI can show the first
+card or question long before the whole reply is done.
+
+    items = ArrayItems("flashcards")
+    for delta in deltas:
+        for card in items.feed(delta):
+            ...
+
+Only the top-level object's `key` is followed; elements that are not objects,
+or that do not parse, are skipped.
+"""
+import json
+
+
+class ArrayItems:
+    """Yields the objects of the list under `key` in a JSON object, from partial text."""
+
+    def __init__(self, key):
+        self.key = key
+        self.text = ""
+        self.depth = 0  # nesting depth of { and [ at self.pos
+        self.pos = 0
+        self.in_string = False
+        self.escaped = False
+        self.string_start = None
+        self.last_string = None  # the latest complete string directly inside the top-level object
+        self.array_depth = None  # depth inside the target list, once it has been entered
+        self.item_start = None
+
+    def feed(self, delta):
+        """Adds `delta` and returns the list elements completed by it."""
+        self.text += delta
+        items = []
+        text = self.text
+        for i in range(self.pos, len(text)):
+            char = text[i]
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+                    if self.depth == 1:
+                        self.last_string = text[self.string_start:i + 1]
+                continue
+            if char == '"':
+                self.in_string = True
+                self.string_start = i
+            elif char in "{[":
+                self.depth += 1
+                if char == "[" and self.depth == 2 and self.array_depth is None and self._at_key():
+                    self.array_depth = 2
+                elif char == "{" and self.array_depth is not None and self.depth == self.array_depth + 1:
+                    self.item_start = i
+            elif char in "}]":
+                if char == "}" and self.item_start is not None and self.depth == self.array_depth + 1:
+                    item = self._parse(text[self.item_start:i + 1])
+                    if item is not None:
+                        items.append(item)
+                    self.item_start = None
+                elif char == "]" and self.array_depth is not None and self.depth == self.array_depth:
+                    self.array_depth = None
+                self.depth -= 1
+        self.pos = len(text)
+        return items
+
+    def _at_key(self):
+        try:
+            return self.last_string is not None and json.loads(self.last_string) == self.key
+        except ValueError:
+            return False
+
+    @staticmethod
+    def _parse(fragment):
+        try:
+            item = json.loads(fragment)
+        except ValueError:
+            return None
+        return item if isinstance(item, dict) else None
@@ -0,0 +1,204 @@
+# llm_cache.py
+"""
+Persistent cache for LLM responses, shared by every worker process.
+
+Entries live in a small SQLite file (WAL mode, so many readers and one
+writer can use it at once). Each entry is keyed by
+(function, model, normalized prompt, params hash). Eviction is LRU once
+the cache grows past LLM_CACHE_MAX_ENTRIES or LLM_CACHE_MAX_BYTES, and
+anything older than LLM_CACHE_TTL_SECONDS is treated as a miss.
+
+The same file holds a lease table for single-flight requests: the process
+that acquires a key's lease makes the API call, and other processes poll the
+cache for its result instead of sending a duplicate request.
+"""
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from collections import defaultdict
+
+# --- Robust Import Logic ---
+project_root = os.path.dirname(os.path.abspath(__file__))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+from config import (
+    LLM_CACHE_ENABLED, LLM_CACHE_PATH, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_MAX_BYTES,
+    LLM_CACHE_TTL_SECONDS, LLM_CACHE_BYPASS
+)
+
+# Evicting on every write is wasteful; do it once every N writes instead.
+EVICT_EVERY = 50
+
+_local = threading.local()
+_stats_lock = threading.Lock()
+_stats = defaultdict(lambda: {"hits": 0, "misses": 0, "writes": 0})
+_writes_since_evict = 0
+_FLIGHT_OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _connect():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(LLM_CACHE_PATH, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                cache_key TEXT PRIMARY KEY,
+                function TEXT NOT NULL,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                size_bytes INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_access ON llm_cache (last_access)")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_inflight (
+                cache_key TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        conn.commit()
+        _local.conn = conn
+    return conn
+
+
+def normalize_prompt(messages):
+    """Collapses insignificant whitespace so re-indented f-strings share a key."""
+    return [{"role": m["role"], "content": " ".join(str(m["content"]).split())} for m in messages]
+
+
+def make_key(function, model, messages, params=None):
+    params_hash = hashlib.sha256(json.dumps(params or {}, sort_keys=True, default=str).encode()).hexdigest()
+    payload = json.dumps([function, model, normalize_prompt(messages), params_hash], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def is_enabled(function):
+    return LLM_CACHE_ENABLED and function not in LLM_CACHE_BYPASS
+
+
+def get(function, key, record=True):
+    """Returns the cached response for `key`, or None on a miss or expiry."""
+    try:
+        conn = _connect()
+        row = conn.execute(
+            "SELECT response, created_at FROM llm_cache WHERE cache_key = ?", (key,)
+        ).fetchone()
+        now = time.time()
+        if row and (not LLM_CACHE_TTL_SECONDS or now - row[1] <= LLM_CACHE_TTL_SECONDS):
+            conn.execute("UPDATE llm_cache SET last_access = ? WHERE cache_key = ?", (now, key))
+            conn.commit()
+            if record:
+                _record(function, "hits")
+            return json.loads(row[0])
+    except sqlite3.Error as e:
+        print(f"LLM cache read failed: {e}")
+    if record:
+        _record(function, "misses")
+    return None
+
+
+def put(function, model, key, response):
+    """Stores a response. Failures are logged and swallowed; the cache is best-effort."""
+    global _writes_since_evict
+    try:
+        conn = _connect()
+        payload = json.dumps(response)
+        now = time.time()
+        conn.execute("""
+            INSERT INTO llm_cache (cache_key, function, model, response, size_bytes, created_at, last_access)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(cache_key) DO UPDATE SET
+                response = excluded.response, size_bytes = excluded.size_bytes,
+                created_at = excluded.created_at, last_access = excluded.last_access
+        """, (key, function, model, payload, len(payload), now, now))
+        conn.commit()
+        _record(function, "writes")
+        # Shared by every writer thread; only the one that resets the counter evicts.
+        with _stats_lock:
+            _writes_since_evict += 1
+            due = _writes_since_evict >= EVICT_EVERY
+            if due:
+                _writes_since_evict = 0
+        if due:
+            evict()
+    except sqlite3.Error as e:
+        print(f"LLM cache write failed: {e}")
+
+
+def evict():
+    """Drops expired entries, then least-recently-used ones until under both size limits."""
+    conn = _connect()
+    if LLM_CACHE_TTL_SECONDS:
+        conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (time.time() - LLM_CACHE_TTL_SECONDS,))
+    count, total_bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM llm_cache").fetchone()
+    if count > LLM_CACHE_MAX_ENTRIES or total_bytes > LLM_CACHE_MAX_BYTES:
+        # Walk from the least recently used entry and delete until both limits hold.
+        to_delete = []
+        for key, size in conn.execute("SELECT cache_key, size_bytes FROM llm_cache ORDER BY last_access ASC"):
+            if count <= LLM_CACHE_MAX_ENTRIES and total_bytes <= LLM_CACHE_MAX_BYTES:
+                break
+            to_delete.append((key,))
+            count -= 1
+            total_bytes -= size
+        conn.executemany("DELETE FROM llm_cache WHERE cache_key = ?", to_delete)
+    conn.commit()
+
+
+def acquire_flight(key, lease_seconds):
+    """
+    Takes the cross-process lease for `key`. Returns False while another process
+    holds an unexpired lease. Errors count as acquired, so a broken lock table
+    only costs a duplicate request.
+    """
+    try:
+        conn = _connect()
+        now = time.time()
+        cursor = conn.execute("""
+            INSERT INTO llm_inflight (cache_key, owner, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT(cache_key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+            WHERE llm_inflight.expires_at < ? OR llm_inflight.owner = excluded.owner
+        """, (key, _FLIGHT_OWNER, now + lease_seconds, now))
+        conn.commit()
+        return cursor.rowcount > 0
+    except sqlite3.Error as e:
+        print(f"LLM in-flight lock failed: {e}")
+        return True
+
+
+def release_flight(key):
+    try:
+        conn = _connect()
+        conn.execute("DELETE FROM llm_inflight WHERE cache_key = ? AND owner = ?", (key, _FLIGHT_OWNER))
+        conn.commit()
+    except sqlite3.Error as e:
+        print(f"LLM in-flight unlock failed: {e}")
+
+
+def clear():
+    conn = _connect()
+    conn.execute("DELETE FROM llm_cache")
+    conn.commit()
+
+
+def _record(function, event):
+    with _stats_lock:
+        _stats[function][event] += 1
+
+
+def stats():
+    """Per-function hit/miss/write counters for this process, plus an overall hit rate."""
+    with _stats_lock:
+        snapshot = {fn: dict(counts) for fn, counts in _stats.items()}
+    hits = sum(c["hits"] for c in snapshot.values())
+    lookups = hits + sum(c["misses"] for c in snapshot.values())
+    return {"functions": snapshot, "hit_rate": hits / lookups if lookups else 0.0}
@@ -0,0 +1,100 @@
+# llm_clients.py
+"""
+One place that builds the clients for every LLM call site.
+
+All OpenAI SDK and LangChain clients share one tuned httpx connection pool
+(per event loop for async clients, since an async pool is bound to its loop),
+so connections are kept alive and reused across calls, threads and sessions
+instead of paying TCP and TLS setup on each new client. HTTP/2 is used when
+the optional `h2` package is installed. Pool size, keep-alive and timeouts
+come from config (LLM_HTTP_*).
+
+    client = llm_clients.openai_client()                  # sync, e.g. the Batch API
+    client = llm_clients.async_openai_client(max_retries=0)
+    llm = llm_clients.chat_model("gpt-4o-mini", temperature=0.3, max_tokens=250, max_retries=0)
+"""
+import asyncio
+import atexit
+import importlib.util
+import os
+import sys
+import threading
+import weakref
+from functools import lru_cache
+
+import httpx
+import openai
+
+# --- Robust Import Logic ---
+project_root = os.path.dirname(os.path.abspath(__file__))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+from config import (
+    OPENAI_API_KEY, LLM_HTTP2, LLM_HTTP_MAX_CONNECTIONS, LLM_HTTP_MAX_KEEPALIVE,
+    LLM_HTTP_KEEPALIVE_SECONDS, LLM_HTTP_CONNECT_TIMEOUT, LLM_HTTP_READ_TIMEOUT,
+)
+
+HTTP2 = LLM_HTTP2 and importlib.util.find_spec("h2") is not None
+
+_lock = threading.Lock()
+_sync_client = None
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _pool_options():
+    return {
+        "limits": httpx.Limits(
+            max_connections=LLM_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=LLM_HTTP_KEEPALIVE_SECONDS,
+        ),
+        # The read timeout bounds each wait for data, so long streams are fine.
+        "timeout": openai.Timeout(LLM_HTTP_READ_TIMEOUT, connect=LLM_HTTP_CONNECT_TIMEOUT),
+        "http2": HTTP2,
+    }
+
+
+def http_client():
+    """The process-wide pooled sync httpx client."""
+    global _sync_client
+    with _lock:
+        if _sync_client is None:
+            _sync_client = openai.DefaultHttpxClient(**_pool_options())
+            atexit.register(_sync_client.close)
+        return _sync_client
+
+
+def async_http_client():
+    """The pooled async httpx client for the running event loop."""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            client = openai.DefaultAsyncHttpxClient(**_pool_options())
+            _async_clients[loop] = client
+        return client
+
+
+def openai_client(**options):
+    """A sync OpenAI client on the shared pool. `options` go to the client (e.g. max_retries)."""
+    return openai.OpenAI(api_key=OPENAI_API_KEY, http_client=http_client(), **options)
+
+
+def async_openai_client(**options):
+    """An AsyncOpenAI client on the running loop's shared pool."""
+    return openai.AsyncOpenAI(api_key=OPENAI_API_KEY, http_client=async_http_client(), **options)
+
+
+@lru_cache(maxsize=64)
+def _cached_chat_model(model, options):
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(model=model, api_key=OPENAI_API_KEY, http_client=http_client(), **dict(options))
+
+
+def chat_model(model, **options):
+    """
+    A LangChain ChatOpenAI on the shared sync pool, reused for identical settings.
+    Options that are None are left to ChatOpenAI's defaults.
+    """
+    options = tuple(sorted((name, value) for name, value in options.items() if value is not None))
+    return _cached_chat_model(model, options)
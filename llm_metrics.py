@@ -0,0 +1,251 @@
+# llm_metrics.py
+"""
+Per-function instrumentation for LLM calls.
+
+Every completion call (generative_ai, agentic_ai) runs inside track(), which
+records latency, time to first token, prompt/completion/cached tokens,
+model and the error class, labeled by the calling function. Requests served
+from llm_cache or coalesced onto an identical in-flight call are counted with
+served() so hit rates sit next to the API numbers. The
+numbers are kept in process as counters and histograms, exported with
+summary() and as Prometheus text with render_prometheus(). If LLM_METRICS_LOG
+is set, one JSON line per call is also written to stdout.
+
+    with llm_metrics.track("generate_summary", "gpt-4o-mini") as call:
+        response = await client.chat.completions.create(...)
+        call.usage(response.usage)
+"""
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+# --- Robust Import Logic ---
+project_root = os.path.dirname(os.path.abspath(__file__))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+from config import LLM_METRICS_LOG
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+
+# USD per 1M tokens: (input, cached input, output).
+PRICES = {
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1": (2.00, 0.50, 8.00),
+    "gpt-4.1-nano": (0.10, 0.025, 0.40),
+}
+
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus style) with sum and count."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.total += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bucket bound below which a fraction q of observations fall."""
+        if not self.count:
+            return None
+        target, seen = q * self.count, 0
+        for bound, n in zip(self.buckets + (float("inf"),), self.counts):
+            seen += n
+            if seen >= target:
+                return bound
+        return float("inf")
+
+
+def _new_series():
+    return {
+        "calls": 0, "errors": defaultdict(int), "cache_hits": 0, "coalesced": 0,
+        "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0, "cost_usd": 0.0,
+        "latency": Histogram(LATENCY_BUCKETS), "ttft": Histogram(LATENCY_BUCKETS),
+        "completion_tokens_hist": Histogram(TOKEN_BUCKETS),
+    }
+
+
+_lock = threading.Lock()
+_series = defaultdict(_new_series)
+_listeners = []
+
+
+def _price(model):
+    for prefix in sorted(PRICES, key=len, reverse=True):
+        if model.startswith(prefix):
+            return PRICES[prefix]
+    return None
+
+
+def cost_usd(model, prompt_tokens, completion_tokens, cached_tokens=0):
+    price = _price(model)
+    if price is None:
+        return 0.0
+    uncached = max(0, prompt_tokens - cached_tokens)
+    return (uncached * price[0] + cached_tokens * price[1] + completion_tokens * price[2]) / 1_000_000
+
+
+class CallRecord:
+    """What track() yields; the caller fills in whatever it learns during the call."""
+
+    def __init__(self, function, model):
+        self.function = function
+        self.model = model
+        self.started = time.monotonic()
+        self.ttft = None
+        self.prompt_tokens = None
+        self.completion_tokens = None
+        self.cached_tokens = 0
+        self.served_by = None  # "cache" or "coalesced" when no API call was made
+        self.stream = False
+        self.error = None
+
+    def first_token(self):
+        if self.ttft is None:
+            self.ttft = time.monotonic() - self.started
+
+    def usage(self, usage):
+        """Reads an OpenAI usage object (or a dict in the same shape)."""
+        if usage is None:
+            return
+        get = usage.get if isinstance(usage, dict) else lambda k, d=None: getattr(usage, k, d)
+        self.prompt_tokens = get("prompt_tokens", get("input_tokens"))
+        self.completion_tokens = get("completion_tokens", get("output_tokens"))
+        details = get("prompt_tokens_details")
+        if details is not None:
+            cached = details.get("cached_tokens") if isinstance(details, dict) else getattr(details, "cached_tokens", 0)
+            self.cached_tokens = cached or 0
+
+
+def record(call, latency):
+    cost = 0.0
+    if call.prompt_tokens is not None and call.completion_tokens is not None:
+        cost = cost_usd(call.model, call.prompt_tokens, call.completion_tokens, call.cached_tokens)
+    with _lock:
+        series = _series[(call.function, call.model)]
+        if call.served_by == "cache":
+            series["cache_hits"] += 1
+        elif call.served_by == "coalesced":
+            series["coalesced"] += 1
+        else:
+            # Only real API calls feed the call count and the latency histograms.
+            series["calls"] += 1
+            series["latency"].observe(latency)
+        if call.ttft is not None:
+            series["ttft"].observe(call.ttft)
+        if call.error:
+            series["errors"][call.error] += 1
+        if call.prompt_tokens is not None:
+            series["prompt_tokens"] += call.prompt_tokens
+            series["cached_tokens"] += call.cached_tokens
+        if call.completion_tokens is not None:
+            series["completion_tokens"] += call.completion_tokens
+            series["completion_tokens_hist"].observe(call.completion_tokens)
+        series["cost_usd"] += cost
+
+    for listener in _listeners:
+        listener(call, latency)
+    if LLM_METRICS_LOG:
+        print(json.dumps({
+            "event": "llm_call", "ts": round(time.time(), 3), "function": call.function, "model": call.model,
+            "latency_s": round(latency, 3), "ttft_s": round(call.ttft, 3) if call.ttft is not None else None,
+            "prompt_tokens": call.prompt_tokens, "completion_tokens": call.completion_tokens,
+            "cached_tokens": call.cached_tokens, "served_by": call.served_by or "api", "stream": call.stream,
+            "cost_usd": round(cost, 6), "error": call.error,
+        }), flush=True)
+
+
+def add_listener(fn):
+    """Registers fn(call, latency), called after every recorded call (e.g. model_routing's SLO)."""
+    _listeners.append(fn)
+
+
+@contextmanager
+def track(function, model):
+    """Times the enclosed call and records it, including the error class if it raises."""
+    call = CallRecord(function, model)
+    try:
+        yield call
+    except BaseException as e:
+        # A stream closed early by its consumer is a cancellation, not a failure.
+        call.error = "Cancelled" if isinstance(e, (GeneratorExit, asyncio.CancelledError)) else type(e).__name__
+        raise
+    finally:
+        record(call, time.monotonic() - call.started)
+
+
+def served(function, model, how):
+    """Counts a request answered without an API call (`how` is "cache" or "coalesced")."""
+    call = CallRecord(function, model)
+    call.served_by = how
+    record(call, 0.0)
+
+
+def summary():
+    """Per (function, model): calls, errors, cache hits, tokens, cost and latency quantiles."""
+    with _lock:
+        rows = []
+        for (function, model), s in sorted(_series.items()):
+            rows.append({
+                "function": function, "model": model, "calls": s["calls"],
+                "errors": dict(s["errors"]), "cache_hits": s["cache_hits"], "coalesced": s["coalesced"],
+                "prompt_tokens": s["prompt_tokens"], "completion_tokens": s["completion_tokens"],
+                "cached_tokens": s["cached_tokens"], "cost_usd": round(s["cost_usd"], 6),
+                "latency_p50_s": s["latency"].quantile(0.5), "latency_p95_s": s["latency"].quantile(0.95),
+                "ttft_p50_s": s["ttft"].quantile(0.5), "ttft_p95_s": s["ttft"].quantile(0.95),
+            })
+        return rows
+
+
+def _histogram_lines(name, labels, hist):
+    lines, cumulative = [], 0
+    for bound, n in zip(hist.buckets + (float("inf"),), hist.counts):
+        cumulative += n
+        le = "+Inf" if bound == float("inf") else bound
+        lines.append(f'{name}_bucket{{{labels},le="{le}"}} {cumulative}')
+    lines.append(f"{name}_sum{{{labels}}} {hist.total}")
+    lines.append(f"{name}_count{{{labels}}} {hist.count}")
+    return lines
+
+
+def render_prometheus():
+    """All series in the Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        for (function, model), s in sorted(_series.items()):
+            labels = f'function="{function}",model="{model}"'
+            lines.append(f"llm_calls_total{{{labels}}} {s['calls']}")
+            lines.append(f"llm_cache_hits_total{{{labels}}} {s['cache_hits']}")
+            lines.append(f"llm_coalesced_total{{{labels}}} {s['coalesced']}")
+            for error, n in s["errors"].items():
+                lines.append(f'llm_errors_total{{{labels},error="{error}"}} {n}')
+            for kind in ("prompt", "completion", "cached"):
+                lines.append(f'llm_tokens_total{{{labels},kind="{kind}"}} {s[kind + "_tokens"]}')
+            lines.append(f"llm_cost_usd_total{{{labels}}} {s['cost_usd']}")
+            lines += _histogram_lines("llm_latency_seconds", labels, s["latency"])
+            lines += _histogram_lines("llm_ttft_seconds", labels, s["ttft"])
+            lines += _histogram_lines("llm_completion_tokens", labels, s["completion_tokens_hist"])
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    with _lock:
+        _series.clear()
@@ -0,0 +1,208 @@
+# model_routing.py
+"""
+Per-task model routing for every LLM call.
+
+Each calling function (the `function` label used by llm_cache, prompt_budget
+and llm_metrics) belongs to a task, and ROUTES gives each task:
+
+- models: the fallback chain. The first model is used; the next one is tried
+  when a call still fails after the rate limiter's retries (outage, quota,
+  unknown model).
+- max_tokens / temperature: defaults applied to the request unless the caller
+  sets them. None leaves the parameter to the provider.
+- latency_slo_seconds / fast_model (optional): when the p95 latency of the
+  first model over the last SLO_WINDOW_SECONDS exceeds the SLO, the task is
+  downgraded to fast_model. Streaming calls are measured by time to first
+  token; timeouts and connection errors count with the time they took.
+  Once the slow model's samples age out of the window it is tried again.
+
+Deployments override routes with LLM_ROUTES (JSON, or a path to a JSON file),
+merged field by field per task:
+
+    LLM_ROUTES='{"summary": {"models": ["gpt-4.1-mini", "gpt-4o-mini"]},
+                 "socratic": {"latency_slo_seconds": 1.0}}'
+"""
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+
+# --- Robust Import Logic ---
+project_root = os.path.dirname(os.path.abspath(__file__))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+from config import LLM_ROUTES
+import llm_metrics
+from rate_limiter import is_retryable, status_code
+
+DEFAULT_CHAIN = ["gpt-4o-mini", "gpt-4.1-mini"]
+# Voice turns are latency-first: fall back to, and downgrade to, the fastest model.
+VOICE_CHAIN = ["gpt-4o-mini", "gpt-4.1-nano"]
+
+ROUTES = {
+    "summary": {"models": DEFAULT_CHAIN, "max_tokens": 4096, "temperature": None},
+    "summary_chunk": {"models": DEFAULT_CHAIN, "max_tokens": 1024, "temperature": None},
+    "summary_merge": {"models": DEFAULT_CHAIN, "max_tokens": 2048, "temperature": None},
+    "mindmap": {"models": DEFAULT_CHAIN, "max_tokens": 2048, "temperature": 0.7},
+    "flashcards": {"models": DEFAULT_CHAIN, "max_tokens": 1500, "temperature": None},
+    "formula": {"models": DEFAULT_CHAIN, "max_tokens": 2048, "temperature": None},
+    "bundle": {"models": DEFAULT_CHAIN, "max_tokens": 4096, "temperature": None},
+    "quiz": {"models": DEFAULT_CHAIN, "max_tokens": 3000, "temperature": None},
+    "qa": {"models": DEFAULT_CHAIN, "max_tokens": 1024, "temperature": None},
+    "agent": {"models": DEFAULT_CHAIN, "max_tokens": None, "temperature": 0},
+    "voice_turn": {"models": VOICE_CHAIN, "max_tokens": 400, "temperature": 0.7,
+                   "latency_slo_seconds": 4.0, "fast_model": "gpt-4.1-nano"},
+    "analyze_answer": {"models": VOICE_CHAIN, "max_tokens": 250, "temperature": 0.3,
+                       "latency_slo_seconds": 2.0, "fast_model": "gpt-4.1-nano"},
+    "socratic": {"models": VOICE_CHAIN, "max_tokens": 150, "temperature": 0.8,
+                 "latency_slo_seconds": 2.0, "fast_model": "gpt-4.1-nano"},
+    "default": {"models": DEFAULT_CHAIN, "max_tokens": None, "temperature": None},
+}
+
+FUNCTION_TASKS = {
+    "generate_summary": "summary",
+    "summarize_chunk": "summary_chunk",
+    "merge_notes": "summary_merge",
+    "generate_mindmap_markdown": "mindmap",
+    "generate_flashcards": "flashcards",
+    "generate_formula_sheet": "formula",
+    "generate_artifact_bundle": "bundle",
+    "generate_quiz": "quiz",
+    "answer_question": "qa",
+    "agent": "agent",
+    "voice_turn": "voice_turn",
+    "analyze_answer": "analyze_answer",
+    "socratic_response": "socratic",
+}
+
+SLO_WINDOW_SECONDS = 300
+SLO_MIN_SAMPLES = 10
+# Errors worth another model even though they are not retryable on the same one.
+FALLBACK_STATUS = {403, 404}
+# Error classes that say nothing about the model's speed: rejected requests (4xx)
+# and calls abandoned by the caller. Timeouts, connection errors and 5xx count
+# toward the SLO like successful calls; they are usually the slowest ones.
+NON_LATENCY_ERRORS = {
+    "BadRequestError", "AuthenticationError", "PermissionDeniedError", "NotFoundError",
+    "ConflictError", "UnprocessableEntityError", "RateLimitError", "Cancelled",
+}
+
+
+def _load_overrides(value):
+    if not value:
+        return {}
+    try:
+        if os.path.isfile(value):
+            with open(value, encoding="utf-8") as f:
+                return json.load(f)
+        return json.loads(value)
+    except (OSError, ValueError) as e:
+        print(f"Warning: ignoring LLM_ROUTES ({type(e).__name__}: {e})")
+        return {}
+
+
+for _task, _override in _load_overrides(LLM_ROUTES).items():
+    ROUTES[_task] = {**ROUTES.get(_task, ROUTES["default"]), **_override}
+
+
+def task_for(function):
+    task = FUNCTION_TASKS.get(function, function)
+    return task if task in ROUTES else "default"
+
+
+# --- Latency SLO ---
+_samples_lock = threading.Lock()
+_samples = defaultdict(deque)  # (task, model) -> deque of (timestamp, seconds)
+_downgraded = set()
+
+
+def _observe(call, latency):
+    """llm_metrics listener: remembers recent latencies of real API calls per task and model."""
+    if call.served_by:
+        return
+    if call.stream and call.ttft is not None:
+        seconds = call.ttft  # valid however the stream ended
+    elif call.error in NON_LATENCY_ERRORS:
+        return
+    else:
+        seconds = latency
+    with _samples_lock:
+        _samples[(task_for(call.function), call.model)].append((time.monotonic(), seconds))
+
+
+llm_metrics.add_listener(_observe)
+
+
+def recent_p95(task, model):
+    """p95 latency of `model` for `task` over the SLO window, or None with too few samples."""
+    cutoff = time.monotonic() - SLO_WINDOW_SECONDS
+    with _samples_lock:
+        samples = _samples[(task, model)]
+        while samples and samples[0][0] < cutoff:
+            samples.popleft()
+        values = sorted(seconds for _, seconds in samples)
+    if len(values) < SLO_MIN_SAMPLES:
+        return None
+    return values[max(0, int(0.95 * len(values) + 0.5) - 1)]
+
+
+def _over_slo(task, config):
+    slo, fast = config.get("latency_slo_seconds"), config.get("fast_model")
+    if not slo or not fast or fast == config["models"][0]:
+        return False
+    p95 = recent_p95(task, config["models"][0])
+    over = p95 is not None and p95 > slo
+    with _samples_lock:
+        changed = over != (task in _downgraded)
+        if changed:
+            (_downgraded.add if over else _downgraded.discard)(task)
+    if changed:
+        print(f"Model routing: {task} " + (
+            f"p95 {p95:.2f}s over its {slo}s SLO; using {fast}" if over else f"back on {config['models'][0]}"
+        ))
+    return over
+
+
+def route(function, model=None):
+    """
+    The route for `function`: {"task", "models", "max_tokens", "temperature"}.
+    `model` pins the first model (e.g. one already submitted to the Batch API).
+    """
+    task = task_for(function)
+    config = ROUTES[task]
+    models = list(config["models"])
+    if model:
+        first = model
+    elif _over_slo(task, config):
+        first = config["fast_model"]
+    else:
+        first = models[0]
+    models = [first] + [m for m in models if m != first]
+    return {"task": task, "models": models,
+            "max_tokens": config.get("max_tokens"), "temperature": config.get("temperature")}
+
+
+def apply_defaults(route_, params):
+    """Fills in the route's max_tokens and temperature unless `params` already sets them."""
+    for name in ("max_tokens", "temperature"):
+        if route_[name] is not None and name not in params:
+            params[name] = route_[name]
+    return params
+
+
+def should_fall_back(error):
+    """True if a call that failed with `error` may succeed on another model."""
+    if getattr(error, "code", None) == "insufficient_quota":
+        return False  # account-wide; no model will do better
+    return is_retryable(error) or status_code(error) in FALLBACK_STATUS
+
+
+def next_model(function, models, model, error):
+    """The model to try after `model` failed with `error`, or None if the error should be raised."""
+    index = models.index(model) + 1
+    if index >= len(models) or not should_fall_back(error):
+        return None
+    print(f"{function}: {model} failed ({type(error).__name__}); falling back to {models[index]}")
+    return models[index]
@@ -0,0 +1,132 @@
+# near_duplicates.py
+"""
+Near-duplicate detection for new topics, so repeat uploads reuse stored materials.
+
+Every saved topic gets a MinHash signature: word 5-gram shingles of the
+extracted text for uploads, or character 3-grams of the normalized name for
+typed and predefined topics (whose "text" is just a fixed prompt around the
+name). Signatures are split into LSH bands and each band is stored as a
+bucket in the database. A new topic only has to look up topics sharing a
+bucket, then check their estimated Jaccard similarity against the threshold.
+
+Privacy scoping (DEDUP_SCOPE): uploads only ever match the same user's
+topics. Topics built from a typed or predefined name hold nothing private, so
+in 'shared' scope they can be reused across users.
+"""
+import hashlib
+import os
+import re
+import sys
+
+import numpy as np
+
+# --- Robust Import Logic ---
+project_root = os.path.dirname(os.path.abspath(__file__))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+import database_utils as db
+from config import DEDUP_SCOPE, DEDUP_TEXT_THRESHOLD, DEDUP_NAME_THRESHOLD
+
+NUM_PERM = 128
+BANDS = 32
+ROWS_PER_BAND = NUM_PERM // BANDS
+WORD_SHINGLE = 5
+CHAR_SHINGLE = 3
+_MERSENNE_PRIME = (1 << 61) - 1
+_BATCH = 8192
+
+# Fixed seed: signatures are persisted, so the permutations must never change.
+_rng = np.random.RandomState(20240601)
+_PERM_A = _rng.randint(1, 2 ** 31 - 1, NUM_PERM).astype(np.uint64)
+_PERM_B = _rng.randint(0, 2 ** 31 - 1, NUM_PERM).astype(np.uint64)
+
+NAME_SOURCE_TYPES = ("text", "predefined")
+
+
+def signature_kind(source_type):
+    return "name" if source_type in NAME_SOURCE_TYPES else "text"
+
+
+def normalize(text):
+    return " ".join(re.findall(r"[a-z0-9]+", text.lower()))
+
+
+def shingles(text, kind):
+    normalized = normalize(text)
+    if kind == "name" or len(normalized.split()) < WORD_SHINGLE:
+        return {normalized[i:i + CHAR_SHINGLE] for i in range(max(1, len(normalized) - CHAR_SHINGLE + 1))}
+    words = normalized.split()
+    return {" ".join(words[i:i + WORD_SHINGLE]) for i in range(len(words) - WORD_SHINGLE + 1)}
+
+
+def minhash(shingle_set):
+    """MinHash signature (NUM_PERM uint64 values) of a set of shingles."""
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little") for s in shingle_set),
+        dtype=np.uint64, count=len(shingle_set)
+    )
+    signature = np.full(NUM_PERM, np.iinfo(np.uint64).max, dtype=np.uint64)
+    # Batched to bound memory on long documents; a*x + b stays below 2**64.
+    for start in range(0, len(hashes), _BATCH):
+        batch = hashes[start:start + _BATCH, None]
+        values = (batch * _PERM_A + _PERM_B) % _MERSENNE_PRIME
+        signature = np.minimum(signature, values.min(axis=0))
+    return signature
+
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of the two shingle sets."""
+    return float(np.mean(sig_a == sig_b))
+
+
+def lsh_buckets(signature, kind):
+    buckets = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        buckets.append(f"{kind}:{band}:{hashlib.blake2b(rows.tobytes(), digest_size=8).hexdigest()}")
+    return buckets
+
+
+def _signature_for(topic_name, source_type, text):
+    kind = signature_kind(source_type)
+    source = topic_name if kind == "name" else text
+    if not source or not normalize(source):
+        return kind, None
+    return kind, minhash(shingles(source, kind))
+
+
+def index_topic(topic_id, user_id, topic_name, source_type, text):
+    """Records a topic's signature so later uploads can find it."""
+    if DEDUP_SCOPE == "off" or topic_id is None:
+        return False
+    kind, signature = _signature_for(topic_name, source_type, text)
+    if signature is None:
+        return False
+    return db.save_topic_signature(
+        topic_id, user_id, kind, kind == "name", signature.tobytes(), lsh_buckets(signature, kind)
+    )
+
+
+def find_near_duplicate(user_id, topic_name, source_type, text):
+    """
+    Returns {"topic_id", "user_id", "similarity"} for the most similar existing topic
+    the user may reuse, or None if nothing clears the threshold.
+    """
+    if DEDUP_SCOPE == "off":
+        return None
+    kind, signature = _signature_for(topic_name, source_type, text)
+    if signature is None:
+        return None
+    threshold = DEDUP_NAME_THRESHOLD if kind == "name" else DEDUP_TEXT_THRESHOLD
+    candidates = db.find_signature_candidates(
+        lsh_buckets(signature, kind), user_id, include_shared=(DEDUP_SCOPE == "shared" and kind == "name")
+    )
+
+    best = None
+    for row in candidates:
+        if row["kind"] != kind:
+            continue
+        score = similarity(signature, np.frombuffer(bytes(row["minhash"]), dtype=np.uint64))
+        if score >= threshold and (best is None or score > best["similarity"]):
+            best = {"topic_id": row["topic_id"], "user_id": row["user_id"], "similarity": score}
+    return best
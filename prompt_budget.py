@@ -0,0 +1,164 @@
+# prompt_budget.py
+"""
+Token counting and prompt packing for the OpenAI chat models.
+
+Prompt builders use this to keep requests inside the model's context window
+(and inside a per-generator input budget) before anything is sent, so an
+oversized input is trimmed locally instead of failing, and being billed, at
+the API. Counts use tiktoken with one cached encoder per model. Without
+tiktoken, a characters/4 estimate is used instead.
+"""
+import threading
+from collections import defaultdict
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:  # counts fall back to an estimate
+    tiktoken = None
+
+DEFAULT_MODEL = "gpt-4o-mini"
+
+CONTEXT_WINDOWS = {
+    "gpt-4o-mini": 128000,
+    "gpt-4o": 128000,
+    "gpt-4.1": 1047576,
+    "gpt-4.1-mini": 1047576,
+    "gpt-4.1-nano": 1047576,
+    "gpt-3.5-turbo": 16385,
+}
+DEFAULT_CONTEXT_WINDOW = 16385
+
+# Per-message framing tokens added by the chat format, plus the reply primer.
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_REPLY = 3
+# Headroom for counting drift between tiktoken and the server.
+SAFETY_MARGIN_TOKENS = 256
+
+_stats_lock = threading.Lock()
+_stats = defaultdict(lambda: {"calls": 0, "prompt_tokens": 0, "max_output_tokens": 0, "trimmed": 0})
+
+
+class PromptTooLarge(ValueError):
+    """Raised when a prompt cannot fit the model's context window."""
+
+
+@lru_cache(maxsize=None)
+def encoding_for(model=DEFAULT_MODEL):
+    """Returns the (cached) tiktoken encoding for `model`, or None without tiktoken."""
+    if tiktoken is None:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        # tiktoken downloads its BPE files on first use; offline hosts fall back to the estimate.
+        print(f"Warning: tiktoken encoding for {model} unavailable ({type(e).__name__}); estimating tokens.")
+        return None
+
+
+def context_window(model=DEFAULT_MODEL):
+    for prefix in sorted(CONTEXT_WINDOWS, key=len, reverse=True):
+        if model.startswith(prefix):
+            return CONTEXT_WINDOWS[prefix]
+    return DEFAULT_CONTEXT_WINDOW
+
+
+def count_tokens(text, model=DEFAULT_MODEL):
+    if not text:
+        return 0
+    encoding = encoding_for(model)
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(messages, model=DEFAULT_MODEL):
+    """Tokens a list of chat messages takes up in the prompt."""
+    total = TOKENS_PER_REPLY
+    for message in messages:
+        total += TOKENS_PER_MESSAGE + count_tokens(str(message.get("content", "")), model)
+    return total
+
+
+def truncate_to_tokens(text, max_tokens, model=DEFAULT_MODEL):
+    """
+    Returns the longest prefix of `text` within `max_tokens`, cut back to the last
+    paragraph or line break when one is close, so trimmed context stays readable.
+    """
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    if max_tokens <= 0:
+        return ""
+    encoding = encoding_for(model)
+    if encoding is None:
+        head = text[:max_tokens * 4]
+    else:
+        head = encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+    for boundary in ("\n\n", "\n"):
+        cut = head.rfind(boundary)
+        if cut > len(head) * 0.8:
+            return head[:cut]
+    return head
+
+
+def fit_text(function, text, max_tokens, model=DEFAULT_MODEL):
+    """Trims `text` to `max_tokens` for `function`, logging and counting any trim."""
+    tokens = count_tokens(text, model)
+    if tokens <= max_tokens:
+        return text
+    print(f"Warning: {function} input trimmed from {tokens} to {max_tokens} tokens.")
+    with _stats_lock:
+        _stats[function]["trimmed"] += 1
+    return truncate_to_tokens(text, max_tokens, model)
+
+
+def select_within_budget(chunks, max_tokens, model=DEFAULT_MODEL, separator="\n\n"):
+    """
+    Packs chunks, given in priority order, into `max_tokens`, skipping any that no
+    longer fit. The selected chunks are returned in their original order.
+    """
+    separator_tokens = count_tokens(separator, model)
+    chosen, used = [], 0
+    for index, chunk in enumerate(chunks):
+        cost = count_tokens(chunk, model) + (separator_tokens if chosen else 0)
+        if used + cost <= max_tokens:
+            chosen.append(index)
+            used += cost
+    return [chunks[i] for i in sorted(chosen)]
+
+
+def check_fits(function, messages, model=DEFAULT_MODEL, max_output_tokens=None):
+    """
+    Counts the prompt, checks prompt + expected output against the context window
+    and records the counts under `function`. Returns the report dict; raises
+    PromptTooLarge instead of letting the API reject the request.
+    """
+    prompt_tokens = count_message_tokens(messages, model)
+    output_tokens = max_output_tokens or 0
+    window = context_window(model)
+    report = {
+        "model": model,
+        "prompt_tokens": prompt_tokens,
+        "max_output_tokens": output_tokens,
+        "context_window": window,
+    }
+    if prompt_tokens + output_tokens + SAFETY_MARGIN_TOKENS > window:
+        raise PromptTooLarge(
+            f"{function}: prompt of {prompt_tokens} tokens plus {output_tokens} output tokens "
+            f"exceeds the {window}-token context window of {model}"
+        )
+    with _stats_lock:
+        entry = _stats[function]
+        entry["calls"] += 1
+        entry["prompt_tokens"] += prompt_tokens
+        entry["max_output_tokens"] += output_tokens
+    return report
+
+
+def stats():
+    """Per-function prompt token totals for this process."""
+    with _stats_lock:
+        return {fn: dict(counts) for fn, counts in _stats.items()}
@@ -0,0 +1,249 @@
+# prompt_templates.py
+"""
+Versioned prompt templates for generative_ai.
+
+Every template keeps its fixed instructions, format spec and examples in the
+system message and puts the variable content (source text, counts, question)
+last, in the user message, so each prompt is defined in one place and its
+static part never changes between requests.
+
+Bump a template's version whenever its text changes.
+
+    messages = prompt_templates.render("flashcards", text=text)
+"""
+
+JSON_SYSTEM = "You are a helpful learning assistant. You must output valid JSON."
+
+
+class PromptTemplate:
+    """Static `system` text followed by a `user` message formatted with str.format(**values)."""
+
+    def __init__(self, name, version, system, user):
+        self.name = name
+        self.version = version
+        self.system = system.strip()
+        self.user = user.strip()
+
+    @property
+    def id(self):
+        return f"{self.name}@v{self.version}"
+
+    def render(self, **values):
+        return [
+            {"role": "system", "content": self.system},
+            {"role": "user", "content": self.user.format(**values)}
+        ]
+
+
+TEMPLATES = {}
+
+
+def register(name, version, system, user, json_mode=False):
+    """Adds a template. JSON-mode templates get the JSON instruction prepended to their system text."""
+    if json_mode:
+        system = f"{JSON_SYSTEM}\n\n{system.strip()}"
+    template = PromptTemplate(name, version, system, user)
+    TEMPLATES[name] = template
+    return template
+
+
+def render(name, **values):
+    return TEMPLATES[name].render(**values)
+
+
+# ---------------------- Templates ---------------------- #
+
+register("summary", 2, """
+You are a helpful learning assistant.
+Please provide a detailed, well-structured summary of the text the user sends.
+The summary should be suitable for a student trying to learn this topic from scratch.
+Use markdown for formatting, including headings, subheadings, and bullet points.
+""", """
+Text:
+{text}
+""")
+
+# No chunk position in the prompt: the cached notes for a chunk must not depend
+# on where it sits, so editing one section doesn't invalidate all later chunks.
+register("summarize_chunk", 3, """
+You are a helpful learning assistant.
+The user sends one part of a longer document.
+Condense it into dense markdown study notes. Keep every key concept, definition,
+formula and example; drop repetition and filler. Do not add an introduction or conclusion.
+""", """
+Text:
+{text}
+""")
+
+register("merge_notes", 2, """
+You are a helpful learning assistant.
+Merge the consecutive sets of study notes the user sends, all from one document, into a single,
+well-organized set of markdown notes. Keep all key concepts, definitions and formulas,
+remove duplication and preserve the original order of topics.
+""", """
+Notes:
+{notes}
+""")
+
+register("mindmap", 2, """
+Create a hierarchical markdown mindmap from the text the user sends.
+Use proper markdown heading syntax (# for main topics, ## for subtopics, ### for details).
+Focus on the main concepts and their relationships.
+
+Format the output exactly like this example:
+# Main Topic
+## Subtopic 1
+### Detail 1
+- Key point 1
+### Detail 2
+## Subtopic 2
+### Detail 3
+
+Respond only with the markdown mindmap, no additional explanation.
+""", """
+Text to analyze: {text}
+""")
+
+register("flashcards", 2, """
+Generate a list of 10-15 key flashcards from the text the user sends.
+Return a JSON object with a single key "flashcards", which is a list of objects.
+Each object should have two keys: "keyword" and "definition".
+
+Example format:
+{
+    "flashcards": [
+        {"keyword": "Python", "definition": "A high-level programming language."},
+        {"keyword": "Variable", "definition": "A storage location with a symbolic name."}
+    ]
+}
+""", """
+Text:
+{text}
+""", json_mode=True)
+
+register("formula_sheet", 2, """
+You are an assistant that extracts key formulas and definitions.
+Analyze the text the user sends and extract all key formulas, equations, and important definitions.
+Format them clearly using Markdown. Use headings for categories, lists for definitions,
+and code blocks or LaTeX-style $$...$$ for formulas.
+
+Example:
+
+## Key Definitions
+* **Topic A**: The definition of topic A.
+* **Topic B**: The definition of topic B.
+
+## Important Formulas
+**Ohm's Law**
+$$V = IR$$
+
+If no specific formulas are found, list the key concepts and principles.
+""", """
+Text:
+{text}
+""")
+
+register("artifact_bundle", 2, """
+From the text the user sends, produce three study artifacts and return them as one JSON object
+with exactly these keys:
+
+"mindmap": A hierarchical markdown mindmap as a single string. Use heading syntax
+(# for the main topic, ## for subtopics, ### for details) and "- " bullets for key points.
+
+"flashcards": A list of 10-15 objects, each with a "keyword" and a "definition".
+
+"formula_sheet": A markdown string listing key formulas, equations and definitions.
+Use headings for categories, lists for definitions and $$...$$ for formulas.
+If the text has no formulas, list the key concepts and principles instead.
+
+Example format:
+{
+    "mindmap": "# Main Topic\\n## Subtopic 1\\n### Detail 1\\n- Key point 1",
+    "flashcards": [{"keyword": "Python", "definition": "A high-level programming language."}],
+    "formula_sheet": "## Important Formulas\\n**Ohm's Law**\\n$$V = IR$$"
+}
+""", """
+Text:
+{text}
+""", json_mode=True)
+
+register("quiz", 2, """
+Analyze the text the user sends and generate a quiz with the number and mix of
+questions they ask for: Multiple Choice Questions (MCQ), True/False Questions (T/F)
+and Short Answer Questions (Short).
+
+Return a JSON object with a single key "quiz", which is a list of question objects.
+
+Each question object MUST have the following keys:
+1. "type": A string, either "MCQ", "T/F", or "Short".
+2. "question": The question text.
+3. "topic": A 1-3 word topic for this specific question (e.g., "Data Types").
+
+For "MCQ" type:
+- "options": A list of 4 strings (e.g., ["A. Option 1", "B. Option 2", ...]).
+- "answer": The string of the correct option letter (e.g., "A").
+
+For "T/F" type:
+- "options": Must be ["True", "False"].
+- "answer": The correct string, either "True" or "False".
+
+For "Short" type:
+- "answer_keywords": A list of 1-3 keywords that must be in the user's answer
+  for it to be considered correct (e.g., ["Ohm's Law", "Voltage"]).
+
+Example format:
+{
+    "quiz": [
+        {
+            "type": "MCQ",
+            "question": "What is Python?",
+            "topic": "Python Basics",
+            "options": ["A. A snake", "B. A programming language", "C. A car", "D. A fruit"],
+            "answer": "B"
+        },
+        {
+            "type": "T/F",
+            "question": "Python is a compiled language.",
+            "topic": "Python Basics",
+            "options": ["True", "False"],
+            "answer": "False"
+        },
+        {
+            "type": "Short",
+            "question": "What law describes the relationship V=IR?",
+            "topic": "Physics",
+            "answer_keywords": ["Ohm", "Ohm's Law"]
+        }
+    ]
+}
+""", """
+Generate a quiz with {num_questions} questions:
+- {num_mcq} Multiple Choice Questions (MCQ)
+- {num_tf} True/False Questions (T/F)
+- {num_short} Short Answer Questions (Short)
+
+Text:
+{text}
+""", json_mode=True)
+
+register("answer_with_context", 2, """
+You are a helpful tutor answering questions based on context.
+Using only the context provided, answer the user's question.
+If the answer is not in the context, say "I'm sorry, that information is not in the provided topic."
+""", """
+Context:
+{context}
+
+Question:
+{question}
+
+{style}
+""")
+
+register("answer_general", 2, """
+You are a helpful and friendly AI assistant. Answer the user's question directly.
+""", """
+{question}
+
+{style}
+""")
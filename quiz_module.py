@@ -13,14 +13,43 @@ if project_root not in sys.path:
     sys.path.insert(0, project_root)
 import generative_ai
 import database_utils as db
+import catalogue
+import artifact_graph
+
+def _stream_quiz(topic_text, num_questions):
+    """Generates a quiz, previewing each question as it streams in. Returns {"quiz": [...]} or None."""
+    preview = st.empty()
+    questions = []
+    try:
+        for question in generative_ai.stream_quiz(topic_text, num_questions=num_questions):
+            questions.append(question)
+            with preview.container(border=True):
+                for i, q in enumerate(questions):
+                    st.markdown(f"**Question {i+1}:** {q['question']}")
+                st.caption(f"Generating quiz... ({len(questions)} so far)")
+    except Exception as e:
+        # A partial quiz is never used; ask again without streaming.
+        print(f"Quiz stream failed after {len(questions)} questions ({e}); retrying without streaming")
+        preview.empty()
+        return generative_ai.generate_quiz(topic_text, num_questions=num_questions)
+    preview.empty()
+    return {"quiz": questions} if questions else None
 
 def setup_quiz(topic_text, topic_id, num_questions=5):
     """Generates and stores a quiz in the session state."""
-    quiz_data = generative_ai.generate_quiz(topic_text, num_questions=num_questions)
+    bank = st.session_state.get("question_bank")
+    if (bank and bank["topic_id"] == topic_id and bank["questions"]
+            and bank.get("summary_hash") == artifact_graph.input_hash(topic_text)):
+        # Catalogue topics draw from their precomputed question bank instead of calling the LLM.
+        quiz_data = {"quiz": catalogue.sample_questions(bank["questions"], num_questions)}
+    else:
+        quiz_data = _stream_quiz(topic_text, num_questions)
     if quiz_data and "quiz" in quiz_data:
         st.session_state.current_quiz = quiz_data["quiz"]
         st.session_state.current_topic_id = topic_id
         st.session_state.user_answers = [None] * len(quiz_data["quiz"])
+        # Remember which summary this quiz was built from, so a new summary triggers a new quiz.
+        st.session_state.setdefault("artifact_hashes", {})["quiz"] = artifact_graph.input_hash(topic_text)
     else:
         st.error("Failed to generate quiz. Please try again.")
 
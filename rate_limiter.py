@@ -0,0 +1,278 @@
+# rate_limiter.py
+"""
+Process-wide client-side rate limiting for OpenAI calls.
+
+Every request passes through one shared RateLimiter:
+
+- Two token buckets keep us under the account quota: requests per minute
+  (OPENAI_RPM_LIMIT) and tokens per minute (OPENAI_TPM_LIMIT, charged with
+  the prompt size plus max_tokens, then corrected with the real usage).
+- An AIMD concurrency limit between LLM_MIN_CONCURRENCY and
+  LLM_MAX_CONCURRENCY. It grows by about one slot per window of successful
+  fast calls, and halves on a 429 or when latency passes
+  LLM_LATENCY_TARGET_SECONDS.
+- Retryable failures (429, 5xx, timeouts, connection errors) are retried up
+  to LLM_MAX_RETRIES times. The wait honors Retry-After when the server
+  sends it, and otherwise uses exponential backoff with full jitter.
+
+The limiter works from any thread and any event loop, so the background loop
+in generative_ai, async servers and the synchronous LangChain calls in
+agentic_ai all share one budget.
+"""
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+from collections import deque
+
+import openai
+
+# --- Robust Import Logic ---
+project_root = os.path.dirname(os.path.abspath(__file__))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+from config import (
+    OPENAI_RPM_LIMIT, OPENAI_TPM_LIMIT, LLM_MAX_CONCURRENCY, LLM_MIN_CONCURRENCY,
+    LLM_LATENCY_TARGET_SECONDS, LLM_MAX_RETRIES
+)
+
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+# Decreases closer together than this count as one congestion event.
+DECREASE_COOLDOWN_SECONDS = 5.0
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Refills at `per_minute / 60` units per second up to `per_minute`. reserve()
+    always succeeds and returns how long the caller must wait, so waiting works
+    the same for threads (time.sleep) and coroutines (asyncio.sleep).
+    """
+
+    def __init__(self, per_minute):
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount):
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            # A single request larger than the bucket would otherwise wait forever.
+            self.level -= min(amount, self.capacity)
+            return 0.0 if self.level >= 0 else -self.level / self.rate
+
+    def refund(self, amount):
+        with self._lock:
+            self.level = min(self.capacity, self.level + amount)
+
+
+class AdaptiveConcurrency:
+    """An AIMD-sized slot pool whose waiters can be threads or coroutines on any loop."""
+
+    def __init__(self, initial, minimum, maximum):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = float(initial)
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+        self._waiters = deque()
+
+    def _capacity(self):
+        return max(1, int(self.limit))
+
+    def _wake_locked(self):
+        while self._waiters and self.in_flight < self._capacity():
+            wake = self._waiters.popleft()
+            self.in_flight += 1
+            wake()
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+        with self._lock:
+            if self.in_flight < self._capacity():
+                self.in_flight += 1
+                return
+            self._waiters.append(wake)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                try:
+                    self._waiters.remove(wake)
+                    granted = False
+                except ValueError:
+                    granted = True  # a slot was handed to us just as we were cancelled
+            if granted:
+                self.release()
+            raise
+
+    def acquire_sync(self):
+        event = threading.Event()
+        with self._lock:
+            if self.in_flight < self._capacity():
+                self.in_flight += 1
+                return
+            self._waiters.append(event.set)
+        event.wait()
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+            self._wake_locked()
+
+    def increase(self):
+        with self._lock:
+            self.limit = min(self.maximum, self.limit + 1.0 / self._capacity())
+            self._wake_locked()
+
+    def decrease(self):
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_decrease >= DECREASE_COOLDOWN_SECONDS:
+                self.limit = max(self.minimum, self.limit / 2)
+                self._last_decrease = now
+
+
+def status_code(error):
+    return getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+
+
+def is_retryable(error):
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    if getattr(error, "code", None) == "insufficient_quota":
+        return False  # billing problem, not congestion; retrying cannot help
+    return status_code(error) in RETRYABLE_STATUS
+
+
+def retry_delay(error, attempt):
+    """Seconds to wait before retry `attempt` (0-based): Retry-After if given, else jittered backoff."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    for header, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = headers.get(header)
+        if value:
+            try:
+                return float(value) * scale + random.uniform(0, 0.5)
+            except ValueError:
+                pass  # HTTP-date form; fall back to backoff
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+
+class RateLimiter:
+    def __init__(self, rpm, tpm, max_concurrency, min_concurrency, latency_target, max_retries):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.concurrency = AdaptiveConcurrency(max_concurrency, min_concurrency, max_concurrency)
+        self.latency_target = latency_target
+        self.max_retries = max_retries
+
+    def _bucket_wait(self, tokens):
+        return max(self.requests.reserve(1), self.tokens.reserve(tokens))
+
+    def record(self, latency=None, throttled=False):
+        """Feeds one call's outcome to the AIMD controller."""
+        if throttled or (latency is not None and latency > self.latency_target):
+            self.concurrency.decrease()
+        elif latency is not None:
+            self.concurrency.increase()
+
+    def settle(self, estimated_tokens, actual_tokens):
+        """Returns over-estimated tokens to the TPM bucket once real usage is known."""
+        if actual_tokens is not None and actual_tokens < estimated_tokens:
+            self.tokens.refund(estimated_tokens - actual_tokens)
+
+    async def acquire(self, tokens):
+        await asyncio.sleep(self._bucket_wait(tokens))
+        await self.concurrency.acquire()
+
+    def acquire_sync(self, tokens):
+        time.sleep(self._bucket_wait(tokens))
+        self.concurrency.acquire_sync()
+
+    def release(self):
+        self.concurrency.release()
+
+    def _on_error(self, error, attempt):
+        """Returns the retry delay for `error`, or None if it should be raised."""
+        if not is_retryable(error) or attempt >= self.max_retries:
+            return None
+        self.record(throttled=status_code(error) == 429)
+        delay = retry_delay(error, attempt)
+        print(f"OpenAI call failed ({type(error).__name__}); retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+        return delay
+
+    def finish(self, latency=None):
+        """Releases a slot kept with run(hold_slot=True), e.g. once a stream is drained."""
+        self.release()
+        self.record(latency=latency)
+
+    async def run(self, call, tokens, hold_slot=False):
+        """
+        Awaits `call()` under the limits, retrying retryable errors, and returns its result.
+        With hold_slot the concurrency slot stays taken until finish() is called.
+        """
+        attempt = 0
+        while True:
+            await self.acquire(tokens)
+            started = time.monotonic()
+            try:
+                result = await call()
+            except Exception as e:
+                self.release()
+                delay = self._on_error(e, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                # Cancellation, KeyboardInterrupt, SystemExit: free the slot, never retry.
+                self.release()
+                raise
+            if not hold_slot:
+                self.finish(time.monotonic() - started)
+            return result
+
+    def run_sync(self, call, tokens):
+        """Synchronous run() for blocking clients such as LangChain's ChatOpenAI."""
+        attempt = 0
+        while True:
+            self.acquire_sync(tokens)
+            started = time.monotonic()
+            try:
+                result = call()
+            except Exception as e:
+                self.release()
+                delay = self._on_error(e, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                time.sleep(delay)
+                continue
+            except BaseException:
+                self.release()
+                raise
+            self.finish(time.monotonic() - started)
+            return result
+
+
+limiter = RateLimiter(
+    OPENAI_RPM_LIMIT, OPENAI_TPM_LIMIT, LLM_MAX_CONCURRENCY, LLM_MIN_CONCURRENCY,
+    LLM_LATENCY_TARGET_SECONDS, LLM_MAX_RETRIES
+)
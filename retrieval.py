@@ -0,0 +1,107 @@
+# retrieval.py
+"""
+Offline BM25 retrieval over the paragraph chunks of a topic.
+
+Topic Q&A sends only the chunks most relevant to the question instead of the
+whole summary, so the prompt size stays flat as topic material grows. The
+index is a sparse matrix of precomputed BM25 term weights (chunks x terms).
+Scoring a question is one column slice and a row sum. Indexes are cached in
+process, keyed by a hash of the source text, so a topic is indexed once
+however many questions are asked. No embedding API is involved.
+"""
+import hashlib
+import re
+import threading
+from collections import Counter, OrderedDict
+
+import numpy as np
+from scipy import sparse
+
+K1 = 1.5
+B = 0.75
+MAX_CACHED_INDEXES = 64
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOP_WORDS = frozenset("""
+a an and are as at be but by for from has have how i in is it its of on or that the this
+to was were what when where which who why will with you your do does did can s t
+""".split())
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def tokenize(text):
+    return [t for t in _TOKEN.findall(text.lower()) if t not in _STOP_WORDS]
+
+
+class BM25Index:
+    """BM25 (Okapi) index over a fixed list of chunks."""
+
+    def __init__(self, chunks, k1=K1, b=B):
+        self.chunks = chunks
+        self.vocabulary = {}
+        rows, cols, counts = [], [], []
+        lengths = np.zeros(len(chunks), dtype=np.float64)
+        for i, chunk in enumerate(chunks):
+            terms = Counter(tokenize(chunk))
+            lengths[i] = sum(terms.values())
+            for term, count in terms.items():
+                rows.append(i)
+                cols.append(self.vocabulary.setdefault(term, len(self.vocabulary)))
+                counts.append(count)
+
+        tf = sparse.csr_matrix(
+            (np.array(counts, dtype=np.float64), (rows, cols)),
+            shape=(len(chunks), len(self.vocabulary))
+        )
+        n_docs = max(len(chunks), 1)
+        df = np.bincount(cols, minlength=len(self.vocabulary)) if cols else np.zeros(0)
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+        avg_length = lengths.mean() if len(chunks) and lengths.mean() > 0 else 1.0
+
+        # w_ij = idf_j * tf_ij * (k1 + 1) / (tf_ij + k1 * (1 - b + b * len_i / avg_len))
+        norm = k1 * (1 - b + b * lengths / avg_length)
+        data = tf.data
+        row_norm = np.repeat(norm, np.diff(tf.indptr))
+        tf.data = data * (k1 + 1) / (data + row_norm)
+        self.weights = sparse.csc_matrix(tf.multiply(idf.reshape(1, -1)))
+
+    def scores(self, query):
+        term_ids = [self.vocabulary[t] for t in tokenize(query) if t in self.vocabulary]
+        if not term_ids:
+            return np.zeros(len(self.chunks))
+        return np.asarray(self.weights[:, term_ids].sum(axis=1)).ravel()
+
+    def search(self, query, k):
+        """Returns the indexes of the top-k chunks with a positive score, best first."""
+        scores = self.scores(query)
+        ranked = np.argsort(-scores, kind="stable")[:k]
+        return [int(i) for i in ranked if scores[i] > 0]
+
+
+def get_index(text, chunker):
+    """Returns the cached BM25 index for `text`, building it with `chunker(text)` on a miss."""
+    key = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    with _cache_lock:
+        index = _cache.get(key)
+        if index is not None:
+            _cache.move_to_end(key)
+            return index
+    index = BM25Index(chunker(text))
+    with _cache_lock:
+        _cache[key] = index
+        while len(_cache) > MAX_CACHED_INDEXES:
+            _cache.popitem(last=False)
+    return index
+
+
+def top_chunks(text, query, k, chunker):
+    """
+    Returns the k chunks of `text` most relevant to `query`, in document order.
+    If nothing matches, the opening chunks are returned so the model still gets
+    an overview of the topic.
+    """
+    index = get_index(text, chunker)
+    hits = index.search(query, k) or list(range(min(k, len(index.chunks))))
+    return [index.chunks[i] for i in sorted(hits)]
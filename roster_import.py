@@ -0,0 +1,64 @@
+# roster_import.py
+"""
+Bulk-imports a class roster from CSV.
+
+    python roster_import.py students.csv [--workers 8] [--chunk-size 500]
+
+The CSV needs a header row with `username`, `email` and `password` columns.
+Rows that can't be created (missing fields, duplicates, existing accounts)
+are reported with their row number; everything else is imported. If a
+database error stops the import, the rows it never reached are listed too
+and the exit status is 3, so they can be re-run.
+"""
+import argparse
+import csv
+import os
+import sys
+
+# --- Robust Import Logic ---
+project_root = os.path.dirname(os.path.abspath(__file__))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+import auth
+
+REQUIRED_COLUMNS = ("username", "email", "password")
+
+
+def read_roster(path):
+    """Reads the roster CSV into a list of dicts, validating the header."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        missing = [col for col in REQUIRED_COLUMNS if col not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"Roster is missing required column(s): {', '.join(missing)}")
+        return list(reader)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-import students from a CSV roster.")
+    parser.add_argument("csv_path", help="CSV file with username,email,password columns")
+    parser.add_argument("--workers", type=int, default=None, help="Password hashing processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=500, help="Rows per insert transaction")
+    args = parser.parse_args(argv)
+
+    try:
+        roster = read_roster(args.csv_path)
+    except (OSError, ValueError) as e:
+        print(f"Error reading roster: {e}")
+        return 1
+
+    report = auth.bulk_register_users(roster, max_workers=args.workers, chunk_size=args.chunk_size)
+
+    print(f"Imported {report['created']} of {len(roster)} students in {report['elapsed_seconds']}s.")
+    for conflict in report["conflicts"]:
+        print(f"  row {conflict['row']} ({conflict['username'] or '-'}): {conflict['reason']}")
+    if report["failed"]:
+        print(f"Database error: {len(report['failed'])} students were not imported:")
+        for failure in report["failed"]:
+            print(f"  row {failure['row']} ({failure['username']})")
+        return 3
+    return 0 if not report["conflicts"] else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,6 +3,7 @@ import os
 import time
 from typing import Optional
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
 from dotenv import load_dotenv
 import uvicorn
@@ -113,5 +114,22 @@ def log_partial(payload: PartialPayload):
         return {"error": str(e)}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """
+    LLM call metrics (latency, tokens, cost per function) for this server process,
+    in the Prometheus text format.
+    """
+    import llm_metrics
+    return llm_metrics.render_prometheus()
+
+
+@app.get("/metrics/summary")
+def metrics_summary():
+    """The same metrics as JSON, one row per (function, model)."""
+    import llm_metrics
+    return {"llm_calls": llm_metrics.summary()}
+
+
 if __name__ == "__main__":
     uvicorn.run("token_server:app", host="0.0.0.0", port=int(os.getenv("TOKEN_SERVER_PORT", 8000)), reload=True)